@@ -1,5 +1,136 @@
+from dotenv import load_dotenv
+import os
+
+load_dotenv()
+
 class Settings:
     PROJECT_NAME: str = "HF Service"
     VERSION: str = "1.0.0"
 
+    MONGO_TIMEOUT_MS: int = int(os.getenv("MONGO_TIMEOUT_MS", "5000"))
+
+    # CLIP loading: the model loads on first use unless CLIP_EAGER_LOAD is set
+    CLIP_MODEL_NAME: str = os.getenv("CLIP_MODEL_NAME", "openai/clip-vit-base-patch32")
+    CLIP_LOAD_MODE: str = os.getenv("CLIP_LOAD_MODE", "full")
+    CLIP_SNAPSHOT_PATH: str = os.getenv("CLIP_SNAPSHOT_PATH", "")
+    CLIP_EAGER_LOAD: bool = os.getenv("CLIP_EAGER_LOAD", "false").lower() == "true"
+    CLIP_WARMUP: bool = os.getenv("CLIP_WARMUP", "false").lower() == "true"
+
+    # CLIP inference backend: torch, torch-int8 or onnx
+    CLIP_BACKEND: str = os.getenv("CLIP_BACKEND", "torch")
+    CLIP_BACKEND_VERIFY: bool = os.getenv("CLIP_BACKEND_VERIFY", "true").lower() == "true"
+    CLIP_PARITY_THRESHOLD: float = float(os.getenv("CLIP_PARITY_THRESHOLD", "0.99"))
+    CLIP_ONNX_PATH: str = os.getenv("CLIP_ONNX_PATH", "data/onnx")
+    ONNX_NUM_THREADS: int = int(os.getenv("ONNX_NUM_THREADS", "0"))
+
+    # Image preprocessing (IMAGE_MAX_PIXELS of 0 disables the size check)
+    PREPROCESS_WORKERS: int = int(os.getenv("PREPROCESS_WORKERS", "4"))
+    IMAGE_MAX_PIXELS: int = int(os.getenv("IMAGE_MAX_PIXELS", "50000000"))
+    IMAGE_OVERSIZE_POLICY: str = os.getenv("IMAGE_OVERSIZE_POLICY", "downscale")
+
+    # CLIP micro-batching
+    CLIP_MAX_BATCH_SIZE: int = int(os.getenv("CLIP_MAX_BATCH_SIZE", "32"))
+    CLIP_MAX_BATCH_WAIT_MS: float = float(os.getenv("CLIP_MAX_BATCH_WAIT_MS", "5"))
+    CLIP_MAX_QUEUE: int = int(os.getenv("CLIP_MAX_QUEUE", "256"))
+
+    # Batch embedding endpoints
+    CLIP_BATCH_CHUNK_SIZE: int = int(os.getenv("CLIP_BATCH_CHUNK_SIZE", "32"))
+    CLIP_BATCH_MAX_ITEMS: int = int(os.getenv("CLIP_BATCH_MAX_ITEMS", "256"))
+    URL_FETCH_CONCURRENCY: int = int(os.getenv("URL_FETCH_CONCURRENCY", "8"))
+
+    # Image downloads for URL-based embedding
+    URL_FETCH_MAX_BYTES: int = int(os.getenv("URL_FETCH_MAX_BYTES", str(20 * 1024 * 1024)))
+    URL_FETCH_TIMEOUT: float = float(os.getenv("URL_FETCH_TIMEOUT", "10"))
+    URL_FETCH_MAX_CONNECTIONS: int = int(os.getenv("URL_FETCH_MAX_CONNECTIONS", "100"))
+    URL_FETCH_PER_HOST_LIMIT: int = int(os.getenv("URL_FETCH_PER_HOST_LIMIT", "8"))
+
+    # Text embedding cache (TTL of 0 disables expiry)
+    TEXT_EMBEDDING_CACHE_SIZE: int = int(os.getenv("TEXT_EMBEDDING_CACHE_SIZE", "10000"))
+    TEXT_EMBEDDING_CACHE_TTL: float = float(os.getenv("TEXT_EMBEDDING_CACHE_TTL", "0"))
+
+    # Image embedding cache keyed by image bytes (an empty disk path disables the disk tier)
+    IMAGE_CACHE_SIZE: int = int(os.getenv("IMAGE_CACHE_SIZE", "2048"))
+    IMAGE_CACHE_DISK_PATH: str = os.getenv("IMAGE_CACHE_DISK_PATH", "")
+    IMAGE_CACHE_DISK_SLOTS: int = int(os.getenv("IMAGE_CACHE_DISK_SLOTS", "65536"))
+    IMAGE_CACHE_DIM: int = int(os.getenv("IMAGE_CACHE_DIM", "512"))
+    IMAGE_CACHE_PROBE: int = int(os.getenv("IMAGE_CACHE_PROBE", "8"))
+
+    # Streamed id listings: ids fetched per cursor round trip and per response chunk
+    STREAM_BATCH_SIZE: int = int(os.getenv("STREAM_BATCH_SIZE", "1000"))
+
+    # OpenAI client (OPENAI_BASE_URL points it at any OpenAI-compatible server, e.g. a local mock)
+    OPENAI_BASE_URL: str = os.getenv("OPENAI_BASE_URL", "")
+    OPENAI_TIMEOUT: float = float(os.getenv("OPENAI_TIMEOUT", "60"))
+    OPENAI_CONNECT_TIMEOUT: float = float(os.getenv("OPENAI_CONNECT_TIMEOUT", "5"))
+    OPENAI_MAX_CONNECTIONS: int = int(os.getenv("OPENAI_MAX_CONNECTIONS", "100"))
+    OPENAI_MAX_KEEPALIVE: int = int(os.getenv("OPENAI_MAX_KEEPALIVE", "20"))
+    OPENAI_MAX_RETRIES: int = int(os.getenv("OPENAI_MAX_RETRIES", "2"))
+
+    # Completion response cache (only requests at or below the max temperature are cached)
+    COMPLETION_CACHE_SIZE: int = int(os.getenv("COMPLETION_CACHE_SIZE", "1000"))
+    COMPLETION_CACHE_TTL: float = float(os.getenv("COMPLETION_CACHE_TTL", "3600"))
+    COMPLETION_CACHE_MAX_TEMPERATURE: float = float(os.getenv("COMPLETION_CACHE_MAX_TEMPERATURE", "0"))
+    COMPLETION_SEMANTIC_CACHE: bool = os.getenv("COMPLETION_SEMANTIC_CACHE", "false").lower() == "true"
+    COMPLETION_SEMANTIC_THRESHOLD: float = float(os.getenv("COMPLETION_SEMANTIC_THRESHOLD", "0.97"))
+    COMPLETION_SEMANTIC_MAX_ENTRIES: int = int(os.getenv("COMPLETION_SEMANTIC_MAX_ENTRIES", "1000"))
+
+    # Instruction cache (INSTRUCTION_CHANGE_STREAM needs a replica set)
+    INSTRUCTION_CACHE_SIZE: int = int(os.getenv("INSTRUCTION_CACHE_SIZE", "1024"))
+    INSTRUCTION_CACHE_TTL: float = float(os.getenv("INSTRUCTION_CACHE_TTL", "300"))
+    INSTRUCTION_CHANGE_STREAM: bool = os.getenv("INSTRUCTION_CHANGE_STREAM", "false").lower() == "true"
+
+    # Listing totals (filtered counts are cached for COUNT_CACHE_TTL seconds)
+    COUNT_CACHE_SIZE: int = int(os.getenv("COUNT_CACHE_SIZE", "1024"))
+    COUNT_CACHE_TTL: float = float(os.getenv("COUNT_CACHE_TTL", "30"))
+
+    # Collection-wide embedding analytics and near-duplicate detection
+    ANALYTICS_CHUNK_SIZE: int = int(os.getenv("ANALYTICS_CHUNK_SIZE", "2000"))
+    DUPLICATE_THRESHOLD: float = float(os.getenv("DUPLICATE_THRESHOLD", "0.98"))
+    DUPLICATE_BLOCK_SIZE: int = int(os.getenv("DUPLICATE_BLOCK_SIZE", "2048"))
+    DUPLICATE_MAX_PAIRS: int = int(os.getenv("DUPLICATE_MAX_PAIRS", "10000"))
+
+    # Zero-shot labeling
+    LABEL_MATRIX_CACHE_SIZE: int = int(os.getenv("LABEL_MATRIX_CACHE_SIZE", "64"))
+    META_INFO_MAX_IDS: int = int(os.getenv("META_INFO_MAX_IDS", "500"))
+
+    # Vector search ("atlas" uses $vectorSearch, "local" an in-process IVF index)
+    VECTOR_SEARCH_BACKEND: str = os.getenv("VECTOR_SEARCH_BACKEND", "atlas")
+    VECTOR_SEARCH_INDEX: str = os.getenv("VECTOR_SEARCH_INDEX", "vector_imageEmbedding")
+    VECTOR_SEARCH_NUM_CANDIDATES: int = int(os.getenv("VECTOR_SEARCH_NUM_CANDIDATES", "512"))
+    VECTOR_INDEX_PATH: str = os.getenv("VECTOR_INDEX_PATH", "data/vector_index.npz")
+    VECTOR_INDEX_NLIST: int = int(os.getenv("VECTOR_INDEX_NLIST", "0"))
+    VECTOR_INDEX_NPROBE: int = int(os.getenv("VECTOR_INDEX_NPROBE", "8"))
+    VECTOR_INDEX_SAVE_EVERY: int = int(os.getenv("VECTOR_INDEX_SAVE_EVERY", "1000"))
+
+    # How new embeddings are written: array, float32, float16 or int8
+    EMBEDDING_STORAGE_FORMAT: str = os.getenv("EMBEDDING_STORAGE_FORMAT", "array")
+
+    # Background embedding ingestion
+    INGESTION_ENABLED: bool = os.getenv("INGESTION_ENABLED", "false").lower() == "true"
+    INGESTION_BATCH_SIZE: int = int(os.getenv("INGESTION_BATCH_SIZE", "32"))
+    INGESTION_DOWNLOAD_CONCURRENCY: int = int(os.getenv("INGESTION_DOWNLOAD_CONCURRENCY", "8"))
+    INGESTION_MAX_ATTEMPTS: int = int(os.getenv("INGESTION_MAX_ATTEMPTS", "5"))
+    INGESTION_BACKOFF_SECONDS: float = float(os.getenv("INGESTION_BACKOFF_SECONDS", "30"))
+    INGESTION_POLL_SECONDS: float = float(os.getenv("INGESTION_POLL_SECONDS", "10"))
+
+    # Admission control: "<route tag>=<max concurrency>:<max queued>" per router group
+    ADMISSION_ENABLED: bool = os.getenv("ADMISSION_ENABLED", "true").lower() == "true"
+    ADMISSION_GROUPS: str = os.getenv(
+        "ADMISSION_GROUPS",
+        "CLIP=16:64,Search=16:64,Open AI=32:128,MongoData=64:256,Instructions=64:256",
+    )
+    ADMISSION_QUEUE_TIMEOUT: float = float(os.getenv("ADMISSION_QUEUE_TIMEOUT", "10"))
+
+    # Metrics and per-request profiling (requests carrying PROFILE_HEADER are sampled when enabled)
+    METRICS_ENABLED: bool = os.getenv("METRICS_ENABLED", "true").lower() == "true"
+    PROFILING_ENABLED: bool = os.getenv("PROFILING_ENABLED", "false").lower() == "true"
+    PROFILE_HEADER: str = os.getenv("PROFILE_HEADER", "X-Profile")
+    PROFILE_INTERVAL_MS: float = float(os.getenv("PROFILE_INTERVAL_MS", "5"))
+    PROFILE_KEEP: int = int(os.getenv("PROFILE_KEEP", "20"))
+
+    # Inference executor
+    INFERENCE_WORKERS: int = int(os.getenv("INFERENCE_WORKERS", "1"))
+    INFERENCE_MAX_PENDING: int = int(os.getenv("INFERENCE_MAX_PENDING", "8"))
+    TORCH_NUM_THREADS: int = int(os.getenv("TORCH_NUM_THREADS", "0"))
+
 settings = Settings()
@@ -0,0 +1,199 @@
+import base64
+from typing import Annotated, Any, Optional
+
+import numpy as np
+import orjson
+from fastapi import HTTPException, Request
+from fastapi.responses import JSONResponse, Response
+from pydantic import BeforeValidator, WithJsonSchema
+
+from services.metrics import stage_timer
+
+# Response encodings for embedding payloads
+#   json   - {"embeddings": [floats]} (default, encoded with orjson)
+#   base64 - {"embeddings": "<base64 of little-endian floats>", "dtype": ..., "shape": [...]}
+#   f32    - raw little-endian float32 bytes (application/octet-stream)
+#   f16    - raw little-endian float16 bytes (application/octet-stream)
+EMBEDDING_FORMATS = ("json", "base64", "f32", "f16")
+
+_accept_types = {
+    "application/vnd.embedding.f32": "f32",
+    "application/vnd.embedding.f16": "f16",
+    "application/vnd.embedding.base64+json": "base64",
+    "application/octet-stream": "f32",
+}
+_binary_dtypes = {"f32": np.dtype("<f4"), "f16": np.dtype("<f2")}
+_base64_dtypes = {"float32": np.dtype("<f4"), "float16": np.dtype("<f2")}
+
+
+class FastJSONResponse(JSONResponse):
+    """
+    JSON response rendered with orjson, which serializes NumPy arrays directly
+    instead of going through Python lists.
+    """
+
+    def render(self, content: Any) -> bytes:
+        with stage_timer("serialization"):
+            return orjson.dumps(content, option=orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NON_STR_KEYS)
+
+
+def negotiate_embedding_format(request: Request, requested: Optional[str] = None) -> str:
+    """
+    Pick the embedding encoding from the `format` query parameter, falling
+    back to the `Accept` header and then JSON.
+    """
+    if requested:
+        if requested not in EMBEDDING_FORMATS:
+            raise HTTPException(
+                status_code=400,
+                detail=f"Unknown format '{requested}', expected one of {list(EMBEDDING_FORMATS)}"
+            )
+        return requested
+    for media_type in request.headers.get("accept", "").split(","):
+        media_type = media_type.split(";")[0].strip().lower()
+        if media_type in _accept_types:
+            return _accept_types[media_type]
+    return "json"
+
+
+# Encodings for streamed listings
+#   json   - one JSON array, sent in chunks as the cursor advances
+#   ndjson - one JSON object per line (application/x-ndjson)
+STREAM_FORMATS = ("json", "ndjson")
+
+
+def negotiate_stream_format(request: Request, requested: Optional[str] = None) -> str:
+    """
+    Pick a listing encoding from the `format` query parameter, falling back
+    to the `Accept` header and then a JSON array.
+    """
+    if requested:
+        if requested not in STREAM_FORMATS:
+            raise HTTPException(
+                status_code=400,
+                detail=f"Unknown format '{requested}', expected one of {list(STREAM_FORMATS)}"
+            )
+        return requested
+    for media_type in request.headers.get("accept", "").split(","):
+        if media_type.split(";")[0].strip().lower() in ("application/x-ndjson", "application/jsonl"):
+            return "ndjson"
+    return "json"
+
+
+def encode_base64_vector(vector: np.ndarray, dtype: str = "float32") -> str:
+    return base64.b64encode(np.ascontiguousarray(vector, dtype=_base64_dtypes[dtype]).tobytes()).decode("ascii")
+
+
+def decode_base64_vector(data: str, dtype: str = "float32") -> np.ndarray:
+    if dtype not in _base64_dtypes:
+        raise ValueError(f"Unsupported dtype '{dtype}', expected one of {list(_base64_dtypes)}")
+    raw = base64.b64decode(data, validate=True)
+    if len(raw) % _base64_dtypes[dtype].itemsize:
+        raise ValueError(f"Payload length {len(raw)} is not a multiple of the {dtype} size")
+    return np.frombuffer(raw, dtype=_base64_dtypes[dtype]).astype(np.float32)
+
+
+def parse_vector(value: Any) -> np.ndarray:
+    """
+    Accept an embedding as a JSON float array, a base64 string of
+    little-endian float32, or `{"b64": ..., "dtype": "float32" | "float16"}`.
+    """
+    if isinstance(value, str):
+        vector = decode_base64_vector(value)
+    elif isinstance(value, dict):
+        if "b64" not in value:
+            raise ValueError("Packed embeddings must provide a 'b64' field")
+        vector = decode_base64_vector(value["b64"], value.get("dtype", "float32"))
+    else:
+        try:
+            vector = np.asarray(value, dtype=np.float32)
+        except (TypeError, ValueError):
+            raise ValueError("Embedding must be an array of numbers")
+    if vector.ndim != 1 or vector.size == 0:
+        raise ValueError("Embedding must be a non-empty 1-D vector")
+    return vector
+
+
+# Pydantic field type for embeddings sent by clients; validates to a float32 NumPy vector
+EmbeddingVector = Annotated[
+    Any,
+    BeforeValidator(parse_vector),
+    WithJsonSchema({
+        "anyOf": [
+            {"type": "array", "items": {"type": "number"}},
+            {"type": "string", "description": "base64 of little-endian float32"},
+            {
+                "type": "object",
+                "properties": {
+                    "b64": {"type": "string"},
+                    "dtype": {"type": "string", "enum": list(_base64_dtypes)},
+                },
+                "required": ["b64"],
+            },
+        ]
+    }),
+]
+
+
+def _binary_response(matrix: np.ndarray, response_format: str, headers: dict = None) -> Response:
+    dtype = _binary_dtypes[response_format]
+    with stage_timer("serialization"):
+        content = np.ascontiguousarray(matrix, dtype=dtype).tobytes()
+    return Response(
+        content=content,
+        media_type="application/octet-stream",
+        headers={
+            "X-Embedding-Dtype": dtype.name,
+            "X-Embedding-Shape": ",".join(str(n) for n in matrix.shape),
+            **(headers or {}),
+        },
+    )
+
+
+def embedding_response(embedding, response_format: str = "json") -> Response:
+    """
+    Encode a single embedding vector in the negotiated format.
+    """
+    vector = np.asarray(embedding, dtype=np.float32)
+    if response_format in _binary_dtypes:
+        return _binary_response(vector, response_format)
+    if response_format == "base64":
+        return FastJSONResponse({
+            "embeddings": encode_base64_vector(vector),
+            "dtype": "float32",
+            "shape": list(vector.shape),
+        })
+    return FastJSONResponse({"embeddings": vector})
+
+
+def batch_embedding_response(results: list, error_prefix: str, response_format: str = "json") -> Response:
+    """
+    Encode per-item embeddings/exceptions from a batch endpoint.
+
+    JSON and base64 return an ordered result list with per-item errors. The
+    binary formats return one (items, dim) matrix; rows of failed items are
+    NaN and their indices are listed in the `X-Embedding-Failed` header.
+    """
+    failed = [i for i, result in enumerate(results) if isinstance(result, Exception)]
+
+    if response_format in _binary_dtypes:
+        vectors = [result for result in results if not isinstance(result, Exception)]
+        dimensions = len(vectors[0]) if vectors else 0
+        matrix = np.full((len(results), dimensions), np.nan, dtype=np.float32)
+        for i, result in enumerate(results):
+            if not isinstance(result, Exception):
+                matrix[i] = result
+        return _binary_response(matrix, response_format, {"X-Embedding-Failed": ",".join(map(str, failed))})
+
+    items = []
+    for index, result in enumerate(results):
+        if isinstance(result, Exception):
+            items.append({"index": index, "embeddings": None, "error": f"{error_prefix}: {str(result)}"})
+        elif response_format == "base64":
+            items.append({"index": index, "embeddings": encode_base64_vector(result), "error": None})
+        else:
+            items.append({"index": index, "embeddings": np.asarray(result, dtype=np.float32), "error": None})
+    content = {"count": len(items), "failed": len(failed), "results": items}
+    if response_format == "base64":
+        content["dtype"] = "float32"
+    return FastJSONResponse(content)
@@ -1,10 +1,9 @@
 from pymongo import MongoClient
-from transformers import CLIPProcessor, CLIPModel
+from core.config import settings
 import logging
-from dotenv import load_dotenv
 import os
-
-load_dotenv()
+import threading
+import time
 
 # Set up logging
 logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(message)s")
@@ -13,39 +12,272 @@ logger = logging.getLogger(__name__)
 def display_banner():
     banner = r"""
 
-    
-    MongoDB and CLIP Service Initializer                        
+
+    MongoDB and CLIP Service Initializer
     """
     print(banner)
 
 # Display banner
 display_banner()
 
-# Load CLIP model and processor
-try:
-    logger.info("Loading CLIP model...")
-    model = CLIPModel.from_pretrained("openai/clip-vit-base-patch32")
-    processor = CLIPProcessor.from_pretrained("openai/clip-vit-base-patch32")
-    tokenizer = processor.tokenizer
-    logger.info("CLIP model loaded successfully!")
-except Exception as e:
-    logger.error(f"Failed to load CLIP model: {e}")
-    raise
+# Seconds spent initializing each component, reported by /readyz
+startup_timings = {}
+
+def record_timing(component: str, started: float):
+    elapsed = time.perf_counter() - started
+    startup_timings[component] = round(elapsed, 3)
+    logger.info(f"Initialized {component} in {elapsed:.2f}s")
+
+CLIP_LOAD_MODES = ("full", "vision", "text")
+
+class ClipRuntime:
+    """
+    Lazily loaded CLIP model and preprocessors.
+
+    Nothing is loaded until the first CLIP call (or an explicit `load()`), so
+    processes that only serve Mongo endpoints never pay for the model.
+    `mode` limits loading to the vision or text tower; `snapshot_path` loads a
+    local `save_pretrained` snapshot instead of resolving the hub id.
+    `backend` picks how forward passes run (see services/clip_backends.py);
+    unless `verify` is off, a non-reference backend is only used after its
+    embeddings match eager fp32 torch to within `parity_threshold` cosine.
+    """
+
+    def __init__(
+        self,
+        model_name: str,
+        mode: str = "full",
+        snapshot_path: str = "",
+        backend: str = "torch",
+        backend_options: dict = None,
+        verify: bool = True,
+        parity_threshold: float = 0.99,
+    ):
+        if mode not in CLIP_LOAD_MODES:
+            raise ValueError(f"Unknown CLIP_LOAD_MODE '{mode}', expected one of {CLIP_LOAD_MODES}")
+        self.model_name = model_name
+        self.mode = mode
+        self.snapshot_path = snapshot_path
+        self.backend_name = backend
+        self.backend_options = backend_options or {}
+        self.verify = verify
+        self.parity_threshold = parity_threshold
+        self.parity = None
+        self.warmed_up = False
+        self.error = None
+        self._model = None
+        self._processor = None
+        self._tokenizer = None
+        self._backend = None
+        self._lock = threading.Lock()
+
+    @property
+    def source(self) -> str:
+        if self.snapshot_path and os.path.isdir(self.snapshot_path):
+            return self.snapshot_path
+        return self.model_name
+
+    @property
+    def loaded(self) -> bool:
+        return self._model is not None
+
+    @property
+    def supports_images(self) -> bool:
+        return self.mode in ("full", "vision")
+
+    @property
+    def supports_text(self) -> bool:
+        return self.mode in ("full", "text")
+
+    def load(self):
+        if self._model is not None:
+            return
+        with self._lock:
+            if self._model is not None:
+                return
+            try:
+                self._load()
+                self.error = None
+            except Exception as e:
+                self.error = str(e)
+                logger.error(f"Failed to load CLIP model: {e}")
+                raise
+
+    def _load(self):
+        started = time.perf_counter()
+        import transformers
+        record_timing("transformers import", started)
+
+        source = self.source
+        options = {"local_files_only": True} if source != self.model_name else {}
+        logger.info(f"Loading CLIP model ({self.mode}) from {source}...")
+
+        started = time.perf_counter()
+        if self.mode == "full":
+            self._processor = transformers.CLIPProcessor.from_pretrained(source, **options)
+            self._tokenizer = self._processor.tokenizer
+        elif self.mode == "vision":
+            self._processor = transformers.CLIPImageProcessor.from_pretrained(source, **options)
+        else:
+            self._tokenizer = transformers.CLIPTokenizerFast.from_pretrained(source, **options)
+        record_timing("CLIP processor", started)
+
+        started = time.perf_counter()
+        model_class = {
+            "full": transformers.CLIPModel,
+            "vision": transformers.CLIPVisionModelWithProjection,
+            "text": transformers.CLIPTextModelWithProjection,
+        }[self.mode]
+        model = model_class.from_pretrained(source, **options)
+        model.eval()
+        record_timing("CLIP model", started)
 
-# Initialize MongoDB connection
+        started = time.perf_counter()
+        self._backend = self._create_backend(model)
+        self._model = model
+        record_timing(f"CLIP {self._backend.name} backend", started)
+        logger.info("CLIP model loaded successfully!")
+
+    def install(self, model, processor=None, tokenizer=None, backend=None):
+        """
+        Use already built components instead of loading from the hub, e.g. a
+        stub model for benchmarks. `backend` defaults to the configured one.
+        """
+        with self._lock:
+            self._processor = processor
+            self._tokenizer = tokenizer
+            self._backend = backend or self._create_backend(model)
+            self._model = model
+            self.error = None
+
+    def _create_backend(self, model):
+        from services.clip_backends import TorchBackend, create_backend, parity_check, sample_inputs
+
+        reference = TorchBackend(model, self.mode)
+        if self.backend_name == reference.name:
+            return reference
+        backend = create_backend(self.backend_name, model, self.mode, **self.backend_options)
+        if not self.verify:
+            return backend
+        inputs = sample_inputs(self._processor, self._tokenizer, self.mode)
+        self.parity = parity_check(backend, reference, inputs, self.parity_threshold)
+        if not self.parity["passed"]:
+            logger.warning(f"CLIP backend {backend.name} failed the parity check, using torch: {self.parity}")
+            return reference
+        logger.info(f"CLIP backend {backend.name} passed the parity check: {self.parity}")
+        return backend
+
+    @property
+    def model(self):
+        self.load()
+        return self._model
+
+    @property
+    def processor(self):
+        if not self.supports_images:
+            raise RuntimeError(f"CLIP vision tower is not loaded (CLIP_LOAD_MODE={self.mode})")
+        self.load()
+        return self._processor
+
+    @property
+    def tokenizer(self):
+        if not self.supports_text:
+            raise RuntimeError(f"CLIP text tower is not loaded (CLIP_LOAD_MODE={self.mode})")
+        self.load()
+        return self._tokenizer
+
+    @property
+    def backend(self):
+        self.load()
+        return self._backend
+
+    def image_features(self, **inputs):
+        """
+        Image embeddings (float32 NumPy rows) for processor outputs.
+        """
+        return self.backend.image_features(**inputs)
+
+    def text_features(self, **inputs):
+        """
+        Text embeddings (float32 NumPy rows) for tokenizer outputs.
+        """
+        return self.backend.text_features(**inputs)
+
+    def logit_scale(self) -> float:
+        # Only the full model carries the learned temperature; 100 is CLIP's trained value
+        if self.mode == "full" and hasattr(self.model, "logit_scale"):
+            return float(self.model.logit_scale.exp().item())
+        return 100.0
+
+    def warm_up(self, batch_size: int = 2):
+        """
+        Run a dummy batch through each loaded tower so the first real request
+        does not pay for lazy kernel initialization.
+        """
+        from PIL import Image
+
+        started = time.perf_counter()
+        if self.supports_images:
+            images = [Image.new("RGB", (224, 224)) for _ in range(batch_size)]
+            self.image_features(**self.processor(images=images, return_tensors="np"))
+        if self.supports_text:
+            self.text_features(**self.tokenizer(["warm up"] * batch_size, padding=True, return_tensors="np"))
+        self.warmed_up = True
+        record_timing("CLIP warm-up", started)
+
+    def status(self) -> dict:
+        return {
+            "model": self.model_name,
+            "mode": self.mode,
+            "source": self.source,
+            "backend": self._backend.describe() if self._backend is not None else self.backend_name,
+            "parity": self.parity,
+            "loaded": self.loaded,
+            "warmed_up": self.warmed_up,
+            "error": self.error,
+        }
+
+def clip_backend_options(backend: str, model_name: str, mode: str) -> dict:
+    if backend == "onnx":
+        return {
+            "export_dir": os.path.join(settings.CLIP_ONNX_PATH, model_name.replace("/", "--"), mode),
+            "threads": settings.ONNX_NUM_THREADS,
+        }
+    return {}
+
+clip_runtime = ClipRuntime(
+    settings.CLIP_MODEL_NAME,
+    settings.CLIP_LOAD_MODE,
+    settings.CLIP_SNAPSHOT_PATH,
+    backend=settings.CLIP_BACKEND,
+    backend_options=clip_backend_options(settings.CLIP_BACKEND, settings.CLIP_MODEL_NAME, settings.CLIP_LOAD_MODE),
+    verify=settings.CLIP_BACKEND_VERIFY,
+    parity_threshold=settings.CLIP_PARITY_THRESHOLD,
+)
+
+# Initialize MongoDB connection (the client connects lazily on first use)
 try:
-    logger.info("Connecting to MongoDB...")
+    started = time.perf_counter()
     uri = os.getenv("MONGO_URI")
     database_name = os.getenv("DATABASE_NAME")
     collection_name = os.getenv("COLLECTION_NAME")
 
-    client = MongoClient(uri)
+    if uri and uri.startswith("mongomock://"):
+        # In-memory stand-in for benchmarks and local runs; needs `pip install mongomock`
+        import mongomock
+        client = mongomock.MongoClient()
+    else:
+        client = MongoClient(uri, serverSelectionTimeoutMS=settings.MONGO_TIMEOUT_MS)
     db = client[database_name]
     collection = db[collection_name]
     secondary_collection = db["instructions"]
-    # Test connection
-    client.admin.command('ping')
-    logger.info(f"Connected to MongoDB database: {database_name}, collection: {collection_name}")
+    record_timing("MongoDB client", started)
 except Exception as e:
-    logger.error(f"Failed to connect to MongoDB: {e}")
+    logger.error(f"Failed to configure MongoDB client: {e}")
     raise
+
+def check_mongo():
+    """
+    Ping MongoDB; raises if the server cannot be reached.
+    """
+    client.admin.command('ping')
@@ -0,0 +1,65 @@
+import asyncio
+
+from fastapi import APIRouter, HTTPException, Query
+from services.indexes import index_manager, explain_query_shapes
+from services.instruction_cache import instruction_cache
+from services.admission import admission_controller
+
+router = APIRouter()
+
+@router.get("/admin/indexes")
+async def index_status():
+    """
+    Indexes and normalized fields ensured at startup, per collection.
+    """
+    return index_manager.status()
+
+@router.post("/admin/indexes/ensure")
+async def ensure_indexes():
+    """
+    Create any missing declared indexes and backfill normalized fields now.
+    """
+    try:
+        return await asyncio.to_thread(index_manager.ensure)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error ensuring indexes: {str(e)}")
+
+@router.get("/admin/query-plans")
+async def query_plans(
+    name: str = Query("a", description="Sample value for the name filters"),
+    technology: str = Query("a", description="Sample value for the technology filters"),
+    text: str = Query("example", description="Sample terms for the text search"),
+):
+    """
+    Run `explain()` on each query shape used by the listing and search
+    endpoints and summarize the winning plan: stage chain, whether an index
+    is used, and keys/documents examined.
+    """
+    try:
+        return await asyncio.to_thread(explain_query_shapes, name=name, technology=technology, text=text)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error explaining queries: {str(e)}")
+
+@router.get("/admin/instruction-cache")
+async def instruction_cache_stats():
+    """
+    Hit rate, database reads, coalesced misses and change-stream state of
+    the instruction cache used by /ai/completions.
+    """
+    return instruction_cache.stats()
+
+@router.delete("/admin/instruction-cache")
+async def clear_instruction_cache():
+    """
+    Drop every cached instruction, e.g. after editing instructions directly in MongoDB.
+    """
+    instruction_cache.clear()
+    return {"status": "success", "message": "Instruction cache cleared"}
+
+@router.get("/admin/admission")
+async def admission_stats():
+    """
+    Live in-flight and queued requests per router group, with admitted,
+    rejected (429) and timed-out (503) counts.
+    """
+    return admission_controller.stats()
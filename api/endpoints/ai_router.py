@@ -1,12 +1,14 @@
 from fastapi import APIRouter, HTTPException, Body
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel, Field
 from typing import List, Optional
-from bson import ObjectId
 import openai
-import os
-from core.serviceInit import secondary_collection
-
-instructions_collection = secondary_collection
+import orjson
+import time
+from services.instruction_cache import instruction_cache, render_system_message
+from services.openai_client import openai_clients
+from services.completion_cache import completion_cache
+from services.metrics import observe_stage, stage_timer
 
 router = APIRouter()
 
@@ -26,22 +28,79 @@ class AIRequest(BaseModel):
     )
     model: str = Field("gpt-4", description="OpenAI model to use")
     temperature: float = Field(0.7, ge=0, le=1, description="Controls randomness")
+    stream: bool = Field(False, description="Stream tokens as server-sent events as they are generated")
+    use_cache: bool = Field(
+        True,
+        description="Set to false to skip the response cache lookup (the fresh answer is still cached)"
+    )
 
 async def get_instruction_data(instruction_id: str) -> dict:
-    """Fetch instruction and its strict_rules from MongoDB"""
+    """Fetch instruction, its strict_rules and rendered system message (cached)"""
     try:
-        document = instructions_collection.find_one({"_id": ObjectId(instruction_id)})
-        if not document:
-            raise HTTPException(status_code=404, detail="Instruction not found")
-        return {
-            "instruction": document["instruction"],
-            "strict_rules": document.get("strict_rules", [])
-        }
-    except Exception as e:
+        document = await instruction_cache.get(instruction_id)
+    except ValueError as e:
         raise HTTPException(
             status_code=400,
             detail=f"Invalid instruction ID: {str(e)}"
         )
+    if not document:
+        raise HTTPException(status_code=404, detail="Instruction not found")
+    return document
+
+def usage_summary(usage) -> Optional[dict]:
+    if usage is None:
+        return None
+    return {
+        "prompt_tokens": usage.prompt_tokens,
+        "completion_tokens": usage.completion_tokens
+    }
+
+# A cached answer costs no tokens
+NO_USAGE = {"prompt_tokens": 0, "completion_tokens": 0}
+
+def sse_event(data: dict, event: str = None) -> bytes:
+    prefix = f"event: {event}\n".encode() if event else b""
+    return prefix + b"data: " + orjson.dumps(data) + b"\n\n"
+
+async def stream_completion(stream, metadata: dict, on_complete=None):
+    """
+    Forward completion chunks as `data: {"delta": ...}` events, then one
+    `{"done": true, "metadata": ..., "usage": ...}` event and `data: [DONE]`.
+    Closing the upstream stream when the client disconnects stops generation.
+    `on_complete(text, usage)` is awaited once the whole answer has arrived.
+    """
+    usage = None
+    parts = []
+    started = time.perf_counter()
+    try:
+        async for chunk in stream:
+            if chunk.usage is not None:
+                usage = chunk.usage
+            for choice in chunk.choices:
+                if choice.delta and choice.delta.content:
+                    parts.append(choice.delta.content)
+                    yield sse_event({"delta": choice.delta.content})
+        if on_complete is not None:
+            await on_complete("".join(parts), usage_summary(usage))
+        yield sse_event({"done": True, "metadata": metadata, "usage": usage_summary(usage)})
+    except openai.APIError as e:
+        yield sse_event({"error": f"OpenAI API error: {str(e)}"}, event="error")
+    finally:
+        await stream.close()
+        observe_stage("openai_stream", time.perf_counter() - started)
+    yield b"data: [DONE]\n\n"
+
+async def replay_cached(response: str, metadata: dict):
+    yield sse_event({"delta": response})
+    yield sse_event({"done": True, "metadata": metadata, "usage": NO_USAGE})
+    yield b"data: [DONE]\n\n"
+
+def sse_response(events) -> StreamingResponse:
+    return StreamingResponse(
+        events,
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
 
 @router.post("/ai/completions")
 async def get_ai_completion(request: AIRequest):
@@ -49,6 +108,12 @@ async def get_ai_completion(request: AIRequest):
     Generates AI response with:
     - Either predefined instruction (via instruction_id) + its strict_rules
     - Or ad-hoc instructions + rules
+
+    With `stream: true` the answer is sent as server-sent events while it is
+    generated, ending with an event that carries metadata and token usage.
+
+    Answers at deterministic temperatures (<= COMPLETION_CACHE_MAX_TEMPERATURE)
+    are cached; `metadata.cache` reports exact, semantic, miss, bypass or disabled.
     """
     try:
         # Validate mutually exclusive parameters
@@ -64,28 +129,19 @@ async def get_ai_completion(request: AIRequest):
             instruction_data = await get_instruction_data(request.instruction_id)
             instructions = [instruction_data["instruction"]]
             strict_rules = instruction_data["strict_rules"]
+            system_message = instruction_data["system_message"]
         else:
             # Use provided values (default to empty lists if None)
             instructions = request.instructions or []
             strict_rules = request.strict_rules or []
+            system_message = render_system_message(instructions, strict_rules)
 
-        # Build system message
-        system_message_parts = ["You are an expert AI assistant that strictly follows rules."]
-        
-        if instructions:
-            system_message_parts.append("\nINSTRUCTIONS:")
-            system_message_parts.extend(f"- {i}" for i in instructions)
-            
-        if strict_rules:
-            system_message_parts.append("\nSTRICT RULES (MUST FOLLOW):")
-            system_message_parts.extend(f"- {r}" for r in strict_rules)
-
-        system_message = "\n".join(system_message_parts)
-
-        # Call OpenAI
-        client = openai.OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
-        
-        response = client.chat.completions.create(
+        metadata = {
+            "used_instruction_id": request.instruction_id,
+            "applied_instructions": instructions,
+            "applied_rules": strict_rules
+        }
+        options = dict(
             model=request.model,
             messages=[
                 {"role": "system", "content": system_message},
@@ -95,17 +151,50 @@ async def get_ai_completion(request: AIRequest):
             max_tokens=2000
         )
 
+        cache_args = (request.model, system_message, request.user_prompt, request.temperature)
+        cacheable = completion_cache.cacheable(request.temperature)
+        prompt_embedding = None
+        if not cacheable:
+            completion_cache.uncacheable += 1
+            metadata["cache"] = "disabled"
+        elif not request.use_cache:
+            completion_cache.bypassed += 1
+            metadata["cache"] = "bypass"
+        else:
+            cached, metadata["cache"], prompt_embedding = await completion_cache.lookup(*cache_args)
+            if cached is not None:
+                if "similarity" in cached:
+                    metadata["cache_similarity"] = cached["similarity"]
+                if request.stream:
+                    return sse_response(replay_cached(cached["response"], metadata))
+                return {"response": cached["response"], "metadata": metadata, "usage": NO_USAGE}
+
+        async def cache_answer(text: str, usage: Optional[dict]):
+            if cacheable:
+                completion_cache.store(*cache_args, {"response": text, "usage": usage}, prompt_embedding)
+
+        # Call OpenAI through the shared async client
+        client = openai_clients.client
+
+        if request.stream:
+            with stage_timer("openai_call"):
+                stream = await client.chat.completions.create(
+                    **options,
+                    stream=True,
+                    stream_options={"include_usage": True}
+                )
+            return sse_response(stream_completion(stream, metadata, cache_answer))
+
+        with stage_timer("openai_call"):
+            response = await client.chat.completions.create(**options)
+        answer = response.choices[0].message.content
+        usage = usage_summary(response.usage)
+        await cache_answer(answer, usage)
+
         return {
-            "response": response.choices[0].message.content,
-            "metadata": {
-                "used_instruction_id": request.instruction_id,
-                "applied_instructions": instructions,
-                "applied_rules": strict_rules
-            },
-            "usage": {
-                "prompt_tokens": response.usage.prompt_tokens,
-                "completion_tokens": response.usage.completion_tokens
-            }
+            "response": answer,
+            "metadata": metadata,
+            "usage": usage
         }
         
     except HTTPException:
@@ -113,4 +202,19 @@ async def get_ai_completion(request: AIRequest):
     except openai.APIError as e:
         raise HTTPException(502, f"OpenAI API error: {str(e)}")
     except Exception as e:
-        raise HTTPException(500, f"Internal error: {str(e)}")
\ No newline at end of file
+        raise HTTPException(500, f"Internal error: {str(e)}")
+
+@router.get("/ai/cache-stats")
+async def completion_cache_stats():
+    """
+    Exact and semantic hit counters of the completion response cache.
+    """
+    return completion_cache.stats()
+
+@router.delete("/ai/cache")
+async def clear_completion_cache():
+    """
+    Drop every cached completion.
+    """
+    completion_cache.clear()
+    return {"status": "success", "message": "Completion cache cleared"}
@@ -0,0 +1,50 @@
+from fastapi import APIRouter, HTTPException, Query, status
+from core.config import settings
+from services.embedding_analytics import embedding_analytics, STATS_ID, DUPLICATES_ID
+
+router = APIRouter()
+
+@router.post("/analytics/embeddings/run", status_code=status.HTTP_202_ACCEPTED)
+async def run_embedding_analytics(
+    duplicates: bool = Query(True, description="Also run near-duplicate detection"),
+    threshold: float = Query(settings.DUPLICATE_THRESHOLD, gt=0, le=1, description="Minimum cosine similarity of a near-duplicate pair"),
+):
+    """
+    Start a background pass over every stored image embedding. Results
+    replace the stored ones when the pass finishes.
+    """
+    if not embedding_analytics.start(duplicates, threshold):
+        raise HTTPException(status_code=409, detail="Embedding analytics are already running")
+    return {"status": "started", **embedding_analytics.status()}
+
+@router.get("/analytics/embeddings")
+async def get_embedding_analytics(
+    include_mean_vector: bool = Query(False, description="Include the mean embedding vector"),
+):
+    """
+    Stored collection-wide statistics: norm distribution, mean vector,
+    zero or non-finite vectors and dimension mismatches.
+    """
+    try:
+        projection = None if include_mean_vector else {"mean_vector": 0}
+        stats = embedding_analytics.stored(STATS_ID, projection)
+        return {"job": embedding_analytics.status(), "stats": stats}
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error reading embedding analytics: {str(e)}")
+
+@router.get("/analytics/duplicates")
+async def get_near_duplicates(
+    min_score: float = Query(0, ge=0, le=1, description="Only pairs at least this similar"),
+    limit: int = Query(100, ge=1, le=10000),
+):
+    """
+    Stored near-duplicate document pairs, most similar first.
+    """
+    try:
+        report = embedding_analytics.stored(DUPLICATES_ID)
+        if report is None:
+            return {"job": embedding_analytics.status(), "duplicates": None}
+        pairs = [pair for pair in report.pop("pairs") if pair["score"] >= min_score]
+        return {"job": embedding_analytics.status(), "duplicates": {**report, "pairs": pairs[:limit]}}
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error reading near-duplicates: {str(e)}")
@@ -1,35 +1,166 @@
-from fastapi import APIRouter, HTTPException, UploadFile, File, Form
-from services.clip import generate_image_embedding, generate_text_embedding
-from models.schemas import ImageUrlInput
-import requests
+from fastapi import APIRouter, HTTPException, UploadFile, File, Form, Query, Request
+from typing import List, Optional
+from core.config import settings
+from core.serialization import negotiate_embedding_format, embedding_response, batch_embedding_response
+from services.clip import embed_image, embed_text, embed_images, embed_texts, embed_image_urls, batch_stats, cache_stats, text_embedding_cache, image_embedding_cache
+from services.fetcher import image_fetcher, ImageFetchError, ImageTooLarge
+from services.executor import InferenceQueueFull
+from services.preprocess import ImageRejected
+from models.schemas import ImageUrlInput, ImageUrlBatchInput, QueryTextBatchInput
 
 router = APIRouter()
 
+FORMAT_DESCRIPTION = "Response encoding: json, base64, f32 or f16 (overrides the Accept header)"
+
+def queue_full_error(e: InferenceQueueFull) -> HTTPException:
+    return HTTPException(status_code=503, detail=f"Inference busy: {str(e)}", headers={"Retry-After": "1"})
+
 @router.post("/generate-embeddings")
-async def generate_embeddings(file: UploadFile = File(...)):
+async def generate_embeddings(
+    request: Request,
+    file: UploadFile = File(...),
+    response_format: Optional[str] = Query(None, alias="format", description=FORMAT_DESCRIPTION),
+):
+    response_format = negotiate_embedding_format(request, response_format)
     try:
         image_data = await file.read()
-        embedding_list = generate_image_embedding(image_data)
-        return {"embeddings": embedding_list}
+        embedding = await embed_image(image_data)
+        return embedding_response(embedding, response_format)
+    except InferenceQueueFull as e:
+        raise queue_full_error(e)
+    except ImageRejected as e:
+        raise HTTPException(status_code=413, detail=f"Image too large: {str(e)}")
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error generating embeddings: {str(e)}")
 
 @router.post("/generate-embeddings-from-url")
-async def generate_embeddings_from_url(image_url: ImageUrlInput):
+async def generate_embeddings_from_url(
+    request: Request,
+    image_url: ImageUrlInput,
+    response_format: Optional[str] = Query(None, alias="format", description=FORMAT_DESCRIPTION),
+):
+    response_format = negotiate_embedding_format(request, response_format)
     try:
-        response = requests.get(str(image_url.url), timeout=10)
-        response.raise_for_status()
-        embedding_list = generate_image_embedding(response.content)
-        return {"embeddings": embedding_list}
-    except requests.RequestException as e:
+        image_data = await image_fetcher.fetch(str(image_url.url))
+        embedding = await embed_image(image_data)
+        return embedding_response(embedding, response_format)
+    except InferenceQueueFull as e:
+        raise queue_full_error(e)
+    except ImageTooLarge as e:
+        raise HTTPException(status_code=413, detail=f"Error downloading image: {str(e)}")
+    except ImageRejected as e:
+        raise HTTPException(status_code=413, detail=f"Image too large: {str(e)}")
+    except ImageFetchError as e:
         raise HTTPException(status_code=400, detail=f"Error downloading image: {str(e)}")
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error generating embeddings: {str(e)}")
 
 @router.post("/generate-query-embedding")
-async def generate_query_embedding(query_text: str = Form(...)):
+async def generate_query_embedding(
+    request: Request,
+    query_text: str = Form(...),
+    response_format: Optional[str] = Query(None, alias="format", description=FORMAT_DESCRIPTION),
+):
+    response_format = negotiate_embedding_format(request, response_format)
+    try:
+        embedding = await embed_text(query_text)
+        return embedding_response(embedding, response_format)
+    except InferenceQueueFull as e:
+        raise queue_full_error(e)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error generating embedding: {str(e)}")
+
+def check_batch_size(count: int):
+    if count == 0:
+        raise HTTPException(status_code=400, detail="At least one item is required")
+    if count > settings.CLIP_BATCH_MAX_ITEMS:
+        raise HTTPException(
+            status_code=413,
+            detail=f"Too many items: {count} (max {settings.CLIP_BATCH_MAX_ITEMS})"
+        )
+
+@router.post("/generate-embeddings/batch")
+async def generate_embeddings_batch(
+    request: Request,
+    files: List[UploadFile] = File(...),
+    response_format: Optional[str] = Query(None, alias="format", description=FORMAT_DESCRIPTION),
+):
+    """
+    Generate embeddings for many uploaded images in one call.
+    Results are returned in upload order with per-item errors.
+    """
+    check_batch_size(len(files))
+    response_format = negotiate_embedding_format(request, response_format)
+    try:
+        image_data = [await file.read() for file in files]
+        results = await embed_images(image_data)
+        return batch_embedding_response(results, "Error generating embeddings", response_format)
+    except InferenceQueueFull as e:
+        raise queue_full_error(e)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error generating embeddings: {str(e)}")
+
+@router.post("/generate-embeddings-from-url/batch")
+async def generate_embeddings_from_url_batch(
+    request: Request,
+    batch: ImageUrlBatchInput,
+    response_format: Optional[str] = Query(None, alias="format", description=FORMAT_DESCRIPTION),
+):
+    """
+    Download and embed many images by URL in one call.
+    Results are returned in input order with per-item errors.
+    """
+    check_batch_size(len(batch.urls))
+    response_format = negotiate_embedding_format(request, response_format)
     try:
-        embedding_list = generate_text_embedding(query_text)
-        return {"embeddings": embedding_list}
+        results = await embed_image_urls(batch.urls)
+        return batch_embedding_response(results, "Error generating embeddings", response_format)
+    except InferenceQueueFull as e:
+        raise queue_full_error(e)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error generating embeddings: {str(e)}")
+
+@router.post("/generate-query-embedding/batch")
+async def generate_query_embedding_batch(
+    request: Request,
+    batch: QueryTextBatchInput,
+    response_format: Optional[str] = Query(None, alias="format", description=FORMAT_DESCRIPTION),
+):
+    """
+    Generate embeddings for many query texts in one call.
+    Results are returned in input order with per-item errors.
+    """
+    check_batch_size(len(batch.texts))
+    response_format = negotiate_embedding_format(request, response_format)
+    try:
+        results = await embed_texts(batch.texts)
+        return batch_embedding_response(results, "Error generating embedding", response_format)
+    except InferenceQueueFull as e:
+        raise queue_full_error(e)
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error generating embedding: {str(e)}")
+
+@router.get("/clip/batch-stats")
+async def get_batch_stats():
+    """
+    Batch-size and queue-wait statistics for the CLIP micro-batcher and
+    inference executor, plus image download counters.
+    """
+    return {**batch_stats(), "fetcher": image_fetcher.stats()}
+
+@router.get("/clip/cache-stats")
+async def get_cache_stats():
+    """
+    Hit/miss/eviction counters for the text query embedding cache and the
+    content-addressed image embedding cache (memory and disk tiers).
+    """
+    return cache_stats()
+
+@router.delete("/clip/cache")
+async def clear_cache():
+    """
+    Drop every cached text and image embedding, including the disk tier.
+    """
+    text_embedding_cache.clear()
+    image_embedding_cache.clear()
+    return {"status": "success", "message": "Embedding caches cleared"}
@@ -1,8 +1,11 @@
 from fastapi import APIRouter, HTTPException
 from bson import ObjectId
 import numpy as np
-from models.schemas import DocumentIdRequest
-from services.mongo import get_document_by_id
+from core.config import settings
+from models.schemas import DocumentIdRequest, MetaInfoRequest, MetaInfoBatchRequest
+from services.mongo import get_document_by_id, get_documents_by_ids
+from services.labels import get_label_matrix, score_labels, ranked_labels
+from services.embedding_codec import decode_embedding, storage_format_of
 
 router = APIRouter()
 
@@ -21,19 +24,19 @@ async def get_embedding_info(request: DocumentIdRequest):
             raise HTTPException(status_code=404, detail="Document not found")
 
         # Retrieve the imageEmbedding
-        embedding = document.get("mediaDetails", {}).get("imageEmbeddings")
-        if not embedding:
-            raise HTTPException(status_code=404, detail="Image embedding not found in the document")
+        stored_embedding = document.get("mediaDetails", {}).get("imageEmbeddings")
 
-        # Convert embedding to a NumPy array
-        embedding_array = np.array(embedding)
+        # Decode the embedding (BSON array or packed binary) to a NumPy array
+        embedding_array = decode_embedding(stored_embedding)
+        if embedding_array is None:
+            raise HTTPException(status_code=404, detail="Image embedding not found in the document")
 
         # Calculate insights
         dimensions = embedding_array.shape[0]
-        norm = np.linalg.norm(embedding_array)
-        mean_value = np.mean(embedding_array)
-        std_deviation = np.std(embedding_array)
-        max_value = np.max(embedding_array)
+        norm = float(np.linalg.norm(embedding_array))
+        mean_value = float(np.mean(embedding_array))
+        std_deviation = float(np.std(embedding_array))
+        max_value = float(np.max(embedding_array))
 
         return {
             "dimensions": dimensions,
@@ -41,7 +44,93 @@ async def get_embedding_info(request: DocumentIdRequest):
             "mean_value": mean_value,
             "std_deviation": std_deviation,
             "max_value": max_value,
+            "storage_format": storage_format_of(stored_embedding),
         }
 
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error: {str(e)}")
+
+def validate_labels(labels: list):
+    if not labels:
+        raise HTTPException(status_code=400, detail="At least one label is required")
+
+@router.post("/meta-info", tags=["Info"])
+async def get_meta_info(request: MetaInfoRequest):
+    """
+    Zero-shot label a stored document by scoring its image embedding against
+    the requested labels (defaults to `DEFAULT_LABELS`).
+    """
+    validate_labels(request.labels)
+    try:
+        document = get_document_by_id(request.id)
+        if not document:
+            raise HTTPException(status_code=404, detail="Document not found")
+
+        embedding = decode_embedding(document.get("mediaDetails", {}).get("imageEmbeddings"))
+        if embedding is None:
+            raise HTTPException(status_code=404, detail="Image embedding not found in the document")
+
+        label_matrix = await get_label_matrix(request.labels)
+        similarities, probabilities = score_labels(embedding, label_matrix)
+        labels = ranked_labels(request.labels, similarities[0], probabilities[0], request.top_k)
+
+        return {"id": request.id, "top_label": labels[0]["label"], "labels": labels}
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error: {str(e)}")
+
+@router.post("/meta-info/batch", tags=["Info"])
+async def get_meta_info_batch(request: MetaInfoBatchRequest):
+    """
+    Zero-shot label many stored documents at once. All embeddings are scored
+    against the label matrix in a single matrix product; documents that are
+    missing or have no usable embedding are reported per ID.
+    """
+    validate_labels(request.labels)
+    if len(request.ids) > settings.META_INFO_MAX_IDS:
+        raise HTTPException(
+            status_code=413,
+            detail=f"Too many ids: {len(request.ids)} (max {settings.META_INFO_MAX_IDS})"
+        )
+    try:
+        invalid_ids = [doc_id for doc_id in request.ids if not ObjectId.is_valid(doc_id)]
+        if invalid_ids:
+            raise HTTPException(status_code=400, detail=f"Invalid document IDs: {invalid_ids}")
+
+        documents = get_documents_by_ids(request.ids, {"mediaDetails.imageEmbeddings": 1})
+        label_matrix = await get_label_matrix(request.labels)
+        dimensions = label_matrix.shape[1]
+
+        errors, scored_ids, embeddings = {}, [], []
+        for doc_id in request.ids:
+            document = documents.get(doc_id)
+            embedding = decode_embedding(document.get("mediaDetails", {}).get("imageEmbeddings")) if document else None
+            if document is None:
+                errors[doc_id] = "Document not found"
+            elif embedding is None:
+                errors[doc_id] = "Image embedding not found in the document"
+            elif len(embedding) != dimensions:
+                errors[doc_id] = f"Embedding has {len(embedding)} dimensions, expected {dimensions}"
+            else:
+                scored_ids.append(doc_id)
+                embeddings.append(embedding)
+
+        scores = {}
+        if embeddings:
+            similarities, probabilities = score_labels(np.stack(embeddings), label_matrix)
+            for row, doc_id in enumerate(scored_ids):
+                labels = ranked_labels(request.labels, similarities[row], probabilities[row], request.top_k)
+                scores[doc_id] = {"top_label": labels[0]["label"], "labels": labels}
+
+        results = []
+        for doc_id in request.ids:
+            if doc_id in scores:
+                results.append({"id": doc_id, **scores[doc_id], "error": None})
+            else:
+                results.append({"id": doc_id, "top_label": None, "labels": [], "error": errors[doc_id]})
+        return {"count": len(results), "results": results}
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error: {str(e)}")
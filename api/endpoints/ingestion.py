@@ -0,0 +1,32 @@
+from fastapi import APIRouter, HTTPException
+import asyncio
+from services.ingestion import ingestion_worker
+
+router = APIRouter()
+
+@router.get("/ingestion/status")
+async def ingestion_status():
+    """
+    Throughput (images per second), lag and error counters of the background
+    embedding ingestion worker.
+    """
+    try:
+        # The lag figures come from blocking count and find queries
+        return await asyncio.to_thread(ingestion_worker.stats)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error reading ingestion status: {str(e)}")
+
+@router.post("/ingestion/run")
+async def run_ingestion():
+    """
+    Process one batch of documents missing embeddings now. When the worker is
+    running in the background it is woken up instead.
+    """
+    try:
+        if ingestion_worker.running:
+            ingestion_worker.wake()
+            return {"status": "success", "message": "Ingestion worker woken up"}
+        processed = await ingestion_worker.process_once()
+        return {"status": "success", "processed": processed}
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Ingestion failed: {str(e)}")
@@ -1,8 +1,13 @@
-from fastapi import APIRouter, HTTPException, Query, status
+from fastapi import APIRouter, HTTPException, Query, Request, status
 from bson import ObjectId
 from typing import List, Dict, Optional
 from pydantic import BaseModel
 from core.serviceInit import secondary_collection
+from services.pagination import InvalidCursor, count_cache, keyset_page
+from services.streaming import id_range_filter, stream_ids_response
+from services.indexes import text_filter, with_normalized_fields
+from core.config import settings
+from core.serialization import negotiate_stream_format
 
 instructions_collection = secondary_collection
 router = APIRouter()
@@ -15,18 +20,62 @@ class InstructionCreate(BaseModel):
 
 # API 1: List all instruction IDs
 @router.get("/instructions/ids", response_model=List[str])
-async def list_instruction_ids():
+async def list_instruction_ids(
+    request: Request,
+    start_after: Optional[str] = Query(None, description="Only IDs greater than this one"),
+    end_before: Optional[str] = Query(None, description="Only IDs less than this one"),
+    limit: Optional[int] = Query(None, ge=1, description="Maximum number of IDs to return"),
+    batch_size: int = Query(settings.STREAM_BATCH_SIZE, ge=1, le=10000, description="IDs fetched per database round trip"),
+    response_format: Optional[str] = Query(None, alias="format", description="json (array) or ndjson; also negotiated from Accept"),
+):
     """
-    Return a list of all instruction document IDs in the collection.
+    Stream the instruction document IDs in the collection, in `_id` order.
     """
+    response_format = negotiate_stream_format(request, response_format)
+    try:
+        query_filter = id_range_filter(start_after, end_before)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=f"Invalid ID range: {str(e)}")
     try:
-        return [str(doc["_id"]) for doc in instructions_collection.find({}, {"_id": 1})]
+        return stream_ids_response(instructions_collection, query_filter, response_format, limit, batch_size)
     except Exception as e:
         raise HTTPException(
             status_code=500, 
             detail=f"Error fetching instruction IDs: {str(e)}"
         )
 
+# API 5: Search instructions by content
+# Declared before /instructions/{id} so "search" is not captured as an id
+@router.get("/instructions/search", tags=["Instructions"])
+async def search_instructions(
+    query: str = Query(..., min_length=2),
+    limit: int = Query(5, ge=1, le=20)
+):
+    """
+    Full-text search across instruction content.
+    Uses the `instruction_text` index created at startup.
+    """
+    try:
+        cursor = instructions_collection.find(
+            {"$text": {"$search": query}},
+            {"score": {"$meta": "textScore"}}
+        ).sort([("score", {"$meta": "textScore"})]
+        ).limit(limit)
+
+        results = [{
+            "id": str(doc["_id"]),
+            "technology": doc["technology"],
+            "score": doc["score"],
+            "match": doc["instruction"][:150] + "..." if len(doc["instruction"]) > 150 else doc["instruction"]
+        } for doc in cursor]
+
+        return {"query": query, "results": results}
+    except Exception as e:
+        raise HTTPException(
+            status_code=500,
+            detail=f"Search failed: {str(e)}"
+        )
+
 # API 2: Get full instruction by ID
 @router.get("/instructions/{id}", response_model=Dict)
 async def get_instruction(
@@ -55,38 +104,50 @@ async def get_instruction(
 async def list_instructions(
     page: int = Query(1, ge=1),
     page_size: int = Query(10, ge=1, le=100),
-    technology: Optional[str] = Query(None, description="Filter by technology")
+    technology: Optional[str] = Query(None, description="Filter by technology"),
+    match: str = Query("contains", pattern="^(prefix|exact|contains)$", description="How `technology` matches: contains (case-insensitive substring, full scan), prefix (indexed) or exact (case-insensitive, indexed)"),
+    cursor: Optional[str] = Query(None, description="`next_cursor` from the previous page; takes precedence over `page`"),
+    exact_count: bool = Query(False, description="Count matching instructions exactly instead of using a cached or estimated total"),
 ):
     """
     Fetch paginated list of instructions with basic info.
+    Pass `next_cursor` back as `cursor` to fetch the next page.
     """
     try:
-        skip = (page - 1) * page_size
-        query_filter = {}
+        query_filter, collation = {}, None
         if technology:
-            query_filter["technology"] = {"$regex": technology, "$options": "i"}
+            query_filter, collation = text_filter("technology", technology, match)
 
-        cursor = instructions_collection.find(
+        docs, next_cursor = keyset_page(
+            instructions_collection,
             query_filter, 
-            {"_id": 1, "technology": 1, "instruction": 1,"strict_rules": 1}
-        ).skip(skip).limit(page_size)
+            {"_id": 1, "technology": 1, "instruction": 1,"strict_rules": 1},
+            page_size,
+            cursor,
+            page,
+            collation,
+        )
 
         instructions = [{
             "id": str(doc["_id"]),
             "technology": doc["technology"],
             "strictRules": doc["strict_rules"],
             "summary": doc["instruction"][:100] + "..." if len(doc["instruction"]) > 100 else doc["instruction"]
-        } for doc in cursor]
+        } for doc in docs]
 
-        total_count = instructions_collection.count_documents(query_filter)
+        total_count, is_exact = count_cache.count(instructions_collection, query_filter, exact_count, collation)
 
         return {
-            "page": page,
+            "page": None if cursor else page,
             "page_size": page_size,
             "total_instructions": total_count,
             "total_pages": (total_count + page_size - 1) // page_size,
+            "total_is_exact": is_exact,
+            "next_cursor": next_cursor,
             "instructions": instructions,
         }
+    except InvalidCursor as e:
+        raise HTTPException(status_code=400, detail=f"Invalid cursor: {str(e)}")
     except Exception as e:
         raise HTTPException(
             status_code=500, 
@@ -107,7 +168,8 @@ async def create_instruction(instruction: InstructionCreate):
     - strict_rules: List of mandatory rules
     """
     try:
-        result = instructions_collection.insert_one(instruction.dict())
+        result = instructions_collection.insert_one(with_normalized_fields("instructions", instruction.dict()))
+        count_cache.clear()
         return {
             "id": str(result.inserted_id),
             "status": "success",
@@ -118,41 +180,3 @@ async def create_instruction(instruction: InstructionCreate):
             status_code=500,
             detail=f"Instruction creation failed: {str(e)}"
         )
-
-# API 5: Search instructions by content
-@router.get("/instructions/search", tags=["Instructions"])
-async def search_instructions(
-    query: str = Query(..., min_length=2),
-    limit: int = Query(5, ge=1, le=20)
-):
-    """
-    Full-text search across instruction content.
-    """
-    try:
-        # Create text index if it doesn't exist
-        if "instruction_text" not in instructions_collection.index_information():
-            instructions_collection.create_index([
-                ("technology", "text"),
-                ("instruction", "text"),
-                ("strict_rules", "text")
-            ], name="instruction_text")
-
-        cursor = instructions_collection.find(
-            {"$text": {"$search": query}},
-            {"score": {"$meta": "textScore"}}
-        ).sort([("score", {"$meta": "textScore"})]
-        ).limit(limit)
-
-        results = [{
-            "id": str(doc["_id"]),
-            "technology": doc["technology"],
-            "score": doc["score"],
-            "match": doc["instruction"][:150] + "..." if len(doc["instruction"]) > 150 else doc["instruction"]
-        } for doc in cursor]
-
-        return {"query": query, "results": results}
-    except Exception as e:
-        raise HTTPException(
-            status_code=500,
-            detail=f"Search failed: {str(e)}"
-        )
\ No newline at end of file
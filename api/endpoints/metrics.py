@@ -0,0 +1,55 @@
+from fastapi import APIRouter, HTTPException, Query
+from fastapi.responses import PlainTextResponse
+from services.metrics import registry, profiles
+from services.admission import admission_controller
+from services.executor import inference_executor
+from services.clip import image_batcher, text_batcher
+
+router = APIRouter()
+
+registry.gauge(
+    "hf_admission_in_flight", "Requests running per admission group", ("group",),
+    lambda: {(name,): group.in_flight for name, group in admission_controller.groups.items()},
+)
+registry.gauge(
+    "hf_admission_queued", "Requests waiting per admission group", ("group",),
+    lambda: {(name,): group.queued for name, group in admission_controller.groups.items()},
+)
+registry.gauge(
+    "hf_inference_pending", "Inference executor submissions queued or running", (),
+    lambda: {(): inference_executor.stats()["pending"]},
+)
+registry.gauge(
+    "hf_batcher_queued", "Items waiting for a CLIP micro-batch", ("batcher",),
+    lambda: {(batcher.name,): batcher.stats()["queued"] for batcher in (image_batcher, text_batcher)},
+)
+
+@router.get("/metrics", response_class=PlainTextResponse)
+async def metrics():
+    """
+    Request and per-stage latency histograms, request counters and queue
+    gauges in the Prometheus text format.
+    """
+    return PlainTextResponse(registry.render(), media_type="text/plain; version=0.0.4; charset=utf-8")
+
+@router.get("/debug/profiles")
+async def list_profiles():
+    """
+    The most recent request profiles, without their stacks.
+    """
+    return profiles.summaries()
+
+@router.get("/debug/profiles/{profile_id}")
+async def get_profile(
+    profile_id: str,
+    folded: bool = Query(False, description="Return only the collapsed stacks as text, for flamegraph.pl or speedscope"),
+):
+    """
+    A request profile captured by sending the profiling header (see PROFILE_HEADER).
+    """
+    profile = profiles.get(profile_id)
+    if profile is None:
+        raise HTTPException(status_code=404, detail="Profile not found")
+    if folded:
+        return PlainTextResponse(profile["folded"])
+    return profile
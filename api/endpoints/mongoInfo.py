@@ -1,20 +1,39 @@
-from fastapi import APIRouter, HTTPException, Query, status
+from fastapi import APIRouter, HTTPException, Query, Request, status
 from bson import ObjectId
 from typing import List, Dict, Optional
 from services.mongo import collection
+from services.embedding_codec import decode_embedding
+from services.ingestion import ingestion_worker
+from services.pagination import InvalidCursor, count_cache, keyset_page
+from services.streaming import id_range_filter, stream_ids_response
+from services.indexes import text_filter, with_normalized_fields
+from core.config import settings
+from core.serialization import negotiate_stream_format
 
 router = APIRouter()
 
 # API 1: List of document IDs
 @router.get("/list-ids", response_model=List[str])
-async def list_ids():
+async def list_ids(
+    request: Request,
+    start_after: Optional[str] = Query(None, description="Only IDs greater than this one"),
+    end_before: Optional[str] = Query(None, description="Only IDs less than this one"),
+    limit: Optional[int] = Query(None, ge=1, description="Maximum number of IDs to return"),
+    batch_size: int = Query(settings.STREAM_BATCH_SIZE, ge=1, le=10000, description="IDs fetched per database round trip"),
+    response_format: Optional[str] = Query(None, alias="format", description="json (array) or ndjson; also negotiated from Accept"),
+):
     """
-    Return a list of all document IDs in the collection.
+    Stream the document IDs in the collection, in `_id` order.
+    The response is sent while the cursor advances, so memory stays flat; an
+    export can resume by passing its last ID as `start_after`.
     """
+    response_format = negotiate_stream_format(request, response_format)
+    try:
+        query_filter = id_range_filter(start_after, end_before)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=f"Invalid ID range: {str(e)}")
     try:
-        # Retrieve document IDs
-        document_ids = [str(doc["_id"]) for doc in collection.find({}, {"_id": 1})]
-        return document_ids
+        return stream_ids_response(collection, query_filter, response_format, limit, batch_size)
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error fetching document IDs: {str(e)}")
 
@@ -44,6 +63,11 @@ async def get_document(
         
         # Convert document ID to string for readability
         document["_id"] = str(document["_id"])
+
+        # Packed binary embeddings are returned as a plain float array
+        media_details = document.get("mediaDetails", {})
+        if media_details.get("imageEmbeddings") is not None:
+            media_details["imageEmbeddings"] = decode_embedding(media_details["imageEmbeddings"]).tolist()
         
         return document
     except Exception as e:
@@ -53,31 +77,39 @@ async def get_document(
 async def list_documents(
     page: int = Query(1, ge=1, description="Page number (1-based)"),
     page_size: int = Query(10, ge=1, le=100, description="Number of documents per page (max 100)"),
-    name: Optional[str] = Query(None, description="Filter documents by name (partial match supported)"),
+    name: Optional[str] = Query(None, description="Filter documents by name"),
+    match: str = Query("contains", pattern="^(prefix|exact|contains)$", description="How `name` matches: contains (case-insensitive substring, full scan), prefix (indexed) or exact (case-insensitive, indexed)"),
+    cursor: Optional[str] = Query(None, description="`next_cursor` from the previous page; takes precedence over `page`"),
+    exact_count: bool = Query(False, description="Count matching documents exactly instead of using a cached or estimated total"),
 ):
     """
     Fetch paginated list of documents containing only `id` and `name` fields.
+    Pass `next_cursor` back as `cursor` to fetch the next page; unlike `page`,
+    its cost does not grow with depth.
     """
     try:
-        skip = (page - 1) * page_size
-        query_filter = {}
+        query_filter, collation = {}, None
         if name:
-            # Add case-insensitive partial match for `name`
-            query_filter["name"] = {"$regex": name, "$options": "i"}
+            # Case-insensitive match on `name`, served by the indexes declared in services/indexes.py
+            query_filter, collation = text_filter("name", name, match)
 
-        cursor = collection.find(query_filter, {"_id": 1, "name": 1}).skip(skip).limit(page_size)
+        docs, next_cursor = keyset_page(collection, query_filter, {"_id": 1, "name": 1}, page_size, cursor, page, collation)
 
-        documents = [{"id": str(doc["_id"]), "name": doc.get("name", None)} for doc in cursor]
+        documents = [{"id": str(doc["_id"]), "name": doc.get("name", None)} for doc in docs]
 
-        total_count = collection.count_documents(query_filter)
+        total_count, is_exact = count_cache.count(collection, query_filter, exact_count, collation)
 
         return {
-            "page": page,
+            "page": None if cursor else page,
             "page_size": page_size,
             "total_documents": total_count,
             "total_pages": (total_count + page_size - 1) // page_size,
+            "total_is_exact": is_exact,
+            "next_cursor": next_cursor,
             "documents": documents,
         }
+    except InvalidCursor as e:
+        raise HTTPException(status_code=400, detail=f"Invalid cursor: {str(e)}")
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error fetching documents: {str(e)}")
     
@@ -94,15 +126,19 @@ async def insert_document(
     - **image_url**: Valid HTTP/HTTPS URL for the image
     """
     try:
-        document = {
+        document = with_normalized_fields("documents", {
             "name": name.strip(),
             "mediaDetails": {
                 "imageUrl": image_url.strip()
             }        
-        }
+        })
 
         result = collection.insert_one(document)
-        
+        count_cache.clear()
+
+        # Let the ingestion worker pick up the new image without waiting for its next poll
+        ingestion_worker.wake()
+
         return {
             "id": str(result.inserted_id),
             "status": "success",
@@ -1,90 +1,88 @@
-from fastapi import APIRouter, HTTPException, Body
-from pydantic import BaseModel, Field
-from typing import List, Optional
-import openai
-import os
+from fastapi import APIRouter, HTTPException, UploadFile, File, Form
+from typing import Optional
+import asyncio
+from models.schemas import QueryRequest, SearchByTextRequest, SearchOptions
+from services.clip import embed_image, embed_text
+from services.preprocess import ImageRejected
+from services.executor import InferenceQueueFull
+from services.mongo import search_embeddings
+from services.embedding_codec import decode_embedding
+from endpoints.clip import queue_full_error
 
 router = APIRouter()
 
-# Request Model
-class AIRequest(BaseModel):
-    user_prompt: str = Field(..., description="The user's main question or task")
-    instructions: Optional[List[str]] = Field(
-        None, 
-        description="List of guiding instructions for the AI"
-    )
-    strict_rules: Optional[List[str]] = Field(
-        None,
-        description="List of non-negotiable rules the AI must follow"
-    )
-    model: str = Field(
-        "gpt-4", 
-        description="OpenAI model to use (e.g., gpt-4, gpt-3.5-turbo)"
-    )
-    temperature: float = Field(
-        0.7, 
-        ge=0, 
-        le=1, 
-        description="Controls randomness (0=deterministic, 1=creative)"
+def run_search(query_embedding: list, options: SearchOptions) -> list:
+    """
+    Run a vector search and make the documents JSON-friendly. Blocking: the
+    first call may build the local index, so handlers use `search()`.
+    """
+    documents = search_embeddings(
+        query_embedding,
+        limit=options.limit,
+        num_candidates=options.num_candidates,
+        include_embeddings=options.include_embeddings,
+        rerank=options.rerank,
+        rerank_factor=options.rerank_factor,
     )
+    for document in documents:
+        document["_id"] = str(document["_id"])
+        media_details = document.get("mediaDetails", {})
+        if media_details.get("imageEmbeddings") is not None:
+            media_details["imageEmbeddings"] = decode_embedding(media_details["imageEmbeddings"]).tolist()
+    return documents
+
+async def search(query_embedding: list, options: SearchOptions) -> list:
+    # Index builds, Mongo reads and exact reranking all stay off the event loop
+    return await asyncio.to_thread(run_search, query_embedding, options)
 
-@router.post("/ai/completions", summary="Get AI completion with instructions")
-async def get_ai_completion(request: AIRequest):
+@router.post("/search/by-text", summary="Search images by a text query")
+async def search_by_text(request: SearchByTextRequest):
     """
-    Generates AI response with strict adherence to provided instructions and rules.
-    
-    The system message will contain the rules/instructions, while the user message 
-    contains the prompt. This ensures clear separation of concerns in the chat context.
+    Embed `query_text` with CLIP and return the closest documents in one call.
     """
     try:
-        # Build system message with instructions and rules
-        system_message_parts = []
-        
-        if request.instructions:
-            system_message_parts.append("INSTRUCTIONS:")
-            system_message_parts.extend([f"- {i}" for i in request.instructions])
-            
-        if request.strict_rules:
-            system_message_parts.append("\nSTRICT RULES (MUST FOLLOW):")
-            system_message_parts.extend([f"- {r}" for r in request.strict_rules])
-        
-        system_message = "\n".join(system_message_parts) if system_message_parts else (
-            "You are a helpful AI assistant that provides accurate and concise responses."
-        )
+        query_embedding = await embed_text(request.query_text)
+        return {"query_text": request.query_text, "results": await search(query_embedding, request)}
+    except InferenceQueueFull as e:
+        raise queue_full_error(e)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Search failed: {str(e)}")
 
-        client = openai.OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
-        
-        response = client.chat.completions.create(
-            model=request.model,
-            messages=[
-                {
-                    "role": "system",
-                    "content": system_message
-                },
-                {
-                    "role": "user",
-                    "content": request.user_prompt
-                }
-            ],
-            temperature=request.temperature,
-            max_tokens=2000
-        )
+@router.post("/search/by-image", summary="Search images by an example image")
+async def search_by_image(
+    file: UploadFile = File(...),
+    limit: int = Form(5, ge=1, le=100),
+    num_candidates: Optional[int] = Form(None, ge=1, le=10000),
+    rerank: bool = Form(False),
+    rerank_factor: int = Form(4, ge=1, le=20),
+    include_embeddings: bool = Form(False),
+):
+    """
+    Embed the uploaded image with CLIP and return the closest documents in one call.
+    """
+    options = SearchOptions(
+        limit=limit,
+        num_candidates=num_candidates,
+        rerank=rerank,
+        rerank_factor=rerank_factor,
+        include_embeddings=include_embeddings,
+    )
+    try:
+        query_embedding = await embed_image(await file.read())
+        return {"filename": file.filename, "results": await search(query_embedding, options)}
+    except InferenceQueueFull as e:
+        raise queue_full_error(e)
+    except ImageRejected as e:
+        raise HTTPException(status_code=413, detail=f"Image too large: {str(e)}")
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Search failed: {str(e)}")
 
-        return {
-            "response": response.choices[0].message.content,
-            "usage": {
-                "prompt_tokens": response.usage.prompt_tokens,
-                "completion_tokens": response.usage.completion_tokens
-            }
-        }
-        
-    except openai.APIError as e:
-        raise HTTPException(
-            status_code=502,
-            detail=f"OpenAI API error: {str(e)}"
-        )
+@router.post("/search/by-embedding", summary="Search images by a precomputed embedding")
+async def search_by_embedding(request: QueryRequest):
+    """
+    Return the documents closest to an embedding the client already has.
+    """
+    try:
+        return {"results": await search(request.query_embedding, request)}
     except Exception as e:
-        raise HTTPException(
-            status_code=500,
-            detail=f"Internal server error: {str(e)}"
-        )
\ No newline at end of file
+        raise HTTPException(status_code=500, detail=f"Search failed: {str(e)}")
@@ -0,0 +1,65 @@
+from fastapi import APIRouter, HTTPException, Query
+import asyncio
+from services.search_backend import get_search_backend, LocalSearchBackend
+
+router = APIRouter()
+
+def local_backend() -> LocalSearchBackend:
+    backend = get_search_backend()
+    if not isinstance(backend, LocalSearchBackend):
+        raise HTTPException(
+            status_code=409,
+            detail=f"Local vector index is not in use (VECTOR_SEARCH_BACKEND={backend.name})"
+        )
+    return backend
+
+@router.get("/vector-index/stats")
+async def vector_index_stats():
+    """
+    Describe the active vector search backend.
+    The local index is loaded or built on first use, off the event loop.
+    """
+    try:
+        return await asyncio.to_thread(lambda: get_search_backend().stats())
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error reading vector index stats: {str(e)}")
+
+@router.get("/vector-index/evaluate")
+async def evaluate_vector_index(
+    k: int = Query(10, ge=1, le=100),
+    queries: int = Query(100, ge=1, le=1000, description="Number of stored vectors to use as queries"),
+    nprobe: int = Query(None, ge=1, description="Cells to probe (defaults to VECTOR_INDEX_NPROBE)"),
+):
+    """
+    Report recall@k and latency of the local approximate index against
+    exact brute-force search.
+    """
+    backend = local_backend()
+    try:
+        return await asyncio.to_thread(backend.evaluate, k=k, queries=queries, nprobe=nprobe)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error evaluating vector index: {str(e)}")
+
+@router.post("/vector-index/rebuild")
+async def rebuild_vector_index():
+    """
+    Rebuild the local index from the collection and persist it to disk.
+    The scan, k-means training and save run on a worker thread.
+    """
+    backend = local_backend()
+    try:
+        return await asyncio.to_thread(backend.rebuild)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error rebuilding vector index: {str(e)}")
+
+@router.post("/vector-index/save")
+async def save_vector_index():
+    """
+    Persist the local index to `VECTOR_INDEX_PATH`.
+    """
+    backend = local_backend()
+    try:
+        await asyncio.to_thread(backend.save)
+        return {"status": "success", "path": backend.path}
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error saving vector index: {str(e)}")
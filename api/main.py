@@ -1,32 +1,118 @@
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse
+import asyncio
+import time
 
-from core.serviceInit import client, db, collection, model, processor, tokenizer
+from core.serviceInit import client, check_mongo, clip_runtime, logger, record_timing, startup_timings
 
 from core.config import settings
+from models.schemas import DEFAULT_LABELS
+from services.labels import get_label_matrix
 from endpoints.clip import router as clip_router
 from endpoints.search import router as search_router
 from endpoints.info import router as info_router
 from endpoints.mongoInfo import router as mongoInfo_router
 from endpoints.ai_router import router as ai_router
 from endpoints.instructions import router as instructions_router
+from endpoints.vector_index import router as vector_index_router
+from endpoints.ingestion import router as ingestion_router
+from endpoints.admin import router as admin_router
+from endpoints.analytics import router as analytics_router
+from endpoints.metrics import router as metrics_router
+from services.ingestion import ingestion_worker
+from services.fetcher import image_fetcher
+from services.clip import image_embedding_cache
+from services.search_backend import get_search_backend, LocalSearchBackend
+from services.executor import inference_executor
+from services.indexes import index_manager
+from services.instruction_cache import instruction_cache
+from services.openai_client import openai_clients
+from services.admission import AdmissionMiddleware, admission_controller
+from services.metrics import MetricsMiddleware
 
 # Initialize the FastAPI app
 app = FastAPI(title=settings.PROJECT_NAME, version=settings.VERSION)
+# Added before CORS so rejected requests still carry CORS headers
+app.add_middleware(AdmissionMiddleware, controller=admission_controller)
+# Outside admission control, so shed requests are counted too
+if settings.METRICS_ENABLED:
+    app.add_middleware(
+        MetricsMiddleware,
+        profiling=settings.PROFILING_ENABLED,
+        profile_header=settings.PROFILE_HEADER,
+        profile_interval_ms=settings.PROFILE_INTERVAL_MS,
+    )
 app.add_middleware(
     CORSMiddleware,
     allow_origins=["*"],
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Embedding-Dtype", "X-Embedding-Shape", "X-Embedding-Failed", "Retry-After", "X-Profile-Id"],
 )
 # Include routers
 app.include_router(ai_router, prefix="", tags=["Open AI"])
 app.include_router(clip_router, prefix="", tags=["CLIP"])
-# app.include_router(search_router, prefix="", tags=["Search"])
+app.include_router(search_router, prefix="", tags=["Search"])
 app.include_router(info_router, prefix="", tags=["Info"])
 app.include_router(mongoInfo_router, prefix="", tags=["MongoData"])
 app.include_router(instructions_router, prefix="", tags=["Instructions"])
+app.include_router(vector_index_router, prefix="", tags=["VectorIndex"])
+app.include_router(ingestion_router, prefix="", tags=["Ingestion"])
+app.include_router(admin_router, prefix="", tags=["Admin"])
+app.include_router(analytics_router, prefix="", tags=["Analytics"])
+app.include_router(metrics_router, prefix="", tags=["Metrics"])
+
+@app.on_event("startup")
+async def initialize_services():
+    """
+    Check MongoDB and, with CLIP_EAGER_LOAD, load CLIP up front, optionally
+    warm it up, and encode the default zero-shot labels. Otherwise CLIP loads
+    on its first use. Each step's duration is logged and shown by /readyz.
+    """
+    started = time.perf_counter()
+    try:
+        await asyncio.to_thread(check_mongo)
+        record_timing("MongoDB ping", started)
+        started = time.perf_counter()
+        await asyncio.to_thread(index_manager.ensure)
+        record_timing("MongoDB indexes", started)
+    except Exception as e:
+        logger.error(f"Failed to connect to MongoDB: {e}")
+
+    if not settings.CLIP_EAGER_LOAD:
+        logger.info("CLIP model will load on first use")
+        return
+    await inference_executor.run(clip_runtime.load)
+    if settings.CLIP_WARMUP:
+        await inference_executor.run(clip_runtime.warm_up)
+    if clip_runtime.supports_text:
+        started = time.perf_counter()
+        await get_label_matrix(DEFAULT_LABELS)
+        record_timing("default label embeddings", started)
+
+@app.on_event("startup")
+async def start_ingestion_worker():
+    if settings.INGESTION_ENABLED:
+        ingestion_worker.start()
+    if settings.INSTRUCTION_CHANGE_STREAM:
+        instruction_cache.start_watching()
+
+@app.on_event("shutdown")
+async def stop_background_work():
+    await ingestion_worker.stop()
+    instruction_cache.stop_watching()
+    await image_fetcher.aclose()
+    await openai_clients.aclose()
+    if image_embedding_cache.disk is not None:
+        image_embedding_cache.disk.flush()
+
+@app.on_event("shutdown")
+def save_vector_index():
+    backend = get_search_backend()
+    if isinstance(backend, LocalSearchBackend):
+        backend.save()
 
 # Add "/" endpoint
 @app.get("/", tags=["Root"])
@@ -49,6 +135,42 @@ async def health_check():
     except Exception as e:
         return {"status": "error", "message": f"Service unhealthy: {str(e)}"}
 
+# Add "/readyz" endpoint
+@app.get("/readyz", tags=["Health"])
+async def readiness_check():
+    """
+    Readiness probe: 200 once MongoDB answers and, when CLIP_EAGER_LOAD is
+    set, the CLIP model is loaded (and warmed up if CLIP_WARMUP is set).
+    Returns 503 until then. Also reports per-component startup timings.
+    """
+    checks = {}
+    try:
+        await asyncio.to_thread(check_mongo)
+        checks["mongo"] = "ok"
+    except Exception as e:
+        checks["mongo"] = f"error: {str(e)}"
+
+    clip = clip_runtime.status()
+    if clip["error"]:
+        checks["clip"] = f"error: {clip['error']}"
+    elif settings.CLIP_EAGER_LOAD and not clip["loaded"]:
+        checks["clip"] = "loading"
+    elif settings.CLIP_EAGER_LOAD and settings.CLIP_WARMUP and not clip["warmed_up"]:
+        checks["clip"] = "warming up"
+    else:
+        checks["clip"] = "ok" if clip["loaded"] else "lazy"
+
+    ready = all(value in ("ok", "lazy") for value in checks.values())
+    return JSONResponse(
+        status_code=200 if ready else 503,
+        content={
+            "status": "ready" if ready else "not ready",
+            "checks": checks,
+            "clip": clip,
+            "startup_timings": startup_timings,
+        },
+    )
+
 # For running with Uvicorn
 if __name__ == "__main__":
     import os
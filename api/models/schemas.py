@@ -1,17 +1,20 @@
-from pydantic import BaseModel, HttpUrl
-from typing import List
+from pydantic import BaseModel, Field, HttpUrl
+from typing import List, Optional
 from constants.labelInfo import PREDEFINED_LABELS
+from core.serialization import EmbeddingVector
 from dotenv import load_dotenv
 import os
 
 load_dotenv()
 
+# Embedding fields accept a float array, a base64 string of little-endian
+# float32, or {"b64": ..., "dtype": "float16"}; they validate to NumPy vectors
 class EmbeddingInput(BaseModel):
-    embedding_list: List[float]
+    embedding_list: EmbeddingVector
 
 class EmbeddingQuery(BaseModel):
-    embedding_list: List[float]
-    query_embedding: List[float]
+    embedding_list: EmbeddingVector
+    query_embedding: EmbeddingVector
 
 class ImageUrlInput(BaseModel):
     """
@@ -19,16 +22,36 @@ class ImageUrlInput(BaseModel):
     """
     url: HttpUrl
 
-class QueryRequest(BaseModel):
+class ImageUrlBatchInput(BaseModel):
+    """
+    Schema for validating a list of image URLs to embed in one call.
+    """
+    urls: List[HttpUrl]
+
+class QueryTextBatchInput(BaseModel):
+    """
+    Schema for validating a list of query texts to embed in one call.
+    """
+    texts: List[str]
+
+class SearchOptions(BaseModel):
+    """
+    Tuning options shared by the vector search endpoints.
+    """
+    limit: int = Field(5, ge=1, le=100)
+    num_candidates: Optional[int] = Field(None, ge=1, le=10000, description="Atlas numCandidates (defaults to VECTOR_SEARCH_NUM_CANDIDATES)")
+    rerank: bool = Field(False, description="Re-order an over-fetched candidate set by exact cosine similarity")
+    rerank_factor: int = Field(4, ge=1, le=20, description="Candidates fetched per result when reranking")
+    include_embeddings: bool = False
+
+class QueryRequest(SearchOptions):
     """
     Schema for validating a query embedding request for searching similar items.
     """
-    query_embedding: List[float]
-    limit: int = 5
+    query_embedding: EmbeddingVector
 
-class SearchByTextRequest(BaseModel):
+class SearchByTextRequest(SearchOptions):
     query_text: str
-    limit: int = 5
     
 class DocumentIdRequest(BaseModel):
     id: str
@@ -39,4 +62,10 @@ DEFAULT_LABELS = ENV_LABELS.split(",") if ENV_LABELS else PREDEFINED_LABELS
 
 class MetaInfoRequest(BaseModel):
     id: str
-    labels: List[str] = DEFAULT_LABELS
\ No newline at end of file
+    labels: List[str] = DEFAULT_LABELS
+    top_k: Optional[int] = None
+
+class MetaInfoBatchRequest(BaseModel):
+    ids: List[str]
+    labels: List[str] = DEFAULT_LABELS
+    top_k: Optional[int] = None
@@ -0,0 +1,73 @@
+"""
+Compare CLIP inference backends on this machine: parity with the eager fp32
+torch reference and throughput per tower.
+
+Usage (from the api/ directory):
+    python -m scripts.benchmark_backends
+    python -m scripts.benchmark_backends --backends torch torch-int8 --batch-size 32 --iterations 20
+
+Prints one JSON report per backend and the fastest backend that passes the
+parity threshold; set CLIP_BACKEND to it for this deployment.
+"""
+import argparse
+import json
+import logging
+
+from core.config import settings
+from core.serviceInit import ClipRuntime, clip_backend_options
+from services.clip_backends import BACKENDS, benchmark, create_backend, parity_check, sample_inputs
+
+logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(message)s")
+logger = logging.getLogger(__name__)
+
+
+def compare(backends: list, batch_size: int, iterations: int, threshold: float) -> list:
+    runtime = ClipRuntime(settings.CLIP_MODEL_NAME, settings.CLIP_LOAD_MODE, settings.CLIP_SNAPSHOT_PATH)
+    runtime.load()
+    reference = runtime.backend
+    processor = runtime.processor if runtime.supports_images else None
+    tokenizer = runtime.tokenizer if runtime.supports_text else None
+    inputs = sample_inputs(processor, tokenizer, runtime.mode, count=batch_size)
+
+    reports = []
+    for name in backends:
+        try:
+            options = clip_backend_options(name, runtime.model_name, runtime.mode)
+            backend = create_backend(name, runtime.model, runtime.mode, **options)
+        except Exception as e:
+            logger.error(f"Skipping backend {name}: {e}")
+            continue
+        report = {
+            "parity": parity_check(backend, reference, inputs, threshold),
+            "throughput": benchmark(backend, inputs, iterations),
+        }
+        print(json.dumps({"backend": name, **report}, indent=2))
+        reports.append((name, report))
+    return reports
+
+
+def items_per_second(report: dict) -> float:
+    # Rank by the slower tower so a fast image path cannot hide a slow text path
+    towers = [value for key, value in report["throughput"].items() if key != "backend"]
+    return min(tower["items_per_second"] for tower in towers)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--backends", nargs="+", choices=list(BACKENDS), default=list(BACKENDS))
+    parser.add_argument("--batch-size", type=int, default=settings.CLIP_MAX_BATCH_SIZE)
+    parser.add_argument("--iterations", type=int, default=10)
+    parser.add_argument("--threshold", type=float, default=settings.CLIP_PARITY_THRESHOLD)
+    args = parser.parse_args()
+
+    reports = compare(args.backends, args.batch_size, args.iterations, args.threshold)
+    passing = [(name, report) for name, report in reports if report["parity"]["passed"]]
+    if passing:
+        best, report = max(passing, key=lambda item: items_per_second(item[1]))
+        print(f"Fastest backend meeting the parity threshold: {best} ({items_per_second(report):.1f} items/s)")
+    else:
+        print("No backend met the parity threshold")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,539 @@
+"""
+Load-test the service end to end and compare the results with a baseline.
+
+Usage (from the api/ directory):
+    python -m scripts.benchmark_service
+    python -m scripts.benchmark_service --scenarios embed-image list-documents --concurrency 16 --requests 2000
+    python -m scripts.benchmark_service --mode uvicorn --clip real --output data/benchmarks/cpu.json
+    python -m scripts.benchmark_service --baseline data/benchmarks/main.json --tolerance 0.1
+    python -m scripts.benchmark_service --url http://localhost:5000 --scenarios list-documents
+
+By default the app runs in this process behind an ASGI transport, MongoDB
+is an in-memory mongomock database (`pip install mongomock`) seeded with
+synthetic documents and instructions, CLIP is a deterministic stub and
+/ai/completions talks to a local mock OpenAI server, so results depend only
+on this code and this machine. `--mode uvicorn` serves the app over real
+HTTP instead, `--clip real` loads the configured CLIP model on CPU, and
+`--mongo-uri` seeds (and first clears) `--database` on a real server.
+
+Each scenario is a closed loop of `--concurrency` clients issuing
+`--requests` requests (or running for `--duration` seconds) after
+`--warmup` unmeasured ones. Prints latency percentiles and requests per
+second per scenario, saves them as JSON with `--output`, and with
+`--baseline` exits 1 when a scenario's p95 or throughput regressed by more
+than `--tolerance`.
+"""
+import argparse
+import asyncio
+import json
+import logging
+import os
+import platform
+import random
+import socket
+import subprocess
+import sys
+import time
+from collections import Counter
+from contextlib import asynccontextmanager
+from datetime import datetime, timezone
+
+import httpx
+import numpy as np
+
+logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(message)s")
+logger = logging.getLogger(__name__)
+# One log line per request would dominate the output and the measurements
+logging.getLogger("httpx").setLevel(logging.WARNING)
+
+MODES = ("inprocess", "uvicorn")
+CLIP_MODES = ("stub", "real")
+
+
+class BenchContext:
+    """
+    Data shared by the scenarios: seeded ids, synthetic images and prompts.
+    """
+
+    def __init__(self, document_ids: list, instruction_ids: list, images: list, mongomock: bool):
+        self.document_ids = document_ids
+        self.instruction_ids = instruction_ids
+        self.images = images
+        self.mongomock = mongomock
+        self.next_image = 0
+
+    def image(self) -> bytes:
+        # Round-robin so concurrent clients upload different images
+        image = self.images[self.next_image % len(self.images)]
+        self.next_image += 1
+        return image
+
+
+class Scenario:
+    """
+    One benchmarked request type. `call(client, context, state)` issues a
+    request and returns the response; `state` is private to each client.
+    `requires` lists what must be available: "documents", "instructions",
+    "images" or "text-search".
+    """
+
+    def __init__(self, name: str, description: str, call, requires: tuple = ()):
+        self.name = name
+        self.description = description
+        self.call = call
+        self.requires = requires
+
+
+def phrase(rng: random.Random) -> str:
+    from scripts.benchmark_standins import random_phrase
+    return random_phrase(rng)
+
+
+async def embed_image(client, context, state):
+    files = {"file": ("image.jpg", context.image(), "image/jpeg")}
+    return await client.post("/generate-embeddings", files=files)
+
+
+async def embed_image_batch(client, context, state):
+    files = [("files", (f"image{i}.jpg", context.image(), "image/jpeg")) for i in range(16)]
+    return await client.post("/generate-embeddings/batch", files=files)
+
+
+async def embed_text(client, context, state):
+    return await client.post("/generate-query-embedding", data={"query_text": f"{phrase(state['rng'])} {state['rng'].random()}"})
+
+
+async def search_text(client, context, state):
+    return await client.post("/search/by-text", json={"query_text": f"{phrase(state['rng'])} {state['rng'].random()}", "limit": 10})
+
+
+async def get_document(client, context, state):
+    return await client.get(f"/get-document/{state['rng'].choice(context.document_ids)}")
+
+
+async def list_documents(client, context, state):
+    return await client.get("/list-documents", params={"page": state["rng"].randint(1, 10), "page_size": 20})
+
+
+async def list_documents_by_name(client, context, state):
+    return await client.get("/list-documents", params={"name": f"Document {state['rng'].randint(0, 99):02d}", "match": "prefix", "page_size": 20})
+
+
+async def paginate_documents(client, context, state):
+    # Each client walks the whole collection with keyset cursors, then starts over
+    params = {"page_size": 50}
+    if state.get("cursor"):
+        params["cursor"] = state["cursor"]
+    response = await client.get("/list-documents", params=params)
+    if response.status_code == 200:
+        state["cursor"] = response.json().get("next_cursor")
+    return response
+
+
+async def create_instruction(client, context, state):
+    rng = state["rng"]
+    return await client.post("/instructions", json={
+        "technology": rng.choice(("Python", "FastAPI", "MongoDB", "React")),
+        "instruction": f"Benchmark instruction about {phrase(rng)}.",
+        "strict_rules": [f"Never {phrase(rng)}."],
+    })
+
+
+async def get_instruction(client, context, state):
+    return await client.get(f"/instructions/{state['rng'].choice(context.instruction_ids)}")
+
+
+async def list_instructions(client, context, state):
+    return await client.get("/instructions", params={"page": state["rng"].randint(1, 5), "page_size": 20})
+
+
+async def search_instructions(client, context, state):
+    return await client.get("/instructions/search", params={"query": phrase(state["rng"]), "limit": 5})
+
+
+def completion_body(context, state, **options) -> dict:
+    return {
+        "user_prompt": f"Explain {phrase(state['rng'])}",
+        "instruction_id": state["rng"].choice(context.instruction_ids),
+        **options,
+    }
+
+
+async def completion(client, context, state):
+    # Sampled (temperature > 0) answers are never cached, so every call reaches the mock server
+    return await client.post("/ai/completions", json=completion_body(context, state, temperature=0.7))
+
+
+async def completion_cached(client, context, state):
+    # Ten fixed prompts at temperature 0: after the first ten misses every call is a cache hit
+    return await client.post("/ai/completions", json={
+        "user_prompt": f"Explain benchmark topic {state['rng'].randint(0, 9)}",
+        "instruction_id": context.instruction_ids[0],
+        "temperature": 0,
+    })
+
+
+async def completion_stream(client, context, state):
+    return await client.post("/ai/completions", json=completion_body(context, state, temperature=0.7, stream=True))
+
+
+SCENARIOS = {scenario.name: scenario for scenario in (
+    Scenario("embed-image", "POST /generate-embeddings with a distinct JPEG", embed_image, ("images",)),
+    Scenario("embed-image-batch", "POST /generate-embeddings/batch with 16 JPEGs", embed_image_batch, ("images",)),
+    Scenario("embed-text", "POST /generate-query-embedding with a unique text", embed_text),
+    Scenario("search-text", "POST /search/by-text against the local vector index", search_text, ("documents",)),
+    Scenario("get-document", "GET /get-document/{id}", get_document, ("documents",)),
+    Scenario("list-documents", "GET /list-documents, one of the first 10 pages", list_documents, ("documents",)),
+    Scenario("list-documents-by-name", "GET /list-documents with a name prefix filter", list_documents_by_name, ("documents",)),
+    Scenario("paginate-documents", "GET /list-documents following next_cursor", paginate_documents, ("documents",)),
+    Scenario("create-instruction", "POST /instructions", create_instruction),
+    Scenario("get-instruction", "GET /instructions/{id}", get_instruction, ("instructions",)),
+    Scenario("list-instructions", "GET /instructions, one of the first 5 pages", list_instructions, ("instructions",)),
+    Scenario("search-instructions", "GET /instructions/search (MongoDB $text)", search_instructions, ("text-search",)),
+    Scenario("completion", "POST /ai/completions, uncached", completion, ("instructions",)),
+    Scenario("completion-cached", "POST /ai/completions, repeated prompts at temperature 0", completion_cached, ("instructions",)),
+    Scenario("completion-stream", "POST /ai/completions with stream=true", completion_stream, ("instructions",)),
+)}
+
+DEFAULT_SCENARIOS = [name for name in SCENARIOS if name != "embed-image-batch"]
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def configure_environment(args, openai_url: str):
+    """
+    Pin the settings that would otherwise make runs incomparable (caches
+    persisted between runs, Atlas-only search, background workers). Must run
+    before any service module is imported.
+    """
+    os.environ.update({
+        "MONGO_URI": args.mongo_uri or "mongomock://benchmark",
+        "DATABASE_NAME": args.database,
+        "COLLECTION_NAME": "documents",
+        "VECTOR_SEARCH_BACKEND": "local",
+        "VECTOR_INDEX_PATH": "",
+        "IMAGE_CACHE_SIZE": "0",
+        "IMAGE_CACHE_DISK_PATH": "",
+        "TEXT_EMBEDDING_CACHE_SIZE": "0",
+        "INGESTION_ENABLED": "false",
+        "INSTRUCTION_CHANGE_STREAM": "false",
+        "CLIP_EAGER_LOAD": "false",
+        "ADMISSION_ENABLED": "true" if args.admission else "false",
+        "OPENAI_API_KEY": "benchmark",
+        "OPENAI_BASE_URL": openai_url,
+        "OPENAI_MAX_RETRIES": "0",
+    })
+
+
+def seed(args) -> tuple:
+    from core.serviceInit import collection, secondary_collection
+    from scripts.benchmark_standins import seed_documents, seed_instructions
+
+    started = time.perf_counter()
+    collection.drop()
+    secondary_collection.drop()
+    document_ids = seed_documents(collection, args.documents, seed=args.seed)
+    instruction_ids = seed_instructions(secondary_collection, args.instructions, seed=args.seed)
+    logger.info(f"Seeded {len(document_ids)} documents and {len(instruction_ids)} instructions in {time.perf_counter() - started:.1f}s")
+    return document_ids, instruction_ids
+
+
+def remote_ids(base_url: str) -> tuple:
+    # Against an external server, sample the ids it already has
+    with httpx.Client(base_url=base_url, timeout=60) as client:
+        document_ids = client.get("/list-ids", params={"limit": 10000}).json()
+        instruction_ids = client.get("/instructions/ids", params={"limit": 10000}).json()
+    return document_ids, instruction_ids
+
+
+@asynccontextmanager
+async def lifespan(app):
+    """
+    Run the app's startup and shutdown handlers, which ASGI transports skip.
+    """
+    receive, sent = asyncio.Queue(), asyncio.Queue()
+    task = asyncio.create_task(app({"type": "lifespan", "asgi": {"version": "3.0"}, "state": {}}, receive.get, sent.put))
+    await receive.put({"type": "lifespan.startup"})
+    message = await sent.get()
+    if message["type"] == "lifespan.startup.failed":
+        raise RuntimeError(f"App startup failed: {message.get('message')}")
+    try:
+        yield
+    finally:
+        await receive.put({"type": "lifespan.shutdown"})
+        await sent.get()
+        await task
+
+
+def stage_totals() -> dict:
+    """
+    Seconds and observations per stage, summed over endpoints.
+    """
+    from services.metrics import stage_seconds
+
+    totals = {}
+    for (_, stage), (seconds, count) in stage_seconds.totals().items():
+        previous = totals.get(stage, (0.0, 0))
+        totals[stage] = (previous[0] + seconds, previous[1] + count)
+    return totals
+
+
+def summarize(latencies: list, statuses: Counter, wall: float) -> dict:
+    completed = len(latencies)
+    errors = sum(count for status, count in statuses.items() if not (status.isdigit() and int(status) < 400))
+    latency_ms = np.asarray(latencies) * 1000 if latencies else np.zeros(1)
+    p50, p95, p99 = np.percentile(latency_ms, [50, 95, 99])
+    return {
+        "requests": completed,
+        "errors": errors,
+        "error_rate": round(errors / completed, 4) if completed else 0.0,
+        "seconds": round(wall, 3),
+        "rps": round(completed / wall, 2) if wall > 0 else 0.0,
+        "latency_ms": {
+            "mean": round(float(latency_ms.mean()), 3),
+            "p50": round(float(p50), 3),
+            "p95": round(float(p95), 3),
+            "p99": round(float(p99), 3),
+            "max": round(float(latency_ms.max()), 3),
+        },
+        "status": dict(sorted(statuses.items())),
+    }
+
+
+async def run_scenario(client, scenario: Scenario, context: BenchContext, args, in_process: bool) -> dict:
+    warmup_state = {"rng": random.Random(args.seed - 1)}
+    for _ in range(args.warmup):
+        await scenario.call(client, context, warmup_state)
+
+    latencies, statuses = [], Counter()
+    issued = 0
+    stages_before = stage_totals() if in_process else None
+    started = time.perf_counter()
+    deadline = started + args.duration if args.duration else None
+
+    async def worker(index: int):
+        nonlocal issued
+        state = {"rng": random.Random(args.seed * 1000 + index)}
+        while True:
+            if deadline is not None:
+                if time.perf_counter() >= deadline:
+                    return
+            elif issued >= args.requests:
+                return
+            issued += 1
+            request_started = time.perf_counter()
+            try:
+                status = str((await scenario.call(client, context, state)).status_code)
+            except Exception as e:
+                status = type(e).__name__
+            latencies.append(time.perf_counter() - request_started)
+            statuses[status] += 1
+
+    await asyncio.gather(*(worker(i) for i in range(args.concurrency)))
+    result = {"description": scenario.description, **summarize(latencies, statuses, time.perf_counter() - started)}
+    if stages_before is not None and latencies:
+        # Mean time per request in each instrumented stage (see services/metrics.py)
+        result["stages_ms"] = {
+            stage: round((seconds - stages_before.get(stage, (0.0, 0))[0]) * 1000 / len(latencies), 3)
+            for stage, (seconds, count) in sorted(stage_totals().items())
+            if count > stages_before.get(stage, (0.0, 0))[1]
+        }
+    return result
+
+
+def runnable(names: list, context: BenchContext) -> list:
+    scenarios = []
+    for name in names:
+        scenario = SCENARIOS[name]
+        missing = [
+            need for need in scenario.requires
+            if (need == "documents" and not context.document_ids)
+            or (need == "instructions" and not context.instruction_ids)
+            or (need == "images" and not context.images)
+            or (need == "text-search" and context.mongomock)
+        ]
+        if missing:
+            reason = "needs a real MongoDB server" if "text-search" in missing else f"needs {', '.join(missing)}"
+            logger.warning(f"Skipping {name}: {reason}")
+            continue
+        scenarios.append(scenario)
+    return scenarios
+
+
+async def run_all(client, scenarios: list, context: BenchContext, args, in_process: bool) -> dict:
+    results = {}
+    print(HEADER, flush=True)
+    for scenario in scenarios:
+        logger.info(f"Running {scenario.name} ({scenario.description})")
+        results[scenario.name] = await run_scenario(client, scenario, context, args, in_process)
+        print(format_row(scenario.name, results[scenario.name]), flush=True)
+    return results
+
+
+def format_row(name: str, result: dict) -> str:
+    latency = result["latency_ms"]
+    return (
+        f"{name:<24} {result['requests']:>7} {result['errors']:>6} {result['rps']:>9.1f} "
+        f"{latency['p50']:>9.2f} {latency['p95']:>9.2f} {latency['p99']:>9.2f} {latency['max']:>9.2f}"
+    )
+
+
+HEADER = f"{'scenario':<24} {'reqs':>7} {'errors':>6} {'rps':>9} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'max ms':>9}"
+
+
+def compare(results: dict, baseline: dict, tolerance: float) -> list:
+    """
+    Per scenario present in both runs: relative change of p50, p95, p99 and
+    rps. A scenario regressed when p95 grew or rps fell by more than `tolerance`.
+    """
+    rows = []
+    for name, result in results.items():
+        previous = baseline.get("scenarios", {}).get(name)
+        if previous is None:
+            continue
+        change = {
+            key: (result["latency_ms"][key] - previous["latency_ms"][key]) / previous["latency_ms"][key]
+            if previous["latency_ms"][key] else 0.0
+            for key in ("p50", "p95", "p99")
+        }
+        change["rps"] = (result["rps"] - previous["rps"]) / previous["rps"] if previous["rps"] else 0.0
+        rows.append({
+            "scenario": name,
+            "change": {key: round(value, 4) for key, value in change.items()},
+            "regressed": change["p95"] > tolerance or change["rps"] < -tolerance,
+        })
+    return rows
+
+
+def git_commit() -> str:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True).stdout.strip()
+    except Exception:
+        return None
+
+
+async def benchmark(args) -> dict:
+    openai_port = free_port()
+    external = bool(args.url)
+    if not external:
+        configure_environment(args, f"http://127.0.0.1:{openai_port}/v1")
+
+    from scripts.benchmark_standins import BackgroundServer, install_stub_clip, mock_openai_app, synthetic_images
+
+    mock_openai = None
+    if not external:
+        mock_openai = BackgroundServer(
+            mock_openai_app(args.openai_latency_ms, args.openai_tokens, args.openai_token_ms), openai_port
+        ).start()
+
+    try:
+        images = synthetic_images(args.images, seed=args.seed)
+        if external:
+            document_ids, instruction_ids = remote_ids(args.url)
+            context = BenchContext(document_ids, instruction_ids, images, mongomock=False)
+            scenarios = runnable(args.scenarios, context)
+            async with httpx.AsyncClient(base_url=args.url, timeout=args.timeout) as client:
+                return await run_all(client, scenarios, context, args, in_process=False)
+
+        from core.serviceInit import clip_runtime
+        from main import app
+
+        if args.clip == "stub":
+            install_stub_clip(clip_runtime, args.stub_batch_ms, args.stub_item_ms)
+        document_ids, instruction_ids = seed(args)
+        context = BenchContext(document_ids, instruction_ids, images, mongomock=os.environ["MONGO_URI"].startswith("mongomock://"))
+        scenarios = runnable(args.scenarios, context)
+
+        if args.mode == "uvicorn":
+            server = await asyncio.to_thread(BackgroundServer(app, free_port()).start)
+            try:
+                async with httpx.AsyncClient(base_url=server.url, timeout=args.timeout, limits=httpx.Limits(max_connections=args.concurrency)) as client:
+                    return await run_all(client, scenarios, context, args, in_process=True)
+            finally:
+                await asyncio.to_thread(server.stop)
+
+        async with lifespan(app):
+            transport = httpx.ASGITransport(app=app)
+            async with httpx.AsyncClient(transport=transport, base_url="http://benchmark", timeout=args.timeout) as client:
+                return await run_all(client, scenarios, context, args, in_process=True)
+    finally:
+        if mock_openai is not None:
+            mock_openai.stop()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--scenarios", nargs="+", choices=list(SCENARIOS), default=DEFAULT_SCENARIOS)
+    parser.add_argument("--mode", choices=MODES, default="inprocess", help="Serve the app through an ASGI transport or over HTTP with uvicorn")
+    parser.add_argument("--url", default="", help="Benchmark an already running server instead (nothing is seeded)")
+    parser.add_argument("--clip", choices=CLIP_MODES, default="stub", help="Stub CLIP, or the configured model on CPU")
+    parser.add_argument("--stub-batch-ms", type=float, default=0.0, help="Extra stub CLIP cost per forward pass")
+    parser.add_argument("--stub-item-ms", type=float, default=0.0, help="Extra stub CLIP cost per item")
+    parser.add_argument("--mongo-uri", default="", help="Real MongoDB to seed instead of mongomock; --database is dropped first")
+    parser.add_argument("--database", default="benchmark")
+    parser.add_argument("--documents", type=int, default=5000, help="Synthetic documents to seed")
+    parser.add_argument("--instructions", type=int, default=200, help="Synthetic instructions to seed")
+    parser.add_argument("--images", type=int, default=256, help="Distinct synthetic JPEGs to upload")
+    parser.add_argument("--openai-latency-ms", type=float, default=50.0, help="Mock OpenAI time to first byte")
+    parser.add_argument("--openai-tokens", type=int, default=40, help="Mock OpenAI answer length")
+    parser.add_argument("--openai-token-ms", type=float, default=2.0, help="Mock OpenAI delay between streamed tokens")
+    parser.add_argument("--admission", action="store_true", help="Keep admission control on (requests beyond its limits fail fast)")
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--requests", type=int, default=500, help="Measured requests per scenario")
+    parser.add_argument("--duration", type=float, default=0.0, help="Run each scenario for this many seconds instead")
+    parser.add_argument("--warmup", type=int, default=20, help="Unmeasured requests per scenario")
+    parser.add_argument("--timeout", type=float, default=60.0)
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--output", default="", help="Write the results as JSON to this path")
+    parser.add_argument("--baseline", default="", help="Results JSON from an earlier run to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.10, help="Allowed relative p95 increase or rps decrease")
+    args = parser.parse_args()
+
+    results = asyncio.run(benchmark(args))
+
+    report = {
+        "created_at": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "commit": git_commit(),
+        "python": sys.version.split()[0],
+        "platform": platform.platform(),
+        "cpus": os.cpu_count(),
+        "config": {
+            "mode": "external" if args.url else args.mode,
+            "clip": None if args.url else args.clip,
+            "mongo": "external" if args.url else ("mongodb" if args.mongo_uri else "mongomock"),
+            **{key: getattr(args, key) for key in (
+                "concurrency", "requests", "duration", "warmup", "documents", "instructions",
+                "openai_latency_ms", "openai_tokens", "admission", "seed",
+            )},
+        },
+        "scenarios": results,
+    }
+
+    regressed = False
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        report["comparison"] = {"baseline": args.baseline, "tolerance": args.tolerance, "scenarios": compare(results, baseline, args.tolerance)}
+        print(f"\n{'scenario':<24} {'p50':>8} {'p95':>8} {'p99':>8} {'rps':>8}")
+        for row in report["comparison"]["scenarios"]:
+            change = row["change"]
+            flag = "  REGRESSED" if row["regressed"] else ""
+            print(f"{row['scenario']:<24} {change['p50']:>+8.1%} {change['p95']:>+8.1%} {change['p99']:>+8.1%} {change['rps']:>+8.1%}{flag}")
+            regressed = regressed or row["regressed"]
+
+    if args.output:
+        os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+        logger.info(f"Results written to {args.output}")
+
+    if regressed:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,295 @@
+"""
+Local stand-ins used by scripts/benchmark_service.py: a stub CLIP model,
+synthetic MongoDB data and a mock OpenAI-compatible server.
+
+Import this module only after the benchmark environment is set, since the
+service modules it uses read their settings at import time. The seeding
+helpers also open the configured MongoDB client.
+"""
+import hashlib
+import io
+import json
+import logging
+import random
+import threading
+import time
+
+import numpy as np
+from bson import ObjectId
+from PIL import Image
+
+from services.clip_backends import ClipBackend
+from services.embedding_codec import encode_embedding
+from services.preprocess import CLIP_IMAGE_MEAN, CLIP_IMAGE_STD
+
+logger = logging.getLogger(__name__)
+
+STUB_DIM = 512
+STUB_VOCAB = 8192
+STUB_CONTEXT = 77
+
+WORDS = (
+    "red green blue small large vintage modern wooden metal glass street river forest city night "
+    "portrait landscape diagram chart cat dog bicycle car train bridge tower garden kitchen office"
+).split()
+TECHNOLOGIES = ("Python", "FastAPI", "MongoDB", "React", "Docker", "Kubernetes", "PyTorch", "Rust", "Go", "SQL")
+
+
+class StubModel:
+    """
+    Placeholder for the CLIP model; without `logit_scale` the runtime uses
+    CLIP's trained value.
+    """
+
+    name_or_path = "stub"
+
+
+class StubProcessor:
+    """
+    Carries CLIPImageProcessor's preprocessing values for
+    `ImagePreprocessor.from_processor`, and handles the warm-up call.
+    """
+
+    size = {"shortest_edge": 224}
+    crop_size = {"height": 224, "width": 224}
+    image_mean = list(CLIP_IMAGE_MEAN)
+    image_std = list(CLIP_IMAGE_STD)
+
+    def __call__(self, images, return_tensors="np"):
+        mean = np.asarray(self.image_mean, dtype=np.float32)
+        std = np.asarray(self.image_std, dtype=np.float32)
+        pixels = [
+            ((np.asarray(image.convert("RGB").resize((224, 224)), dtype=np.float32) / 255.0 - mean) / std).transpose(2, 0, 1)
+            for image in images
+        ]
+        return {"pixel_values": np.stack(pixels)}
+
+
+class StubTokenizer:
+    """
+    Hashes whitespace-separated words into token ids, padded like the CLIP
+    tokenizer to the longest text. Like the real tokenizer, texts are only
+    cut to `max_length` with `truncation=True`.
+    """
+
+    def __call__(self, texts, padding=True, truncation=False, max_length=None, return_tensors="np", **kwargs):
+        if isinstance(texts, str):
+            texts = [texts]
+        tokens = [[self.token_id(word) for word in text.lower().split()] or [0] for text in texts]
+        if truncation:
+            tokens = [ids[:max_length or STUB_CONTEXT] for ids in tokens]
+        length = max(len(ids) for ids in tokens)
+        input_ids = np.zeros((len(tokens), length), dtype=np.int64)
+        attention_mask = np.zeros((len(tokens), length), dtype=np.int64)
+        for i, ids in enumerate(tokens):
+            input_ids[i, :len(ids)] = ids
+            attention_mask[i, :len(ids)] = 1
+        return {"input_ids": input_ids, "attention_mask": attention_mask}
+
+    @staticmethod
+    def token_id(word: str) -> int:
+        return int.from_bytes(hashlib.blake2b(word.encode("utf-8"), digest_size=4).digest(), "little") % STUB_VOCAB
+
+
+class StubBackend(ClipBackend):
+    """
+    Deterministic stand-in for the CLIP towers: images are average-pooled to
+    14x14 and projected, texts are the mean of per-token random vectors.
+    Similar inputs get similar embeddings, so search and the semantic cache
+    behave sensibly. `batch_ms` and `item_ms` add a fixed cost per forward
+    pass and per item to mimic a real model's latency profile.
+    """
+
+    name = "stub"
+
+    def __init__(self, model=None, mode: str = "full", dim: int = STUB_DIM, batch_ms: float = 0.0, item_ms: float = 0.0, seed: int = 0):
+        super().__init__(model, mode)
+        self.dim = dim
+        self.batch_ms = batch_ms
+        self.item_ms = item_ms
+        rng = np.random.default_rng(seed)
+        self.image_projection = rng.standard_normal((3 * 14 * 14, dim)).astype(np.float32)
+        self.token_vectors = rng.standard_normal((STUB_VOCAB, dim)).astype(np.float32)
+
+    def run(self, kind: str, inputs: dict) -> np.ndarray:
+        if kind == "image":
+            pixels = np.asarray(inputs["pixel_values"], dtype=np.float32)
+            pooled = pixels.reshape(len(pixels), 3, 14, 16, 14, 16).mean(axis=(3, 5)).reshape(len(pixels), -1)
+            embeddings = pooled @ self.image_projection
+        else:
+            if inputs["input_ids"].shape[1] > STUB_CONTEXT:
+                # The real text tower has no position embeddings past its context
+                raise ValueError(f"Sequence length {inputs['input_ids'].shape[1]} exceeds the {STUB_CONTEXT}-token context")
+            mask = np.asarray(inputs["attention_mask"], dtype=np.float32)[..., None]
+            vectors = self.token_vectors[np.asarray(inputs["input_ids"])]
+            embeddings = (vectors * mask).sum(axis=1) / np.maximum(mask.sum(axis=1), 1.0)
+        delay = self.batch_ms + self.item_ms * len(embeddings)
+        if delay > 0:
+            time.sleep(delay / 1000)
+        return embeddings.astype(np.float32)
+
+    def describe(self) -> dict:
+        return {**super().describe(), "dim": self.dim, "batch_ms": self.batch_ms, "item_ms": self.item_ms}
+
+
+def install_stub_clip(runtime, batch_ms: float = 0.0, item_ms: float = 0.0):
+    model = StubModel()
+    runtime.install(model, StubProcessor(), StubTokenizer(), StubBackend(model, runtime.mode, batch_ms=batch_ms, item_ms=item_ms))
+
+
+def random_phrase(rng: random.Random, words: int = 4) -> str:
+    return " ".join(rng.choice(WORDS) for _ in range(words))
+
+
+def synthetic_images(count: int, size: int = 320, seed: int = 0) -> list:
+    """
+    Distinct JPEGs (a random colour gradient each), so the image embedding
+    cache never turns the benchmark into a cache benchmark.
+    """
+    rng = np.random.default_rng(seed)
+    ramp = np.linspace(0.0, 1.0, size, dtype=np.float32)
+    images = []
+    for _ in range(count):
+        start, end = rng.random((2, 3), dtype=np.float32)
+        pixels = start + (end - start) * ramp[:, None, None] * ramp[None, :, None]
+        pixels += rng.random((size, size, 3), dtype=np.float32) * 0.1
+        buffer = io.BytesIO()
+        Image.fromarray((np.clip(pixels, 0, 1) * 255).astype(np.uint8)).save(buffer, format="JPEG", quality=90)
+        images.append(buffer.getvalue())
+    return images
+
+
+def seed_documents(collection, count: int, dim: int = STUB_DIM, batch_size: int = 1000, seed: int = 0) -> list:
+    """
+    Insert `count` image documents with unit-norm random embeddings stored in
+    EMBEDDING_STORAGE_FORMAT. Returns their ids.
+    """
+    from services.indexes import with_normalized_fields
+
+    rng = random.Random(seed)
+    vectors = np.random.default_rng(seed)
+    ids = []
+    for start in range(0, count, batch_size):
+        size = min(batch_size, count - start)
+        embeddings = vectors.standard_normal((size, dim)).astype(np.float32)
+        embeddings /= np.linalg.norm(embeddings, axis=1, keepdims=True)
+        documents = []
+        for i, embedding in enumerate(embeddings):
+            number = start + i
+            documents.append(with_normalized_fields("documents", {
+                "_id": ObjectId(),
+                "name": f"Document {number:06d} {random_phrase(rng, 2)}",
+                "imageUrl": f"https://example.com/images/{number}.jpg",
+                "mediaDetails": {"imageEmbeddings": encode_embedding(embedding)},
+            }))
+        collection.insert_many(documents)
+        ids.extend(str(document["_id"]) for document in documents)
+    return ids
+
+
+def seed_instructions(collection, count: int, seed: int = 0) -> list:
+    from services.indexes import with_normalized_fields
+
+    rng = random.Random(seed)
+    documents = [
+        with_normalized_fields("instructions", {
+            "_id": ObjectId(),
+            "technology": rng.choice(TECHNOLOGIES),
+            "instruction": f"Review the {random_phrase(rng, 6)} and explain the trade-offs.",
+            "strict_rules": [f"Never {random_phrase(rng, 3)}." for _ in range(3)],
+        })
+        for _ in range(count)
+    ]
+    if documents:
+        collection.insert_many(documents)
+    return [str(document["_id"]) for document in documents]
+
+
+def mock_openai_app(latency_ms: float = 50.0, tokens: int = 40, token_ms: float = 2.0):
+    """
+    OpenAI-compatible `/v1/chat/completions`: answers after `latency_ms`,
+    or as an SSE stream of `tokens` chunks `token_ms` apart.
+    """
+    import asyncio
+
+    from fastapi import FastAPI, Request
+    from fastapi.responses import JSONResponse, StreamingResponse
+
+    app = FastAPI(title="Mock OpenAI")
+
+    @app.post("/v1/chat/completions")
+    async def chat_completions(request: Request):
+        body = await request.json()
+        model = body.get("model", "mock")
+        prompt = body["messages"][-1]["content"]
+        words = [f"token{i}" for i in range(tokens)]
+        usage = {"prompt_tokens": len(prompt.split()), "completion_tokens": tokens, "total_tokens": len(prompt.split()) + tokens}
+        created = int(time.time())
+        await asyncio.sleep(latency_ms / 1000)
+
+        if not body.get("stream"):
+            return JSONResponse({
+                "id": "chatcmpl-mock",
+                "object": "chat.completion",
+                "created": created,
+                "model": model,
+                "choices": [{"index": 0, "message": {"role": "assistant", "content": " ".join(words)}, "finish_reason": "stop"}],
+                "usage": usage,
+            })
+
+        include_usage = (body.get("stream_options") or {}).get("include_usage", False)
+
+        async def events():
+            for i, word in enumerate(words):
+                chunk = {
+                    "id": "chatcmpl-mock",
+                    "object": "chat.completion.chunk",
+                    "created": created,
+                    "model": model,
+                    "choices": [{"index": 0, "delta": {"content": word if i == 0 else " " + word}, "finish_reason": None}],
+                }
+                yield f"data: {json.dumps(chunk)}\n\n"
+                if token_ms:
+                    await asyncio.sleep(token_ms / 1000)
+            done = {
+                "id": "chatcmpl-mock",
+                "object": "chat.completion.chunk",
+                "created": created,
+                "model": model,
+                "choices": [{"index": 0, "delta": {}, "finish_reason": "stop"}],
+            }
+            yield f"data: {json.dumps(done)}\n\n"
+            if include_usage:
+                yield f"data: {json.dumps({**done, 'choices': [], 'usage': usage})}\n\n"
+            yield "data: [DONE]\n\n"
+
+        return StreamingResponse(events(), media_type="text/event-stream")
+
+    return app
+
+
+class BackgroundServer:
+    """
+    Runs an ASGI app under uvicorn on its own thread and event loop.
+    """
+
+    def __init__(self, app, port: int, host: str = "127.0.0.1"):
+        import uvicorn
+
+        self.port = port
+        self.url = f"http://{host}:{self.port}"
+        self.server = uvicorn.Server(uvicorn.Config(app, host=host, port=self.port, log_level="warning", lifespan="on"))
+        self._thread = threading.Thread(target=self.server.run, name=f"bench-server-{self.port}", daemon=True)
+
+    def start(self, timeout: float = 60.0) -> "BackgroundServer":
+        self._thread.start()
+        deadline = time.monotonic() + timeout
+        while not self.server.started:
+            if not self._thread.is_alive() or time.monotonic() > deadline:
+                raise RuntimeError(f"Server on {self.url} did not start")
+            time.sleep(0.05)
+        return self
+
+    def stop(self):
+        self.server.should_exit = True
+        self._thread.join(timeout=10)
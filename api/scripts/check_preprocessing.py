@@ -0,0 +1,72 @@
+"""
+Check the fast image preprocessing pipeline against CLIPProcessor.
+
+Usage (from the api/ directory):
+    python -m scripts.check_preprocessing photos/*.jpg
+    python -m scripts.check_preprocessing photos/*.jpg --embeddings
+
+Reports the pixel_values difference and the per-image time of both paths;
+with --embeddings, also the cosine similarity of the resulting embeddings.
+"""
+import argparse
+import io
+import json
+import time
+
+import numpy as np
+from PIL import Image
+
+from core.config import settings
+from core.serviceInit import clip_runtime
+from services.preprocess import ImagePreprocessor, parity_check
+
+
+def timed(fn, images: list) -> float:
+    started = time.perf_counter()
+    for data in images:
+        fn(data)
+    return (time.perf_counter() - started) / len(images) * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("paths", nargs="+")
+    parser.add_argument("--embeddings", action="store_true", help="Also compare embeddings from both paths")
+    args = parser.parse_args()
+
+    images = []
+    for path in args.paths:
+        with open(path, "rb") as f:
+            images.append(f.read())
+
+    processor = clip_runtime.processor
+    preprocessor = ImagePreprocessor.from_processor(
+        processor,
+        max_pixels=settings.IMAGE_MAX_PIXELS,
+        oversize_policy=settings.IMAGE_OVERSIZE_POLICY,
+    )
+    report = parity_check(preprocessor, processor, images)
+    report["fast_ms_per_image"] = timed(preprocessor.prepare, images)
+    report["processor_ms_per_image"] = timed(
+        lambda data: processor(images=[Image.open(io.BytesIO(data)).convert("RGB")], return_tensors="np"),
+        images,
+    )
+
+    if args.embeddings:
+        reference = clip_runtime.image_features(
+            **processor(images=[Image.open(io.BytesIO(data)).convert("RGB") for data in images], return_tensors="np")
+        )
+        fast = clip_runtime.image_features(
+            pixel_values=preprocessor.normalize([preprocessor.prepare(data) for data in images])
+        )
+        reference /= np.linalg.norm(reference, axis=1, keepdims=True)
+        fast /= np.linalg.norm(fast, axis=1, keepdims=True)
+        cosines = np.sum(reference * fast, axis=1)
+        report["min_embedding_cosine"] = float(cosines.min())
+        report["mean_embedding_cosine"] = float(cosines.mean())
+
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
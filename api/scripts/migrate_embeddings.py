@@ -0,0 +1,102 @@
+"""
+Convert stored `mediaDetails.imageEmbeddings` to another storage format.
+
+Usage (from the api/ directory):
+    python -m scripts.migrate_embeddings --format float16
+    python -m scripts.migrate_embeddings --format float32 --batch-size 500 --restart
+
+The migration walks the collection in `_id` order and records the last
+processed `_id` in the `migrations` collection after every batch, so an
+interrupted run resumes where it stopped. Documents already in the target
+format are skipped.
+"""
+import argparse
+import logging
+import os
+import time
+
+from dotenv import load_dotenv
+from pymongo import MongoClient, UpdateOne
+
+from services.embedding_codec import STORAGE_FORMATS, decode_embedding, encode_embedding, storage_format_of
+
+load_dotenv()
+
+logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(message)s")
+logger = logging.getLogger(__name__)
+
+EMBEDDING_PATH = "mediaDetails.imageEmbeddings"
+
+
+def migrate(collection, checkpoints, storage_format: str, batch_size: int = 1000, restart: bool = False) -> dict:
+    checkpoint_id = f"{collection.name}:{EMBEDDING_PATH}:{storage_format}"
+    if restart:
+        checkpoints.delete_one({"_id": checkpoint_id})
+    checkpoint = checkpoints.find_one({"_id": checkpoint_id}) or {}
+    last_id = checkpoint.get("last_id")
+    if last_id is not None:
+        logger.info(f"Resuming after _id {last_id}")
+
+    totals = {"scanned": 0, "converted": 0, "skipped": 0, "failed": 0}
+    started = time.perf_counter()
+    while True:
+        query = {EMBEDDING_PATH: {"$exists": True}}
+        if last_id is not None:
+            query["_id"] = {"$gt": last_id}
+        batch = list(collection.find(query, {EMBEDDING_PATH: 1}).sort("_id", 1).limit(batch_size))
+        if not batch:
+            break
+
+        operations = []
+        for document in batch:
+            value = document["mediaDetails"]["imageEmbeddings"]
+            if storage_format_of(value) == storage_format:
+                totals["skipped"] += 1
+                continue
+            try:
+                vector = decode_embedding(value)
+                if vector is None:
+                    totals["skipped"] += 1
+                    continue
+                operations.append(UpdateOne(
+                    {"_id": document["_id"]},
+                    {"$set": {EMBEDDING_PATH: encode_embedding(vector, storage_format)}},
+                ))
+            except Exception as e:
+                totals["failed"] += 1
+                logger.warning(f"Skipping {document['_id']}: {e}")
+
+        if operations:
+            result = collection.bulk_write(operations, ordered=False)
+            totals["converted"] += result.modified_count
+        totals["scanned"] += len(batch)
+        last_id = batch[-1]["_id"]
+        checkpoints.update_one(
+            {"_id": checkpoint_id},
+            {"$set": {"last_id": last_id, **{f"totals.{k}": v for k, v in totals.items()}}},
+            upsert=True,
+        )
+        elapsed = time.perf_counter() - started
+        logger.info(f"{totals['scanned']} scanned, {totals['converted']} converted ({totals['scanned'] / elapsed:.0f} docs/s)")
+
+    checkpoints.update_one({"_id": checkpoint_id}, {"$set": {"completed": True}}, upsert=True)
+    return totals
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Convert stored image embeddings to another storage format.")
+    parser.add_argument("--format", required=True, choices=STORAGE_FORMATS, help="Target storage format")
+    parser.add_argument("--batch-size", type=int, default=1000, help="Documents per bulk write")
+    parser.add_argument("--restart", action="store_true", help="Ignore the saved checkpoint and start from the beginning")
+    args = parser.parse_args()
+
+    client = MongoClient(os.getenv("MONGO_URI"))
+    db = client[os.getenv("DATABASE_NAME")]
+    collection = db[os.getenv("COLLECTION_NAME")]
+
+    totals = migrate(collection, db["migrations"], args.format, args.batch_size, args.restart)
+    logger.info(f"Migration finished: {totals}")
+
+
+if __name__ == "__main__":
+    main()
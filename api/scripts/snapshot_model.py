@@ -0,0 +1,44 @@
+"""
+Save the CLIP model and its preprocessors as a local snapshot so the service
+can start without contacting the Hugging Face hub.
+
+Usage (from the api/ directory):
+    python -m scripts.snapshot_model --output models/clip-vit-base-patch32
+    python -m scripts.snapshot_model --mode vision --output models/clip-vision
+
+Point CLIP_SNAPSHOT_PATH at the output directory (with the same
+CLIP_LOAD_MODE) to load from it.
+"""
+import argparse
+import logging
+import os
+
+from core.config import settings
+from core.serviceInit import CLIP_LOAD_MODES, ClipRuntime
+
+logger = logging.getLogger(__name__)
+
+
+def snapshot(model_name: str, mode: str, output: str):
+    runtime = ClipRuntime(model_name, mode)
+    runtime.load()
+    os.makedirs(output, exist_ok=True)
+    runtime.model.save_pretrained(output)
+    if runtime.supports_images:
+        runtime.processor.save_pretrained(output)
+    if runtime.supports_text:
+        runtime.tokenizer.save_pretrained(output)
+    logger.info(f"Saved {model_name} ({mode}) to {output}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--model", default=settings.CLIP_MODEL_NAME)
+    parser.add_argument("--mode", choices=CLIP_LOAD_MODES, default=settings.CLIP_LOAD_MODE)
+    parser.add_argument("--output", default=settings.CLIP_SNAPSHOT_PATH or None, required=not settings.CLIP_SNAPSHOT_PATH)
+    args = parser.parse_args()
+    snapshot(args.model, args.mode, args.output)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,205 @@
+import asyncio
+import json
+import math
+import time
+from collections import deque
+
+from core.config import settings
+from services.routes import route_table
+
+
+class AdmissionRejected(Exception):
+    """
+    Raised when a request cannot be admitted: its group's wait queue is full
+    (429) or it waited longer than the queue timeout (503).
+    """
+
+    def __init__(self, status_code: int, detail: str, retry_after: int):
+        super().__init__(detail)
+        self.status_code = status_code
+        self.detail = detail
+        self.retry_after = retry_after
+
+
+class AdmissionGroup:
+    """
+    Concurrency budget for one router group.
+
+    At most `max_concurrency` requests run at once and at most `max_queue`
+    wait for a slot, in arrival order, for up to `queue_timeout` seconds.
+    Anything beyond that is rejected immediately instead of piling up.
+    """
+
+    def __init__(self, name: str, max_concurrency: int, max_queue: int, queue_timeout: float = 10.0):
+        self.name = name
+        self.max_concurrency = max(1, max_concurrency)
+        self.max_queue = max(0, max_queue)
+        self.queue_timeout = queue_timeout
+        self.in_flight = 0
+        self._waiters = deque()
+        self.admitted = 0
+        self.rejected = 0
+        self.timed_out = 0
+        # Moving averages used to estimate Retry-After
+        self.avg_service_seconds = 0.0
+        self.avg_wait_seconds = 0.0
+
+    @property
+    def queued(self) -> int:
+        return len(self._waiters)
+
+    def retry_after(self) -> int:
+        # Time for the queue ahead to drain at the current service rate
+        backlog = (self.queued + 1) / self.max_concurrency
+        return max(1, math.ceil(backlog * self.avg_service_seconds))
+
+    async def acquire(self):
+        if self.in_flight < self.max_concurrency and not self._waiters:
+            self.in_flight += 1
+            self.admitted += 1
+            return
+        if self.queued >= self.max_queue:
+            self.rejected += 1
+            raise AdmissionRejected(
+                429,
+                f"{self.name} is at capacity ({self.in_flight} running, {self.queued} queued)",
+                self.retry_after(),
+            )
+
+        started = time.perf_counter()
+        waiter = asyncio.get_running_loop().create_future()
+        self._waiters.append(waiter)
+        try:
+            await asyncio.wait_for(waiter, self.queue_timeout)
+        except (asyncio.TimeoutError, asyncio.CancelledError) as e:
+            if waiter.done() and not waiter.cancelled():
+                # The slot was handed over just as we gave up; pass it on
+                self.release()
+            elif waiter in self._waiters:
+                self._waiters.remove(waiter)
+            if isinstance(e, asyncio.CancelledError):
+                raise
+            self.timed_out += 1
+            raise AdmissionRejected(
+                503,
+                f"{self.name} queue wait exceeded {self.queue_timeout:g}s",
+                self.retry_after(),
+            ) from None
+        self.admitted += 1
+        self.avg_wait_seconds += 0.1 * (time.perf_counter() - started - self.avg_wait_seconds)
+
+    def release(self, service_seconds: float = None):
+        if service_seconds is not None:
+            self.avg_service_seconds += 0.1 * (service_seconds - self.avg_service_seconds)
+        while self._waiters:
+            waiter = self._waiters.popleft()
+            if not waiter.done():
+                # Hand the slot straight to the next waiter; in_flight is unchanged
+                waiter.set_result(None)
+                return
+        self.in_flight -= 1
+
+    def stats(self) -> dict:
+        return {
+            "max_concurrency": self.max_concurrency,
+            "max_queue": self.max_queue,
+            "queue_timeout": self.queue_timeout,
+            "in_flight": self.in_flight,
+            "queued": self.queued,
+            "admitted": self.admitted,
+            "rejected": self.rejected,
+            "timed_out": self.timed_out,
+            "avg_service_ms": round(self.avg_service_seconds * 1000, 2),
+            "avg_wait_ms": round(self.avg_wait_seconds * 1000, 2),
+        }
+
+
+def parse_groups(spec: str) -> dict:
+    """
+    Parse "CLIP=16:64,Open AI=32:128" into {tag: (max_concurrency, max_queue)}.
+    """
+    groups = {}
+    for item in spec.split(","):
+        if not item.strip():
+            continue
+        name, _, limits = item.partition("=")
+        concurrency, _, queue = limits.partition(":")
+        groups[name.strip()] = (int(concurrency), int(queue or 0))
+    return groups
+
+
+class AdmissionController:
+    """
+    Maps each request to the admission group named by its route's tag.
+    Routes without a configured tag (health, info, admin) are never limited,
+    so cheap endpoints stay responsive while expensive groups are saturated.
+    """
+
+    def __init__(self, groups: dict, queue_timeout: float = 10.0, enabled: bool = True):
+        self.enabled = enabled
+        self.groups = {
+            name: AdmissionGroup(name, concurrency, queue, queue_timeout)
+            for name, (concurrency, queue) in groups.items()
+        }
+
+    def group_for(self, scope) -> AdmissionGroup:
+        _, tags = route_table.lookup(scope)
+        for tag in tags:
+            if tag in self.groups:
+                return self.groups[tag]
+        return None
+
+    def stats(self) -> dict:
+        return {
+            "enabled": self.enabled,
+            "groups": {name: group.stats() for name, group in self.groups.items()},
+        }
+
+
+class AdmissionMiddleware:
+    """
+    ASGI middleware that holds a group slot for the whole request, including
+    streamed response bodies, and answers rejected requests with
+    `Retry-After` before any of their work starts.
+    """
+
+    def __init__(self, app, controller: AdmissionController):
+        self.app = app
+        self.controller = controller
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not self.controller.enabled:
+            return await self.app(scope, receive, send)
+        group = self.controller.group_for(scope)
+        if group is None:
+            return await self.app(scope, receive, send)
+
+        try:
+            await group.acquire()
+        except AdmissionRejected as e:
+            return await self.reject(e, send)
+        started = time.perf_counter()
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            group.release(time.perf_counter() - started)
+
+    async def reject(self, error: AdmissionRejected, send):
+        body = json.dumps({"detail": error.detail}).encode("utf-8")
+        await send({
+            "type": "http.response.start",
+            "status": error.status_code,
+            "headers": [
+                (b"content-type", b"application/json"),
+                (b"content-length", str(len(body)).encode("latin-1")),
+                (b"retry-after", str(error.retry_after).encode("latin-1")),
+            ],
+        })
+        await send({"type": "http.response.body", "body": body})
+
+
+admission_controller = AdmissionController(
+    parse_groups(settings.ADMISSION_GROUPS),
+    queue_timeout=settings.ADMISSION_QUEUE_TIMEOUT,
+    enabled=settings.ADMISSION_ENABLED,
+)
@@ -0,0 +1,205 @@
+import asyncio
+import contextvars
+import time
+from collections import deque
+from typing import Any, Callable, List, Optional
+
+import numpy as np
+
+from services.executor import InferenceExecutor, InferenceQueueFull
+from services.metrics import observe_stage
+
+
+class MicroBatcher:
+    """
+    Groups concurrent requests into batches and runs them through a single
+    batch function.
+
+    Callers `await submit(item)` and get back their own result. The worker
+    collects up to `max_batch_size` items, waiting at most `max_wait_ms` after
+    the first one arrives. `process_batch` receives the list of items and must
+    return one result per item, in order; an Exception instance in the result
+    list is raised to that caller only. When the whole batch raises, its items
+    are retried one at a time, so the error only reaches the items that cause
+    it; `InferenceQueueFull` fails the whole batch without retries.
+
+    When an `executor` is given, batches run on it instead of the event loop,
+    with up to `max_concurrent_batches` in flight. At most `max_queue` items
+    may wait for a batch; further submissions raise `InferenceQueueFull`.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        process_batch: Callable[[List[Any]], List[Any]],
+        max_batch_size: int = 32,
+        max_wait_ms: float = 5.0,
+        max_queue: int = 256,
+        executor: Optional[InferenceExecutor] = None,
+        max_concurrent_batches: int = 1,
+        stats_window: int = 1000,
+    ):
+        self.name = name
+        self.process_batch = process_batch
+        self.max_batch_size = max(1, max_batch_size)
+        self.max_wait = max(0.0, max_wait_ms) / 1000
+        self.max_queue = max(1, max_queue)
+        self.executor = executor
+        self.max_concurrent_batches = max(1, max_concurrent_batches)
+        self._queue = None
+        self._worker = None
+        self._loop = None
+        self._slots = None
+
+        self._batches = 0
+        self._items = 0
+        self._failed_batches = 0
+        self._failed_items = 0
+        self._rejected = 0
+        self._batch_sizes = deque(maxlen=stats_window)
+        self._queue_waits = deque(maxlen=stats_window)
+
+    def _ensure_worker(self):
+        loop = asyncio.get_running_loop()
+        if self._worker is None or self._worker.done() or self._loop is not loop:
+            self._loop = loop
+            self._queue = asyncio.Queue()
+            self._slots = asyncio.Semaphore(self.max_concurrent_batches)
+            # A fresh context, so the worker does not inherit the first caller's request metrics
+            self._worker = loop.create_task(self._run(), context=contextvars.Context())
+
+    async def submit(self, item: Any) -> Any:
+        self._ensure_worker()
+        if self._queue.qsize() >= self.max_queue:
+            self._rejected += 1
+            raise InferenceQueueFull(f"{self.name} batch queue is full ({self.max_queue} waiting)")
+        future = self._loop.create_future()
+        timing = {"enqueued": time.perf_counter()}
+        await self._queue.put((item, future, timing))
+        result = await future
+        # Split this caller's latency into queueing and its batch's forward pass
+        observe_stage("batch_wait", timing["started"] - timing["enqueued"])
+        observe_stage("model_forward", timing["forward"])
+        return result
+
+    async def _collect(self) -> list:
+        batch = [await self._queue.get()]
+        deadline = time.perf_counter() + self.max_wait
+        while len(batch) < self.max_batch_size:
+            timeout = deadline - time.perf_counter()
+            if timeout <= 0:
+                break
+            try:
+                batch.append(await asyncio.wait_for(self._queue.get(), timeout))
+            except asyncio.TimeoutError:
+                break
+        # Take whatever else is already waiting without extending the deadline
+        while len(batch) < self.max_batch_size and not self._queue.empty():
+            batch.append(self._queue.get_nowait())
+        return batch
+
+    async def _run(self):
+        while True:
+            # Wait for a free slot first so requests keep accumulating into
+            # the next batch while the previous ones are still running
+            await self._slots.acquire()
+            try:
+                batch = await self._collect()
+            except BaseException:
+                self._slots.release()
+                raise
+            self._record(batch, time.perf_counter())
+            self._loop.create_task(self._execute(batch))
+
+    async def _process(self, items: list) -> list:
+        if self.executor is not None:
+            results = await self.executor.run(self.process_batch, items)
+        else:
+            results = self.process_batch(items)
+        if len(results) != len(items):
+            raise RuntimeError(
+                f"{self.name}: batch function returned {len(results)} results for {len(items)} items"
+            )
+        return results
+
+    async def _process_each(self, items: list, error: Exception) -> list:
+        # Isolate the failing items instead of failing every caller in the batch.
+        # A full executor is not the items' fault: retrying them one by one
+        # would only add submissions to a queue that is already overloaded
+        if len(items) == 1 or isinstance(error, InferenceQueueFull):
+            return [error] * len(items)
+        results = []
+        for i, item in enumerate(items):
+            try:
+                results.append((await self._process([item]))[0])
+            except InferenceQueueFull as e:
+                return results + [e] * (len(items) - i)
+            except Exception as e:
+                results.append(e)
+        return results
+
+    async def _execute(self, batch: list):
+        items = [item for item, _, _ in batch]
+        started = time.perf_counter()
+        try:
+            try:
+                results = await self._process(items)
+            except Exception as e:
+                self._failed_batches += 1
+                results = await self._process_each(items, e)
+        finally:
+            self._slots.release()
+
+        forward = time.perf_counter() - started
+        for (_, future, timing), result in zip(batch, results):
+            timing["forward"] = forward
+            if future.done():
+                continue
+            if isinstance(result, BaseException):
+                self._failed_items += 1
+                future.set_exception(result)
+            else:
+                future.set_result(result)
+
+    def _record(self, batch: list, started: float):
+        self._batches += 1
+        self._items += len(batch)
+        self._batch_sizes.append(len(batch))
+        for _, _, timing in batch:
+            timing["started"] = started
+            self._queue_waits.append(started - timing["enqueued"])
+
+    def stats(self) -> dict:
+        """
+        Batch-size and queue-wait statistics. Percentiles cover the most
+        recent `stats_window` batches / items.
+        """
+        sizes = np.array(self._batch_sizes, dtype=np.float64)
+        waits_ms = np.array(self._queue_waits, dtype=np.float64) * 1000
+
+        def percentiles(values: np.ndarray) -> dict:
+            if values.size == 0:
+                return {"mean": 0.0, "p50": 0.0, "p95": 0.0, "p99": 0.0, "max": 0.0}
+            p50, p95, p99 = np.percentile(values, [50, 95, 99])
+            return {
+                "mean": float(values.mean()),
+                "p50": float(p50),
+                "p95": float(p95),
+                "p99": float(p99),
+                "max": float(values.max()),
+            }
+
+        return {
+            "name": self.name,
+            "max_batch_size": self.max_batch_size,
+            "max_wait_ms": self.max_wait * 1000,
+            "batches": self._batches,
+            "items": self._items,
+            "failed_batches": self._failed_batches,
+            "failed_items": self._failed_items,
+            "rejected": self._rejected,
+            "max_queue": self.max_queue,
+            "queued": self._queue.qsize() if self._queue is not None else 0,
+            "batch_size": percentiles(sizes),
+            "queue_wait_ms": percentiles(waits_ms),
+        }
@@ -1,21 +1,278 @@
-from core.serviceInit import model, processor, tokenizer
-from PIL import Image
-import torch
-import io
+from core.serviceInit import clip_runtime
+from core.config import settings
+from services.batcher import MicroBatcher
+from services.executor import inference_executor, InferenceQueueFull
+from services.cache import LRUCache
+from services.fetcher import image_fetcher, ImageFetchError
+from services.embedding_store import create_image_cache
+from services.preprocess import ImagePreprocessor
+from services.metrics import stage_timer
+from concurrent.futures import ThreadPoolExecutor
+import asyncio
+import contextvars
 import numpy as np
 
+# CLIP's text encoder has 77 position embeddings; longer queries are truncated
+TEXT_CONTEXT_LENGTH = 77
+
+# Decoding and resizing run on their own threads (PIL releases the GIL), so
+# they overlap with forward passes on the inference executor
+preprocess_pool = ThreadPoolExecutor(max_workers=max(1, settings.PREPROCESS_WORKERS), thread_name_prefix="preprocess")
+_image_preprocessor = None
+
+def image_preprocessor() -> ImagePreprocessor:
+    # Built from the loaded model's processor so resize, crop and normalization match it
+    global _image_preprocessor
+    if _image_preprocessor is None:
+        _image_preprocessor = ImagePreprocessor.from_processor(
+            clip_runtime.processor,
+            max_pixels=settings.IMAGE_MAX_PIXELS,
+            oversize_policy=settings.IMAGE_OVERSIZE_POLICY,
+        )
+    return _image_preprocessor
+
+async def prepare_images(items: list) -> list:
+    """
+    Decode, resize and center-crop encoded images on the preprocessing pool.
+    Returns one uint8 (crop, crop, 3) array or Exception per item, in order.
+    """
+    loop = asyncio.get_running_loop()
+    # Run with a copy of the request's context so stage timings keep its endpoint label
+    tasks = [
+        loop.run_in_executor(preprocess_pool, contextvars.copy_context().run, lambda data=data: image_preprocessor().prepare(data))
+        for data in items
+    ]
+    return list(await asyncio.gather(*tasks, return_exceptions=True))
+
+def _rows(embeddings: np.ndarray) -> list:
+    # Rows are shared with caches and callers, so make them read-only
+    matrix = np.asarray(embeddings, dtype=np.float32)
+    matrix.setflags(write=False)
+    return list(matrix)
+
+def encode_pixels(batch: list) -> list:
+    """
+    Normalize a batch of prepared images and run one forward pass over it.
+    Returns one float32 NumPy vector per image.
+    """
+    pixel_values = image_preprocessor().normalize(batch)
+    return _rows(clip_runtime.image_features(pixel_values=pixel_values))
+
+def encode_texts(texts: list) -> list:
+    """
+    Run one forward pass over a list of query strings.
+    Returns one float32 NumPy vector per text.
+    """
+    inputs = clip_runtime.tokenizer(texts, padding=True, truncation=True, max_length=TEXT_CONTEXT_LENGTH, return_tensors="np")
+    return _rows(clip_runtime.text_features(**inputs))
+
+def encode_prompt(text: str):
+    """
+    Run one forward pass over a single text, or return None without one when
+    it is longer than the text context and would have to be truncated.
+    """
+    inputs = clip_runtime.tokenizer([text], padding=True, return_tensors="np")
+    if inputs["input_ids"].shape[1] > TEXT_CONTEXT_LENGTH:
+        return None
+    return _rows(clip_runtime.text_features(**inputs))[0]
+
 def generate_image_embedding(image_data: bytes):
-    image = Image.open(io.BytesIO(image_data)).convert("RGB")
-    inputs = processor(images=image, return_tensors="pt")
-    with torch.no_grad():
-        embeddings = model.get_image_features(**inputs)
-    return embeddings.squeeze().tolist()
+    return encode_pixels([image_preprocessor().prepare(image_data)])[0].tolist()
 
 def generate_text_embedding(text: str):
-    inputs = tokenizer([text], return_tensors="pt")
-    with torch.no_grad():
-        text_embeddings = model.get_text_features(**inputs)
-    return text_embeddings.squeeze().tolist()
+    return encode_texts([text])[0].tolist()
+
+image_batcher = MicroBatcher(
+    "image",
+    encode_pixels,
+    max_batch_size=settings.CLIP_MAX_BATCH_SIZE,
+    max_wait_ms=settings.CLIP_MAX_BATCH_WAIT_MS,
+    max_queue=settings.CLIP_MAX_QUEUE,
+    executor=inference_executor,
+    max_concurrent_batches=inference_executor.max_workers,
+)
+text_batcher = MicroBatcher(
+    "text",
+    encode_texts,
+    max_batch_size=settings.CLIP_MAX_BATCH_SIZE,
+    max_wait_ms=settings.CLIP_MAX_BATCH_WAIT_MS,
+    max_queue=settings.CLIP_MAX_QUEUE,
+    executor=inference_executor,
+    max_concurrent_batches=inference_executor.max_workers,
+)
+
+# Content-addressed (image bytes + model id + backend) cache: memory LRU + memory-mapped disk tier
+image_embedding_cache = create_image_cache(clip_runtime.backend_name)
+
+async def embed_image(image_data: bytes) -> list:
+    """
+    Return the cached embedding for these exact image bytes, or preprocess
+    the image and queue it for the next batched forward pass.
+    """
+    key = image_embedding_cache.key(image_data)
+    embedding = image_embedding_cache.get(key)
+    if embedding is None:
+        pixels = (await prepare_images([image_data]))[0]
+        if isinstance(pixels, Exception):
+            raise pixels
+        embedding = await image_batcher.submit(pixels)
+        image_embedding_cache.set(key, embedding)
+    return embedding
+
+text_embedding_cache = LRUCache(
+    max_size=settings.TEXT_EMBEDDING_CACHE_SIZE,
+    ttl_seconds=settings.TEXT_EMBEDDING_CACHE_TTL,
+)
+
+def text_cache_key(text: str) -> tuple:
+    # The CLIP tokenizer lowercases and collapses whitespace itself, so this
+    # normalization never maps two different model inputs to the same key
+    return (settings.CLIP_MODEL_NAME, " ".join(text.split()).lower())
+
+async def embed_text(text: str) -> list:
+    """
+    Return the cached embedding for a query string, or queue it for the next
+    batched forward pass.
+    """
+    key = text_cache_key(text)
+    embedding = text_embedding_cache.get(key)
+    if embedding is None:
+        embedding = await text_batcher.submit(text)
+        text_embedding_cache.set(key, embedding)
+    return embedding
+
+async def embed_prompt(text: str):
+    """
+    Embed free-form text such as a completion prompt in its own forward
+    pass, so it never shares a batch (or the query cache) with
+    /generate-query-embedding callers. Returns None for text longer than the
+    text context: truncated, prompts that only differ after it would get the
+    same embedding.
+    """
+    with stage_timer("model_forward"):
+        return await inference_executor.run(encode_prompt, text)
+
+def _chunks(items: list, size: int):
+    size = max(1, size)
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
+
+async def embed_images(items: list) -> list:
+    """
+    Embed many images in one call. Cached images are answered directly; the
+    rest are preprocessed in parallel and run through the model in chunks of
+    `CLIP_BATCH_CHUNK_SIZE`. Returns one embedding or Exception per item, in order.
+    """
+    keys = [image_embedding_cache.key(image_data) for image_data in items]
+    results = [image_embedding_cache.get(key) for key in keys]
+    misses = [i for i, result in enumerate(results) if result is None]
+
+    # Decode failures are reported per item so one bad upload does not fail the batch
+    prepared = {}
+    for i, pixels in zip(misses, await prepare_images([items[i] for i in misses])):
+        if isinstance(pixels, Exception):
+            results[i] = pixels
+        else:
+            prepared[i] = pixels
+
+    for chunk in _chunks(list(prepared), settings.CLIP_BATCH_CHUNK_SIZE):
+        try:
+            with stage_timer("model_forward"):
+                embeddings = await inference_executor.run(encode_pixels, [prepared[i] for i in chunk])
+        except InferenceQueueFull:
+            raise
+        except Exception as e:
+            embeddings = [e] * len(chunk)
+        for i, embedding in zip(chunk, embeddings):
+            results[i] = embedding
+            if not isinstance(embedding, Exception):
+                image_embedding_cache.set(keys[i], embedding)
+    return results
+
+async def embed_texts(texts: list) -> list:
+    """
+    Embed many query strings in one call. Cached texts are answered directly;
+    the rest run through the model in chunks of `CLIP_BATCH_CHUNK_SIZE`.
+    Returns one embedding or Exception per item, in order.
+    """
+    keys = [text_cache_key(text) for text in texts]
+    results = [text_embedding_cache.get(key) for key in keys]
+    misses = [i for i, result in enumerate(results) if result is None]
+
+    for chunk in _chunks(misses, settings.CLIP_BATCH_CHUNK_SIZE):
+        try:
+            with stage_timer("model_forward"):
+                embeddings = await inference_executor.run(encode_texts, [texts[i] for i in chunk])
+        except InferenceQueueFull:
+            raise
+        except Exception as e:
+            embeddings = [e] * len(chunk)
+        for i, embedding in zip(chunk, embeddings):
+            results[i] = embedding
+            if not isinstance(embedding, Exception):
+                text_embedding_cache.set(keys[i], embedding)
+    return results
+
+async def embed_image_urls(urls: list, concurrency: int = None) -> list:
+    """
+    Download and embed many images by URL. Downloads run concurrently and
+    each chunk of `CLIP_BATCH_CHUNK_SIZE` finished downloads is encoded while
+    the remaining ones are still in flight. Returns one embedding or
+    Exception per URL, in order.
+    """
+    results = [None] * len(urls)
+    downloads = asyncio.Semaphore(concurrency or settings.URL_FETCH_CONCURRENCY)
+    encoders = asyncio.Semaphore(inference_executor.max_workers)
+
+    async def fetch(i: int, url: str):
+        async with downloads:
+            try:
+                return i, await image_fetcher.fetch(url)
+            except ImageFetchError as e:
+                return i, ValueError(f"Error downloading image: {str(e)}")
+            except Exception as e:
+                # Whatever goes wrong with one URL only fails that item
+                return i, ValueError(f"Error downloading image: {type(e).__name__}: {str(e)}")
+
+    async def encode(chunk: list):
+        async with encoders:
+            embeddings = await embed_images([data for _, data in chunk])
+        for (i, _), embedding in zip(chunk, embeddings):
+            results[i] = embedding
+
+    chunk, encode_tasks = [], []
+    try:
+        for next_download in asyncio.as_completed([fetch(i, str(url)) for i, url in enumerate(urls)]):
+            i, data = await next_download
+            if isinstance(data, Exception):
+                results[i] = data
+                continue
+            chunk.append((i, data))
+            if len(chunk) >= settings.CLIP_BATCH_CHUNK_SIZE:
+                encode_tasks.append(asyncio.create_task(encode(chunk)))
+                chunk = []
+        if chunk:
+            encode_tasks.append(asyncio.create_task(encode(chunk)))
+        await asyncio.gather(*encode_tasks)
+    except BaseException:
+        for task in encode_tasks:
+            task.cancel()
+        raise
+    return results
+
+def batch_stats() -> dict:
+    return {
+        "image": image_batcher.stats(),
+        "text": text_batcher.stats(),
+        "executor": inference_executor.stats(),
+        "preprocess": _image_preprocessor.stats() if _image_preprocessor is not None else None,
+    }
+
+def cache_stats() -> dict:
+    return {
+        "text": {"model": settings.CLIP_MODEL_NAME, **text_embedding_cache.stats()},
+        "image": image_embedding_cache.stats(),
+    }
 
 def cosine_similarity(vec1: np.ndarray, vec2: np.ndarray) -> float:
     """
@@ -0,0 +1,203 @@
+import hashlib
+import logging
+import threading
+
+import numpy as np
+
+from core.config import settings
+from services.cache import LRUCache
+
+logger = logging.getLogger(__name__)
+
+
+def completion_key(model: str, system_message: str, prompt: str, temperature: float) -> str:
+    digest = hashlib.blake2b(digest_size=16)
+    for part in (model, system_message, prompt, repr(float(temperature))):
+        digest.update(part.encode("utf-8"))
+        digest.update(b"\0")
+    return digest.hexdigest()
+
+
+def context_key(model: str, system_message: str, temperature: float) -> str:
+    # Semantic matches are only allowed between prompts sharing model, system message and temperature
+    return completion_key(model, system_message, "", temperature)
+
+
+class SemanticIndex:
+    """
+    Prompt embeddings per (model, system message, temperature), searched with
+    one matrix-vector product. Keeps the newest `max_entries` per context.
+    """
+
+    def __init__(self, max_entries: int = 1000):
+        self.max_entries = max(1, max_entries)
+        self._contexts = {}
+        self._lock = threading.Lock()
+
+    def add(self, context: str, key: str, embedding: np.ndarray):
+        vector = np.asarray(embedding, dtype=np.float32)
+        norm = np.linalg.norm(vector)
+        if norm == 0:
+            return
+        with self._lock:
+            keys, matrix = self._contexts.get(context, ([], np.empty((0, len(vector)), dtype=np.float32)))
+            keys = (keys + [key])[-self.max_entries:]
+            matrix = np.vstack([matrix, vector / norm])[-self.max_entries:]
+            self._contexts[context] = (keys, matrix)
+
+    def nearest(self, context: str, embedding: np.ndarray) -> list:
+        """
+        Returns `(key, similarity)` pairs for the stored prompts, most similar
+        first, so callers can skip answers that were evicted meanwhile.
+        """
+        with self._lock:
+            keys, matrix = self._contexts.get(context, ([], None))
+        if not keys:
+            return []
+        vector = np.asarray(embedding, dtype=np.float32)
+        norm = np.linalg.norm(vector)
+        if norm == 0:
+            return []
+        similarities = matrix @ (vector / norm)
+        order = np.argsort(-similarities)
+        return [(keys[i], float(similarities[i])) for i in order]
+
+    def clear(self):
+        with self._lock:
+            self._contexts.clear()
+
+    def __len__(self) -> int:
+        return sum(len(keys) for keys, _ in self._contexts.values())
+
+
+class CompletionCache:
+    """
+    Cache of completion answers keyed by (model, rendered system message,
+    prompt, temperature).
+
+    Only requests with `temperature <= max_temperature` are cached, since
+    sampled answers are not meant to repeat. With a semantic tier, a miss
+    also embeds the prompt with `embed` and reuses the answer of the most
+    similar earlier prompt in the same context when its cosine similarity is
+    at least `semantic_threshold`. `embed` returns None for prompts it
+    cannot represent in full (longer than the text context); those are only
+    matched exactly.
+    """
+
+    def __init__(
+        self,
+        max_size: int = 1000,
+        ttl_seconds: float = 3600,
+        max_temperature: float = 0.0,
+        embed=None,
+        semantic_threshold: float = 0.97,
+        semantic_max_entries: int = 1000,
+    ):
+        self.cache = LRUCache(max_size=max_size, ttl_seconds=ttl_seconds)
+        self.max_temperature = max_temperature
+        self.embed = embed
+        self.semantic_threshold = semantic_threshold
+        self.semantic = SemanticIndex(semantic_max_entries) if embed is not None else None
+        self.exact_hits = 0
+        self.semantic_hits = 0
+        self.misses = 0
+        self.bypassed = 0
+        self.uncacheable = 0
+        self.embedding_errors = 0
+        self.long_prompts = 0
+
+    def cacheable(self, temperature: float) -> bool:
+        return self.cache.max_size > 0 and temperature <= self.max_temperature
+
+    async def _prompt_embedding(self, prompt: str):
+        try:
+            embedding = await self.embed(prompt)
+        except Exception as e:
+            # e.g. the inference queue is full; fall back to exact matching only
+            self.embedding_errors += 1
+            logger.debug(f"Semantic cache skipped: {e}")
+            return None
+        if embedding is None:
+            self.long_prompts += 1
+        return embedding
+
+    async def lookup(self, model: str, system_message: str, prompt: str, temperature: float) -> tuple:
+        """
+        Returns `(entry, status, embedding)` where status is "exact",
+        "semantic" or "miss"; entry is None on a miss. `embedding` is the
+        prompt embedding computed for the semantic tier (None when it was not
+        computed), to be passed on to `store()`.
+        """
+        key = completion_key(model, system_message, prompt, temperature)
+        entry = self.cache.get(key)
+        if entry is not None:
+            self.exact_hits += 1
+            return entry, "exact", None
+        embedding = None
+        if self.semantic is not None:
+            embedding = await self._prompt_embedding(prompt)
+            if embedding is not None:
+                context = context_key(model, system_message, temperature)
+                for match_key, similarity in self.semantic.nearest(context, embedding):
+                    if similarity < self.semantic_threshold:
+                        break
+                    entry = self.cache.get(match_key)
+                    if entry is not None:
+                        self.semantic_hits += 1
+                        return {**entry, "similarity": similarity}, "semantic", embedding
+        self.misses += 1
+        return None, "miss", embedding
+
+    def store(self, model: str, system_message: str, prompt: str, temperature: float, entry: dict, embedding=None):
+        """
+        Cache an answer. The prompt joins the semantic tier only with the
+        `embedding` returned by `lookup()`, so storing never runs the model.
+        """
+        key = completion_key(model, system_message, prompt, temperature)
+        self.cache.set(key, entry)
+        if self.semantic is not None and embedding is not None:
+            self.semantic.add(context_key(model, system_message, temperature), key, embedding)
+
+    def clear(self):
+        self.cache.clear()
+        if self.semantic is not None:
+            self.semantic.clear()
+
+    def stats(self) -> dict:
+        lookups = self.exact_hits + self.semantic_hits + self.misses
+        return {
+            **self.cache.stats(),
+            "max_temperature": self.max_temperature,
+            "exact_hits": self.exact_hits,
+            "semantic_hits": self.semantic_hits,
+            "misses": self.misses,
+            "hit_rate": (self.exact_hits + self.semantic_hits) / lookups if lookups else 0.0,
+            "bypassed": self.bypassed,
+            "uncacheable": self.uncacheable,
+            "semantic": {
+                "enabled": self.semantic is not None,
+                "threshold": self.semantic_threshold,
+                "prompts": len(self.semantic) if self.semantic is not None else 0,
+                "embedding_errors": self.embedding_errors,
+                "long_prompts": self.long_prompts,
+            },
+        }
+
+
+def create_completion_cache() -> CompletionCache:
+    embed = None
+    if settings.COMPLETION_SEMANTIC_CACHE:
+        # The CLIP text tower, outside the query batcher; prompts longer than its context are skipped
+        from services.clip import embed_prompt
+        embed = embed_prompt
+    return CompletionCache(
+        max_size=settings.COMPLETION_CACHE_SIZE,
+        ttl_seconds=settings.COMPLETION_CACHE_TTL,
+        max_temperature=settings.COMPLETION_CACHE_MAX_TEMPERATURE,
+        embed=embed,
+        semantic_threshold=settings.COMPLETION_SEMANTIC_THRESHOLD,
+        semantic_max_entries=settings.COMPLETION_SEMANTIC_MAX_ENTRIES,
+    )
+
+
+completion_cache = create_completion_cache()
@@ -0,0 +1,348 @@
+import asyncio
+import logging
+import time
+from collections import Counter
+from datetime import datetime, timezone
+
+import numpy as np
+
+from core.config import settings
+from core.serviceInit import collection, db
+from services.embedding_codec import decode_embedding, storage_format_of
+
+logger = logging.getLogger(__name__)
+
+EMBEDDING_PATH = "mediaDetails.imageEmbeddings"
+STATS_ID = "embedding-stats"
+DUPLICATES_ID = "near-duplicates"
+SAMPLE_IDS = 20
+NORM_BINS = 20
+# Norms below this count as zero vectors
+ZERO_NORM = 1e-6
+
+
+def iter_embedding_chunks(collection, chunk_size: int = 2000):
+    """
+    Yield `(ids, values)` chunks of stored embeddings in `_id` order, with
+    only the embedding field fetched from MongoDB.
+    """
+    cursor = collection.find(
+        {EMBEDDING_PATH: {"$exists": True}}, {EMBEDDING_PATH: 1}
+    ).sort("_id", 1).batch_size(chunk_size)
+    ids, values = [], []
+    for document in cursor:
+        ids.append(str(document["_id"]))
+        values.append(document.get("mediaDetails", {}).get("imageEmbeddings"))
+        if len(ids) >= chunk_size:
+            yield ids, values
+            ids, values = [], []
+    if ids:
+        yield ids, values
+
+
+class EmbeddingStats:
+    """
+    Streaming accumulator for collection-wide embedding statistics.
+
+    Each chunk is stacked into one float32 matrix per dimension count, so
+    sums, norms and degenerate checks run vectorized. The dimension seen most
+    often is the reference; vectors of any other length count as mismatches.
+    """
+
+    def __init__(self):
+        self.documents = 0
+        self.undecodable = 0
+        self.formats = Counter()
+        self._by_dim = {}  # dim -> {"count", "sum", "sum_sq", "unit_sum", "ids"}
+        self._norms = []
+        self.zero_vectors = 0
+        self.non_finite = 0
+        self.samples = {"undecodable": [], "zero": [], "non_finite": []}
+
+    def _sample(self, name: str, ids):
+        sample = self.samples[name]
+        sample.extend(ids[:SAMPLE_IDS - len(sample)])
+
+    def add(self, ids: list, values: list) -> dict:
+        """
+        Accumulate one chunk. Returns the usable vectors of the chunk grouped
+        by dimension as `{dim: (ids, unit_vectors)}` for duplicate detection.
+        """
+        self.documents += len(ids)
+        grouped = {}
+        for doc_id, value in zip(ids, values):
+            try:
+                vector = decode_embedding(value)
+            except ValueError:
+                vector = None
+            if vector is None:
+                self.undecodable += 1
+                self._sample("undecodable", [doc_id])
+                continue
+            self.formats[storage_format_of(value)] += 1
+            group = grouped.setdefault(len(vector), ([], []))
+            group[0].append(doc_id)
+            group[1].append(vector)
+
+        usable = {}
+        for dim, (group_ids, vectors) in grouped.items():
+            matrix = np.stack(vectors)
+            finite = np.isfinite(matrix).all(axis=1)
+            if not finite.all():
+                self.non_finite += int((~finite).sum())
+                self._sample("non_finite", [i for i, ok in zip(group_ids, finite) if not ok])
+            norms = np.linalg.norm(np.where(finite[:, None], matrix, 0), axis=1)
+            zero = finite & (norms < ZERO_NORM)
+            if zero.any():
+                self.zero_vectors += int(zero.sum())
+                self._sample("zero", [i for i, z in zip(group_ids, zero) if z])
+
+            valid = finite & ~zero
+            matrix, norms = matrix[valid], norms[valid]
+            group_ids = [i for i, ok in zip(group_ids, valid) if ok]
+            if not len(matrix):
+                continue
+            acc = self._by_dim.setdefault(dim, {
+                "count": 0,
+                "sum": np.zeros(dim, dtype=np.float64),
+                "sum_sq": np.zeros(dim, dtype=np.float64),
+                "unit_sum": np.zeros(dim, dtype=np.float64),
+                "ids": [],
+            })
+            unit = matrix / norms[:, None]
+            acc["count"] += len(matrix)
+            acc["sum"] += matrix.sum(axis=0, dtype=np.float64)
+            acc["sum_sq"] += np.square(matrix, dtype=np.float64).sum(axis=0)
+            acc["unit_sum"] += unit.sum(axis=0, dtype=np.float64)
+            if len(acc["ids"]) < SAMPLE_IDS:
+                acc["ids"].extend(group_ids[:SAMPLE_IDS - len(acc["ids"])])
+            self._norms.append((dim, norms.astype(np.float32)))
+            usable[dim] = (group_ids, unit.astype(np.float32))
+        return usable
+
+    @property
+    def reference_dim(self):
+        if not self._by_dim:
+            return None
+        return max(self._by_dim, key=lambda dim: self._by_dim[dim]["count"])
+
+    def result(self) -> dict:
+        dim = self.reference_dim
+        summary = {
+            "documents": self.documents,
+            "storage_formats": dict(self.formats),
+            "undecodable": self.undecodable,
+            "zero_vectors": self.zero_vectors,
+            "non_finite": self.non_finite,
+            "dimensions": dim,
+            "dimension_counts": {str(d): acc["count"] for d, acc in self._by_dim.items()},
+            "dimension_mismatches": sum(acc["count"] for d, acc in self._by_dim.items() if d != dim),
+            "samples": {
+                **self.samples,
+                "dimension_mismatch": {str(d): acc["ids"] for d, acc in self._by_dim.items() if d != dim},
+            },
+        }
+        if dim is None:
+            return {**summary, "vectors": 0}
+
+        acc = self._by_dim[dim]
+        count = acc["count"]
+        norms = np.concatenate([n for d, n in self._norms if d == dim])
+        mean = acc["sum"] / count
+        std = np.sqrt(np.maximum(acc["sum_sq"] / count - mean ** 2, 0))
+        centroid = acc["unit_sum"] / count
+        p1, p5, p50, p95, p99 = np.percentile(norms, [1, 5, 50, 95, 99])
+        histogram, edges = np.histogram(norms, bins=NORM_BINS)
+        return {
+            **summary,
+            "vectors": count,
+            "norm": {
+                "min": float(norms.min()),
+                "max": float(norms.max()),
+                "mean": float(norms.mean()),
+                "std": float(norms.std()),
+                "p1": float(p1), "p5": float(p5), "p50": float(p50), "p95": float(p95), "p99": float(p99),
+                "histogram": {"counts": histogram.tolist(), "edges": edges.astype(float).tolist()},
+            },
+            "mean_vector": mean.astype(float).tolist(),
+            "mean_vector_norm": float(np.linalg.norm(mean)),
+            # Mean cosine similarity to the centroid direction; close to 1 means embeddings are barely spread out
+            "mean_cosine_to_centroid": float(np.linalg.norm(centroid)),
+            "dimension_std": {
+                "min": float(std.min()),
+                "mean": float(std.mean()),
+                "max": float(std.max()),
+                "constant_dimensions": int((std < ZERO_NORM).sum()),
+            },
+        }
+
+
+def near_duplicate_pairs(ids: list, vectors: np.ndarray, threshold: float = 0.98, block_size: int = 2048, max_pairs: int = 10000) -> dict:
+    """
+    Find pairs of unit vectors with cosine similarity >= `threshold`.
+
+    Similarities are computed one `block_size` x `block_size` tile at a time
+    over the upper triangle, so memory stays O(block_size^2) instead of N^2.
+    Only the `max_pairs` most similar pairs are kept; `pairs_found` counts all.
+    """
+    count = len(vectors)
+    rows, cols, scores = [], [], []
+    kept = found = 0
+    truncated = False
+    for start in range(0, count, block_size):
+        block = vectors[start:start + block_size]
+        for other in range(start, count, block_size):
+            similarities = block @ vectors[other:other + block_size].T
+            if other == start:
+                # Same tile: keep each pair once and skip self-similarity
+                similarities[np.tril_indices_from(similarities)] = -np.inf
+            i, j = np.nonzero(similarities >= threshold)
+            if len(i):
+                rows.append(i + start)
+                cols.append(j + other)
+                scores.append(similarities[i, j])
+                kept += len(i)
+                found += len(i)
+            if kept > 2 * max_pairs:
+                rows, cols, scores, truncated = _top_pairs(rows, cols, scores, max_pairs)
+                kept = max_pairs
+
+    if rows:
+        rows, cols, scores, cut = _top_pairs(rows, cols, scores, max_pairs)
+        truncated = truncated or cut
+        rows, cols, scores = rows[0], cols[0], scores[0]
+    else:
+        rows = cols = np.zeros(0, dtype=np.int64)
+        scores = np.zeros(0, dtype=np.float32)
+
+    return {
+        "vectors": count,
+        "threshold": threshold,
+        "pairs_found": found,
+        "truncated": truncated,
+        "groups": _count_groups(rows, cols),
+        "pairs": [
+            {"a": ids[a], "b": ids[b], "score": float(score)}
+            for a, b, score in zip(rows.tolist(), cols.tolist(), scores)
+        ],
+    }
+
+
+def _top_pairs(rows: list, cols: list, scores: list, limit: int) -> tuple:
+    rows, cols, scores = np.concatenate(rows), np.concatenate(cols), np.concatenate(scores)
+    truncated = len(scores) > limit
+    order = np.argsort(-scores, kind="stable")[:limit]
+    return [rows[order]], [cols[order]], [scores[order]], truncated
+
+
+def _count_groups(rows: np.ndarray, cols: np.ndarray) -> int:
+    # Union-find over the kept pairs: number of clusters of near-duplicate documents
+    parent = {}
+
+    def find(x):
+        parent.setdefault(x, x)
+        while parent[x] != x:
+            parent[x] = parent[parent[x]]
+            x = parent[x]
+        return x
+
+    for a, b in zip(rows.tolist(), cols.tolist()):
+        parent[find(a)] = find(b)
+    return len({find(x) for x in list(parent)})
+
+
+class EmbeddingAnalytics:
+    """
+    Collection-wide embedding analytics job.
+
+    One pass streams every stored embedding in chunks, accumulating norm,
+    mean-vector and degenerate/mismatch statistics, and optionally runs
+    blocked near-duplicate detection on the unit vectors of the reference
+    dimension. Results are written to the `embedding_analytics` collection,
+    so reading them costs one `find_one`.
+    """
+
+    def __init__(self, collection, results_collection, chunk_size: int = 2000, block_size: int = 2048, max_pairs: int = 10000):
+        self.collection = collection
+        self.results = results_collection
+        self.chunk_size = max(1, chunk_size)
+        self.block_size = max(1, block_size)
+        self.max_pairs = max(1, max_pairs)
+        self._task = None
+        self.progress = {}
+        self.last_error = None
+
+    def compute(self, duplicates: bool = True, threshold: float = 0.98) -> dict:
+        started = time.perf_counter()
+        stats = EmbeddingStats()
+        vectors = {}  # dim -> (ids, [unit matrices])
+        self.progress = {"documents": 0, "stage": "scanning"}
+        for ids, values in iter_embedding_chunks(self.collection, self.chunk_size):
+            for dim, (chunk_ids, unit) in stats.add(ids, values).items():
+                if duplicates:
+                    group = vectors.setdefault(dim, ([], []))
+                    group[0].extend(chunk_ids)
+                    group[1].append(unit)
+            self.progress["documents"] = stats.documents
+        scanned = time.perf_counter()
+
+        now = datetime.now(timezone.utc)
+        summary = stats.result()
+        summary["seconds"] = round(scanned - started, 3)
+        self.results.replace_one({"_id": STATS_ID}, {"_id": STATS_ID, "computed_at": now, **summary}, upsert=True)
+
+        report = {"stats": {"documents": stats.documents, "seconds": summary["seconds"]}}
+        dim = stats.reference_dim
+        if duplicates:
+            self.progress["stage"] = "near-duplicates"
+            ids, blocks = vectors.get(dim, ([], []))
+            matrix = np.concatenate(blocks) if blocks else np.zeros((0, dim or 0), dtype=np.float32)
+            vectors.clear()
+            found = near_duplicate_pairs(ids, matrix, threshold, self.block_size, self.max_pairs)
+            found["seconds"] = round(time.perf_counter() - scanned, 3)
+            self.results.replace_one(
+                {"_id": DUPLICATES_ID},
+                {"_id": DUPLICATES_ID, "computed_at": datetime.now(timezone.utc), "dimensions": dim, **found},
+                upsert=True,
+            )
+            report["duplicates"] = {key: found[key] for key in ("vectors", "pairs_found", "groups", "truncated", "seconds")}
+        self.progress["stage"] = "done"
+        logger.info(f"Embedding analytics: {report}")
+        return report
+
+    async def _run(self, duplicates: bool, threshold: float):
+        try:
+            self.last_error = None
+            await asyncio.to_thread(self.compute, duplicates, threshold)
+        except Exception as e:
+            self.last_error = str(e)
+            self.progress["stage"] = "failed"
+            logger.error(f"Embedding analytics failed: {e}")
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None and not self._task.done()
+
+    def start(self, duplicates: bool = True, threshold: float = 0.98) -> bool:
+        """
+        Start a background pass. Returns False if one is already running.
+        """
+        if self.running:
+            return False
+        self._task = asyncio.get_running_loop().create_task(self._run(duplicates, threshold))
+        return True
+
+    def stored(self, kind: str, projection: dict = None):
+        return self.results.find_one({"_id": kind}, projection)
+
+    def status(self) -> dict:
+        return {"running": self.running, "progress": self.progress, "last_error": self.last_error}
+
+
+embedding_analytics = EmbeddingAnalytics(
+    collection,
+    db["embedding_analytics"],
+    chunk_size=settings.ANALYTICS_CHUNK_SIZE,
+    block_size=settings.DUPLICATE_BLOCK_SIZE,
+    max_pairs=settings.DUPLICATE_MAX_PAIRS,
+)
@@ -0,0 +1,95 @@
+import numpy as np
+from bson.binary import Binary
+
+from core.config import settings
+
+# Storage formats for mediaDetails.imageEmbeddings
+#   array   - BSON array of doubles (legacy, ~9 bytes per dimension)
+#   float32 - BSON vector (Binary subtype 9), 4 bytes per dimension
+#   int8    - BSON vector (Binary subtype 9), 1 byte per dimension; stores the
+#             direction only (the largest component is scaled to +/-127 before
+#             quantizing) and decodes to unit norm
+#   float16 - user-defined Binary subtype 128 with the same 2-byte header,
+#             2 bytes per dimension; not indexable by Atlas $vectorSearch
+STORAGE_FORMATS = ("array", "float32", "float16", "int8")
+
+VECTOR_SUBTYPE = 9
+FLOAT16_SUBTYPE = 128
+HEADER_SIZE = 2
+
+FLOAT32_DTYPE = 0x27
+INT8_DTYPE = 0x03
+FLOAT16_DTYPE = 0x26
+
+INT8_SCALE = 127
+
+_dtypes = {
+    (VECTOR_SUBTYPE, FLOAT32_DTYPE): np.dtype("<f4"),
+    (VECTOR_SUBTYPE, INT8_DTYPE): np.dtype("i1"),
+    (FLOAT16_SUBTYPE, FLOAT16_DTYPE): np.dtype("<f2"),
+}
+
+
+def encode_embedding(embedding, storage_format: str = None):
+    """
+    Encode an embedding for storage in `mediaDetails.imageEmbeddings` using
+    `storage_format` (defaults to `EMBEDDING_STORAGE_FORMAT`).
+    """
+    storage_format = storage_format or settings.EMBEDDING_STORAGE_FORMAT
+    vector = np.asarray(embedding, dtype=np.float32).reshape(-1)
+
+    if storage_format == "array":
+        return vector.tolist()
+    if storage_format == "float32":
+        return Binary(bytes([FLOAT32_DTYPE, 0]) + vector.astype("<f4").tobytes(), VECTOR_SUBTYPE)
+    if storage_format == "float16":
+        return Binary(bytes([FLOAT16_DTYPE, 0]) + vector.astype("<f2").tobytes(), FLOAT16_SUBTYPE)
+    if storage_format == "int8":
+        # Scaling by the largest component uses the whole int8 range
+        peak = np.max(np.abs(vector)) if len(vector) else 0
+        scaled = vector / peak * INT8_SCALE if peak else vector
+        return Binary(bytes([INT8_DTYPE, 0]) + np.clip(np.rint(scaled), -INT8_SCALE, INT8_SCALE).astype("i1").tobytes(), VECTOR_SUBTYPE)
+    raise ValueError(f"Unknown embedding storage format '{storage_format}', expected one of {STORAGE_FORMATS}")
+
+
+def decode_embedding(value, copy: bool = False):
+    """
+    Decode a stored embedding into a 1-D float32 NumPy array, or None when
+    the value is empty or missing.
+
+    Packed float32 vectors are returned as a read-only view over the BSON
+    bytes without copying; float16/int8 are widened to float32. int8 only
+    stores a direction and is renormalized, so it decodes to unit norm rather
+    than the model's norm. Pass `copy=True` when the result will be modified
+    in place.
+    """
+    if value is None:
+        return None
+    if isinstance(value, Binary):
+        dtype = _dtypes.get((value.subtype, value[0] if len(value) else None))
+        if dtype is None:
+            raise ValueError(f"Unsupported embedding encoding (Binary subtype {value.subtype})")
+        vector = np.frombuffer(value, dtype=dtype, offset=HEADER_SIZE)
+        if value[0] == INT8_DTYPE:
+            vector = vector.astype(np.float32)
+            norm = np.linalg.norm(vector)
+            return vector / norm if norm else vector
+        if dtype != np.float32:
+            return vector.astype(np.float32)
+        return vector.copy() if copy else vector
+    if len(value) == 0:
+        return None
+    return np.array(value, dtype=np.float32)
+
+
+def storage_format_of(value) -> str:
+    """
+    Name the storage format of a stored embedding value.
+    """
+    if isinstance(value, Binary):
+        return {
+            (VECTOR_SUBTYPE, FLOAT32_DTYPE): "float32",
+            (VECTOR_SUBTYPE, INT8_DTYPE): "int8",
+            (FLOAT16_SUBTYPE, FLOAT16_DTYPE): "float16",
+        }.get((value.subtype, value[0] if len(value) else None), "unknown")
+    return "array"
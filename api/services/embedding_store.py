@@ -0,0 +1,203 @@
+import hashlib
+import logging
+import os
+import threading
+import zlib
+
+import numpy as np
+
+from core.config import settings
+from services.cache import LRUCache
+
+logger = logging.getLogger(__name__)
+
+EMPTY_KEY = bytes(16)
+
+
+def content_key(data: bytes, model_id: str, backend: str = "") -> bytes:
+    """
+    16-byte content address of an image for a given model and inference
+    backend (backends agree only approximately).
+    """
+    digest = hashlib.blake2b(digest_size=16)
+    for part in (model_id, backend):
+        digest.update(part.encode("utf-8"))
+        digest.update(b"\0")
+    digest.update(data)
+    return digest.digest()
+
+
+class DiskEmbeddingCache:
+    """
+    Persistent embedding cache stored as an open-addressed hash table of
+    fixed-size float32 records in a memory-mapped file.
+
+    A key hashes to a home slot and may live in any of the next `probe`
+    slots; when they are all taken, the slot picked by the key's hash is
+    overwritten (an eviction). Each record carries a CRC of its key and
+    vector, so a reader racing a writer, or a slot left with one worker's key
+    and another's vector by two writers in different processes, is a miss
+    and never the wrong embedding.
+    Because the table is a plain file, every uvicorn worker that maps it
+    shares the same entries and they survive restarts.
+    """
+
+    def __init__(self, path: str, dim: int = 512, slots: int = 65536, probe: int = 8):
+        self.dim = dim
+        self.slots = max(1, slots)
+        self.probe = max(1, min(probe, self.slots))
+        self.path = path
+        self.dtype = np.dtype([
+            ("key", "V16"),
+            ("crc", "<u4"),
+            ("reserved", "<u4"),
+            ("vector", "<f4", (dim,)),
+        ])
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        expected_size = self.slots * self.dtype.itemsize
+        exists = os.path.exists(path) and os.path.getsize(path) == expected_size
+        if os.path.exists(path) and not exists:
+            logger.warning(f"Embedding cache file {path} has an unexpected size; recreating it")
+        self._records = np.memmap(path, dtype=self.dtype, mode="r+" if exists else "w+", shape=(self.slots,))
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.writes = 0
+        self.evictions = 0
+        self.corrupt = 0
+
+    def _candidates(self, key: bytes) -> list:
+        home = int.from_bytes(key[:8], "little") % self.slots
+        return [(home + i) % self.slots for i in range(self.probe)]
+
+    @staticmethod
+    def _checksum(key: bytes, vector: np.ndarray) -> int:
+        return zlib.crc32(vector.tobytes(), zlib.crc32(key))
+
+    def get(self, key: bytes):
+        for slot in self._candidates(key):
+            stored_key = self._records[slot]["key"].tobytes()
+            if stored_key == key:
+                # Validate a private copy, so the checked bytes are the returned ones
+                record = self._records[slot:slot + 1].copy()[0]
+                vector = np.array(record["vector"], dtype=np.float32)
+                if record["key"].tobytes() != key or self._checksum(key, vector) != int(record["crc"]):
+                    self.corrupt += 1
+                    break
+                self.hits += 1
+                vector.setflags(write=False)
+                return vector
+            if stored_key == EMPTY_KEY:
+                break
+        self.misses += 1
+        return None
+
+    def put(self, key: bytes, vector: np.ndarray):
+        vector = np.asarray(vector, dtype=np.float32).reshape(-1)
+        if vector.shape[0] != self.dim:
+            return
+        with self._lock:
+            candidates = self._candidates(key)
+            target = None
+            for slot in candidates:
+                stored_key = self._records[slot]["key"].tobytes()
+                if stored_key == key or stored_key == EMPTY_KEY:
+                    target = slot
+                    break
+            if target is None:
+                target = candidates[int.from_bytes(key[8:], "little") % len(candidates)]
+                self.evictions += 1
+            record = self._records[target]
+            # Invalidate, write the vector, then publish the key
+            record["key"] = np.void(EMPTY_KEY)
+            record["vector"] = vector
+            record["crc"] = self._checksum(key, vector)
+            record["key"] = np.void(key)
+            self.writes += 1
+
+    def clear(self):
+        with self._lock:
+            self._records["key"] = np.void(EMPTY_KEY)
+            self._records.flush()
+
+    def flush(self):
+        self._records.flush()
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "path": self.path,
+            "slots": self.slots,
+            "dimensions": self.dim,
+            "size_bytes": self.slots * self.dtype.itemsize,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "writes": self.writes,
+            "evictions": self.evictions,
+            "corrupt": self.corrupt,
+        }
+
+
+class ImageEmbeddingCache:
+    """
+    Two-tier content-addressed cache for image embeddings: an in-memory LRU in
+    front of the optional memory-mapped disk tier.
+    """
+
+    def __init__(self, model_id: str, memory: LRUCache, disk: DiskEmbeddingCache = None, backend: str = ""):
+        self.model_id = model_id
+        self.backend = backend
+        self.memory = memory
+        self.disk = disk
+
+    def key(self, image_data: bytes) -> bytes:
+        return content_key(image_data, self.model_id, self.backend)
+
+    def get(self, key: bytes):
+        vector = self.memory.get(key)
+        if vector is None and self.disk is not None:
+            vector = self.disk.get(key)
+            if vector is not None:
+                self.memory.set(key, vector)
+        return vector
+
+    def set(self, key: bytes, vector: np.ndarray):
+        self.memory.set(key, vector)
+        if self.disk is not None:
+            self.disk.put(key, vector)
+
+    def clear(self):
+        self.memory.clear()
+        if self.disk is not None:
+            self.disk.clear()
+
+    def stats(self) -> dict:
+        return {
+            "model": self.model_id,
+            "backend": self.backend,
+            "memory": self.memory.stats(),
+            "disk": self.disk.stats() if self.disk is not None else None,
+        }
+
+
+def create_image_cache(backend: str = "") -> ImageEmbeddingCache:
+    disk = None
+    if settings.IMAGE_CACHE_DISK_PATH:
+        try:
+            disk = DiskEmbeddingCache(
+                settings.IMAGE_CACHE_DISK_PATH,
+                dim=settings.IMAGE_CACHE_DIM,
+                slots=settings.IMAGE_CACHE_DISK_SLOTS,
+                probe=settings.IMAGE_CACHE_PROBE,
+            )
+        except OSError as e:
+            logger.error(f"Disk embedding cache disabled: {e}")
+    return ImageEmbeddingCache(
+        settings.CLIP_MODEL_NAME,
+        LRUCache(max_size=settings.IMAGE_CACHE_SIZE),
+        disk,
+        backend=backend,
+    )
@@ -0,0 +1,107 @@
+import asyncio
+import logging
+import sys
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+
+from core.config import settings
+
+logger = logging.getLogger(__name__)
+
+
+class InferenceQueueFull(Exception):
+    """
+    Raised when inference work is rejected because the queue is at capacity.
+    """
+
+
+class InferenceExecutor:
+    """
+    Bounded thread pool for blocking CLIP/torch work.
+
+    Coroutines `await run(fn, ...)` so the event loop stays free while the
+    model runs. At most `max_pending` submissions may be queued or running;
+    beyond that `InferenceQueueFull` is raised immediately instead of letting
+    work pile up. A job keeps its slot until it finishes, even when the
+    caller awaiting it is cancelled.
+
+    torch is only imported (to apply `torch_threads`) when the first worker
+    thread starts, so importing the app does not import torch.
+    """
+
+    def __init__(self, max_workers: int = 1, max_pending: int = 8, torch_threads: int = 0):
+        self.max_workers = max(1, max_workers)
+        self.max_pending = max(1, max_pending)
+        self.torch_threads = torch_threads
+        self._pool = ThreadPoolExecutor(
+            max_workers=self.max_workers,
+            thread_name_prefix="inference",
+            initializer=self._configure_torch,
+        )
+        self._torch_configured = False
+        self._lock = threading.Lock()
+        self._pending = 0
+        self._completed = 0
+        self._failed = 0
+        self._rejected = 0
+        logger.info(f"Inference executor: {self.max_workers} worker(s), max pending {self.max_pending}")
+
+    def _configure_torch(self):
+        if self.torch_threads <= 0 or self._torch_configured:
+            return
+        import torch
+
+        self._torch_configured = True
+        torch.set_num_threads(self.torch_threads)
+        try:
+            torch.set_num_interop_threads(1)
+        except RuntimeError:
+            # Inter-op threads can only be set before torch runs any parallel work
+            pass
+        logger.info(f"torch intra-op threads: {torch.get_num_threads()}")
+
+    async def run(self, fn, *args, **kwargs):
+        with self._lock:
+            if self._pending >= self.max_pending:
+                self._rejected += 1
+                raise InferenceQueueFull(f"Inference queue is full ({self.max_pending} pending)")
+            self._pending += 1
+        job = self._pool.submit(partial(fn, *args, **kwargs))
+        # The slot is released when the job itself ends: a cancelled caller
+        # does not stop a job that is already running
+        job.add_done_callback(self._finished)
+        return await asyncio.wrap_future(job)
+
+    def _finished(self, job):
+        with self._lock:
+            self._pending -= 1
+            if job.cancelled():
+                return
+            if job.exception() is not None:
+                self._failed += 1
+            else:
+                self._completed += 1
+
+    def stats(self) -> dict:
+        # Only report torch threads once something else has imported torch
+        torch = sys.modules.get("torch")
+        return {
+            "workers": self.max_workers,
+            "torch_threads": torch.get_num_threads() if torch is not None else None,
+            "max_pending": self.max_pending,
+            "pending": self._pending,
+            "completed": self._completed,
+            "failed": self._failed,
+            "rejected": self._rejected,
+        }
+
+    def shutdown(self):
+        self._pool.shutdown(wait=False)
+
+
+inference_executor = InferenceExecutor(
+    max_workers=settings.INFERENCE_WORKERS,
+    max_pending=settings.INFERENCE_MAX_PENDING,
+    torch_threads=settings.TORCH_NUM_THREADS,
+)
@@ -0,0 +1,139 @@
+import asyncio
+from contextlib import asynccontextmanager
+from urllib.parse import urlsplit
+
+import httpx
+
+from core.config import settings
+
+
+class ImageFetchError(Exception):
+    """
+    Raised when an image URL cannot be downloaded.
+    """
+
+
+class ImageTooLarge(ImageFetchError):
+    """
+    Raised when an image is larger than the configured byte limit.
+    """
+
+
+class ImageFetcher:
+    """
+    Shared async HTTP client for downloading images by URL.
+
+    Connections are pooled and kept alive across requests, each host gets at
+    most `per_host_limit` concurrent downloads, and bodies are streamed so a
+    download is aborted as soon as it exceeds `max_bytes`. A host's limiter
+    only exists while it has downloads in flight.
+    """
+
+    def __init__(
+        self,
+        max_bytes: int = 20 * 1024 * 1024,
+        timeout: float = 10.0,
+        max_connections: int = 100,
+        max_keepalive_connections: int = 20,
+        per_host_limit: int = 8,
+    ):
+        self.max_bytes = max_bytes
+        self.timeout = timeout
+        self.max_connections = max_connections
+        self.max_keepalive_connections = max_keepalive_connections
+        self.per_host_limit = max(1, per_host_limit)
+        self._client = None
+        self._loop = None
+        self._host_limits = {}  # host -> [semaphore, downloads using it]
+
+        self.downloads = 0
+        self.failures = 0
+        self.too_large = 0
+        self.bytes_downloaded = 0
+
+    @property
+    def client(self) -> httpx.AsyncClient:
+        loop = asyncio.get_running_loop()
+        if self._client is None or self._loop is not loop:
+            self._loop = loop
+            self._host_limits.clear()
+            self._client = httpx.AsyncClient(
+                timeout=httpx.Timeout(self.timeout),
+                limits=httpx.Limits(
+                    max_connections=self.max_connections,
+                    max_keepalive_connections=self.max_keepalive_connections,
+                ),
+                follow_redirects=True,
+            )
+        return self._client
+
+    @asynccontextmanager
+    async def _host_slot(self, host: str):
+        entry = self._host_limits.get(host)
+        if entry is None:
+            entry = self._host_limits[host] = [asyncio.Semaphore(self.per_host_limit), 0]
+        entry[1] += 1
+        try:
+            async with entry[0]:
+                yield
+        finally:
+            entry[1] -= 1
+            if entry[1] == 0 and self._host_limits.get(host) is entry:
+                del self._host_limits[host]
+
+    async def fetch(self, url: str) -> bytes:
+        """
+        Download `url` and return its body, raising `ImageTooLarge` past
+        `max_bytes` and `ImageFetchError` for any other failure.
+        """
+        client = self.client
+        try:
+            async with self._host_slot(urlsplit(url).hostname):
+                async with client.stream("GET", url) as response:
+                    response.raise_for_status()
+                    declared = response.headers.get("content-length")
+                    if declared and declared.isdigit() and int(declared) > self.max_bytes:
+                        raise ImageTooLarge(f"Image is {declared} bytes (limit {self.max_bytes})")
+
+                    chunks, size = [], 0
+                    async for chunk in response.aiter_bytes():
+                        size += len(chunk)
+                        if size > self.max_bytes:
+                            raise ImageTooLarge(f"Image exceeds the {self.max_bytes} byte limit")
+                        chunks.append(chunk)
+        except ImageTooLarge:
+            self.too_large += 1
+            raise
+        except (httpx.HTTPError, httpx.InvalidURL, ValueError) as e:
+            # ValueError covers URLs urlsplit rejects, e.g. an unclosed IPv6 bracket
+            self.failures += 1
+            raise ImageFetchError(str(e) or type(e).__name__) from e
+
+        self.downloads += 1
+        self.bytes_downloaded += size
+        return b"".join(chunks)
+
+    async def aclose(self):
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+    def stats(self) -> dict:
+        return {
+            "max_bytes": self.max_bytes,
+            "per_host_limit": self.per_host_limit,
+            "active_hosts": len(self._host_limits),
+            "max_connections": self.max_connections,
+            "downloads": self.downloads,
+            "failures": self.failures,
+            "too_large": self.too_large,
+            "bytes_downloaded": self.bytes_downloaded,
+        }
+
+
+image_fetcher = ImageFetcher(
+    max_bytes=settings.URL_FETCH_MAX_BYTES,
+    timeout=settings.URL_FETCH_TIMEOUT,
+    max_connections=settings.URL_FETCH_MAX_CONNECTIONS,
+    per_host_limit=settings.URL_FETCH_PER_HOST_LIMIT,
+)
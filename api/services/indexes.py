@@ -0,0 +1,182 @@
+import logging
+import re
+import time
+
+from pymongo import ASCENDING, TEXT, IndexModel
+from pymongo.collation import Collation, CollationStrength
+
+from core.serviceInit import collection, secondary_collection
+
+logger = logging.getLogger(__name__)
+
+# Case- and accent-insensitive comparison for exact-match filters
+CASE_INSENSITIVE = Collation(locale="en", strength=CollationStrength.SECONDARY)
+MATCH_MODES = ("prefix", "exact", "contains")
+
+# Lowercased copies of searchable fields, written on insert and backfilled at startup
+NORMALIZED_FIELDS = {
+    "documents": {"name": "name_lower"},
+    "instructions": {"technology": "technology_lower"},
+}
+
+INDEXES = {
+    "documents": [
+        IndexModel([("name_lower", ASCENDING)], name="name_lower"),
+        IndexModel([("name", ASCENDING)], name="name_ci", collation=CASE_INSENSITIVE),
+    ],
+    "instructions": [
+        IndexModel(
+            [("technology", TEXT), ("instruction", TEXT), ("strict_rules", TEXT)],
+            name="instruction_text",
+        ),
+        IndexModel([("technology_lower", ASCENDING)], name="technology_lower"),
+        IndexModel([("technology", ASCENDING)], name="technology_ci", collation=CASE_INSENSITIVE),
+    ],
+}
+
+COLLECTIONS = {"documents": collection, "instructions": secondary_collection}
+
+
+def normalized(value: str) -> str:
+    # Must match the $toLower/$trim expression used by the backfill
+    return value.strip().lower()
+
+
+def text_filter(field: str, value: str, match: str = "contains") -> tuple:
+    """
+    Filter for a case-insensitive match on `field`. Returns `(filter, collation)`.
+
+    - contains (default): unanchored regex; cannot use an index and scans the collection
+    - prefix: anchored regex on the lowercased copy, a bounded range scan of its index
+    - exact: equality with a case-insensitive collation, served by the collation index
+    """
+    if match == "prefix":
+        return {f"{field}_lower": {"$regex": f"^{re.escape(normalized(value))}"}}, None
+    if match == "exact":
+        return {field: value.strip()}, CASE_INSENSITIVE
+    if match == "contains":
+        return {field: {"$regex": re.escape(value), "$options": "i"}}, None
+    raise ValueError(f"Unknown match mode '{match}', expected one of {MATCH_MODES}")
+
+
+def with_normalized_fields(kind: str, document: dict) -> dict:
+    """
+    Add the lowercased copies declared in NORMALIZED_FIELDS to a new document.
+    """
+    for source, target in NORMALIZED_FIELDS[kind].items():
+        if isinstance(document.get(source), str):
+            document[target] = normalized(document[source])
+    return document
+
+
+class IndexManager:
+    """
+    Ensures the declared indexes and normalized fields exist at startup, so
+    requests never create indexes or inspect `index_information()`.
+    """
+
+    def __init__(self, collections: dict, indexes: dict, normalized_fields: dict):
+        self.collections = collections
+        self.indexes = indexes
+        self.normalized_fields = normalized_fields
+        self.report = {}
+
+    def backfill(self, kind: str) -> int:
+        """
+        Write missing lowercased copies with one server-side update per field.
+        """
+        coll = self.collections[kind]
+        updated = 0
+        for source, target in self.normalized_fields.get(kind, {}).items():
+            result = coll.update_many(
+                {source: {"$type": "string"}, target: {"$exists": False}},
+                [{"$set": {target: {"$toLower": {"$trim": {"input": f"${source}"}}}}}],
+            )
+            updated += result.modified_count
+        return updated
+
+    def ensure(self) -> dict:
+        for kind, models in self.indexes.items():
+            started = time.perf_counter()
+            coll = self.collections[kind]
+            try:
+                created = coll.create_indexes(models)
+                backfilled = self.backfill(kind)
+                self.report[kind] = {
+                    "collection": coll.name,
+                    "indexes": created,
+                    "backfilled": backfilled,
+                    "seconds": round(time.perf_counter() - started, 3),
+                    "error": None,
+                }
+            except Exception as e:
+                logger.error(f"Failed to ensure indexes on {coll.name}: {e}")
+                self.report[kind] = {"collection": coll.name, "error": str(e)}
+        return self.report
+
+    def status(self) -> dict:
+        return self.report
+
+
+index_manager = IndexManager(COLLECTIONS, INDEXES, NORMALIZED_FIELDS)
+
+
+def _plan_stages(plan: dict) -> list:
+    # Flatten a winning plan into its stage chain, e.g. ["LIMIT", "FETCH", "IXSCAN name_lower"]
+    stages = []
+    while plan:
+        stage = plan.get("stage", "?")
+        if plan.get("indexName"):
+            stage = f"{stage} {plan['indexName']}"
+        stages.append(stage)
+        plan = plan.get("inputStage") or (plan.get("inputStages") or [None])[0] or plan.get("queryPlan")
+    return stages
+
+
+def summarize_explain(explain: dict) -> dict:
+    planner = explain.get("queryPlanner", {})
+    winning = planner.get("winningPlan", {})
+    stats = explain.get("executionStats", {})
+    stages = _plan_stages(winning)
+    return {
+        "stages": stages,
+        "uses_index": any(stage.startswith(("IXSCAN", "TEXT", "IDHACK", "EXPRESS")) for stage in stages),
+        "collection_scan": any(stage.startswith("COLLSCAN") for stage in stages),
+        "n_returned": stats.get("nReturned"),
+        "keys_examined": stats.get("totalKeysExamined"),
+        "docs_examined": stats.get("totalDocsExamined"),
+        "execution_ms": stats.get("executionTimeMillis"),
+    }
+
+
+def query_shapes(name: str = "a", technology: str = "a", text: str = "example") -> dict:
+    """
+    The queries issued by the listing and search endpoints, as cursors ready
+    to be explained.
+    """
+    shapes = {
+        "list-documents": collection.find({}, {"_id": 1, "name": 1}).sort("_id", 1).limit(11),
+        "instructions/search": secondary_collection.find(
+            {"$text": {"$search": text}}, {"score": {"$meta": "textScore"}}
+        ).sort([("score", {"$meta": "textScore"})]).limit(5),
+    }
+    for match in MATCH_MODES:
+        query_filter, collation = text_filter("name", name, match)
+        shapes[f"list-documents name={match}"] = collection.find(
+            query_filter, {"_id": 1, "name": 1}, collation=collation
+        ).sort("_id", 1).limit(11)
+        query_filter, collation = text_filter("technology", technology, match)
+        shapes[f"instructions technology={match}"] = secondary_collection.find(
+            query_filter, {"_id": 1, "technology": 1}, collation=collation
+        ).sort("_id", 1).limit(11)
+    return shapes
+
+
+def explain_query_shapes(**values) -> dict:
+    plans = {}
+    for shape, cursor in query_shapes(**values).items():
+        try:
+            plans[shape] = summarize_explain(cursor.explain())
+        except Exception as e:
+            plans[shape] = {"error": str(e)}
+    return plans
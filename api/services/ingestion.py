@@ -0,0 +1,265 @@
+import asyncio
+import logging
+import time
+from collections import deque
+from datetime import datetime, timedelta, timezone
+
+from pymongo import UpdateOne
+
+from core.config import settings
+from core.serviceInit import collection, db
+from services.clip import embed_image_urls
+from services.embedding_codec import encode_embedding
+from services.executor import InferenceQueueFull
+from services.mongo import index_embeddings
+
+logger = logging.getLogger(__name__)
+
+CHECKPOINT_ID = "image-embeddings"
+
+
+class IngestionWorker:
+    """
+    Background worker that backfills `mediaDetails.imageEmbeddings` for
+    documents that only have an `imageUrl`.
+
+    Each pass takes the next batch of pending documents after the checkpointed
+    `_id`, downloads their images concurrently, embeds them in CLIP batches and
+    writes the vectors with one `bulk_write`. Failed documents, including every
+    document of a pass that failed as a whole, get an `ingestion.nextAttemptAt`
+    with exponential backoff until `max_attempts`, then are marked
+    `ingestion.failed`, so no document can block the queue.
+    The checkpoint lives in the `ingestion_state` collection so a restart
+    resumes from the same place.
+    """
+
+    def __init__(
+        self,
+        collection,
+        state_collection,
+        batch_size: int = 32,
+        download_concurrency: int = 8,
+        max_attempts: int = 5,
+        backoff_seconds: float = 30,
+        poll_seconds: float = 10,
+    ):
+        self.collection = collection
+        self.state_collection = state_collection
+        self.batch_size = max(1, batch_size)
+        self.download_concurrency = max(1, download_concurrency)
+        self.max_attempts = max(1, max_attempts)
+        self.backoff_seconds = backoff_seconds
+        self.poll_seconds = poll_seconds
+
+        self._task = None
+        self._wakeup = None
+        self._recent = deque(maxlen=100)  # (finished_at, images embedded, seconds spent)
+        self.embedded = 0
+        self.failed = 0
+        self.batches = 0
+        self.last_error = None
+        self.started_at = None
+
+    def pending_filter(self, now: datetime) -> dict:
+        return {
+            "mediaDetails.imageUrl": {"$exists": True},
+            "mediaDetails.imageEmbeddings": {"$exists": False},
+            "ingestion.failed": {"$ne": True},
+            "$or": [
+                {"ingestion.nextAttemptAt": {"$exists": False}},
+                {"ingestion.nextAttemptAt": {"$lte": now}},
+            ],
+        }
+
+    def _load_checkpoint(self):
+        state = self.state_collection.find_one({"_id": CHECKPOINT_ID}) or {}
+        return state.get("last_id")
+
+    def _save_checkpoint(self, last_id, embedded: int, failed: int):
+        self.state_collection.update_one(
+            {"_id": CHECKPOINT_ID},
+            {
+                "$set": {"last_id": last_id, "updated_at": datetime.now(timezone.utc)},
+                "$inc": {"embedded": embedded, "failed": failed},
+            },
+            upsert=True,
+        )
+
+    def _next_batch(self) -> list:
+        now = datetime.now(timezone.utc)
+        query = self.pending_filter(now)
+        last_id = self._load_checkpoint()
+        projection = {"mediaDetails.imageUrl": 1, "ingestion.attempts": 1}
+        if last_id is not None:
+            batch = list(self.collection.find({**query, "_id": {"$gt": last_id}}, projection)
+                         .sort("_id", 1).limit(self.batch_size))
+            if batch:
+                return batch
+        # Reached the end of the collection: wrap around to pick up retries
+        return list(self.collection.find(query, projection).sort("_id", 1).limit(self.batch_size))
+
+    def _backoff(self, attempts: int) -> timedelta:
+        return timedelta(seconds=self.backoff_seconds * (2 ** (attempts - 1)))
+
+    def _write_results(self, documents: list, results: list) -> tuple:
+        now = datetime.now(timezone.utc)
+        operations, embedded_ids, embedded_vectors = [], [], []
+        for document, result in zip(documents, results):
+            if isinstance(result, Exception):
+                attempts = document.get("ingestion", {}).get("attempts", 0) + 1
+                update = {
+                    "ingestion.attempts": attempts,
+                    "ingestion.lastError": str(result),
+                    "ingestion.lastAttemptAt": now,
+                    "ingestion.nextAttemptAt": now + self._backoff(attempts),
+                }
+                if attempts >= self.max_attempts:
+                    update["ingestion.failed"] = True
+                operations.append(UpdateOne({"_id": document["_id"]}, {"$set": update}))
+            else:
+                operations.append(UpdateOne(
+                    # Never overwrite an embedding written elsewhere in the meantime
+                    {"_id": document["_id"], "mediaDetails.imageEmbeddings": {"$exists": False}},
+                    {
+                        "$set": {
+                            "mediaDetails.imageEmbeddings": encode_embedding(result),
+                            "ingestion.embeddedAt": now,
+                        },
+                        "$unset": {"ingestion.nextAttemptAt": "", "ingestion.lastError": ""},
+                    },
+                ))
+                embedded_ids.append(document["_id"])
+                embedded_vectors.append(result)
+        if operations:
+            self.collection.bulk_write(operations, ordered=False)
+        if embedded_ids:
+            index_embeddings(embedded_ids, embedded_vectors)
+        return len(embedded_ids), len(documents) - len(embedded_ids)
+
+    async def process_once(self) -> int:
+        """
+        Embed the next batch of pending documents. Returns the number of
+        documents handled (0 when nothing is pending).
+        """
+        documents = await asyncio.to_thread(self._next_batch)
+        if not documents:
+            return 0
+
+        started = time.perf_counter()
+        urls = [str(doc["mediaDetails"]["imageUrl"]) for doc in documents]
+        try:
+            results = await embed_image_urls(urls, self.download_concurrency)
+        except InferenceQueueFull:
+            raise
+        except Exception as e:
+            # Record the failed pass on every document in it, so their backoff
+            # (and the checkpoint) moves the queue past them instead of retrying
+            # the same batch forever
+            logger.error(f"Ingestion batch failed: {e}")
+            self.last_error = str(e)
+            results = [e] * len(documents)
+
+        embedded, failed = await asyncio.to_thread(self._write_results, documents, results)
+        await asyncio.to_thread(self._save_checkpoint, documents[-1]["_id"], embedded, failed)
+
+        elapsed = time.perf_counter() - started
+        self._recent.append((time.time(), embedded, elapsed))
+        self.embedded += embedded
+        self.failed += failed
+        self.batches += 1
+        logger.info(f"Ingestion: embedded {embedded}, failed {failed} in {elapsed:.2f}s")
+        return len(documents)
+
+    async def run(self):
+        self.started_at = time.time()
+        while True:
+            try:
+                if await self.process_once():
+                    continue
+            except asyncio.CancelledError:
+                raise
+            except InferenceQueueFull:
+                # Online traffic has priority; back off and try again shortly
+                await asyncio.sleep(1)
+                continue
+            except Exception as e:
+                self.last_error = str(e)
+                logger.error(f"Ingestion pass failed: {e}")
+            self._wakeup.clear()
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), self.poll_seconds)
+            except asyncio.TimeoutError:
+                pass
+
+    def start(self):
+        if self._task is None or self._task.done():
+            self._wakeup = asyncio.Event()
+            self._task = asyncio.get_running_loop().create_task(self.run())
+            logger.info("Ingestion worker started")
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    def wake(self):
+        """
+        Start the next pass now instead of waiting for the poll interval.
+        """
+        if self._wakeup is not None:
+            self._wakeup.set()
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None and not self._task.done()
+
+    def throughput(self) -> float:
+        """
+        Images embedded per second of processing time over recent batches.
+        """
+        images = sum(count for _, count, _ in self._recent)
+        seconds = sum(elapsed for _, _, elapsed in self._recent)
+        return images / seconds if seconds else 0.0
+
+    def lag(self) -> dict:
+        """
+        How far behind the worker is: pending documents and the age of the
+        oldest one (from its ObjectId timestamp).
+        """
+        query = self.pending_filter(datetime.now(timezone.utc))
+        pending = self.collection.count_documents(query)
+        oldest = self.collection.find_one(query, {"_id": 1}, sort=[("_id", 1)])
+        age = None
+        if oldest is not None:
+            age = (datetime.now(timezone.utc) - oldest["_id"].generation_time).total_seconds()
+        permanently_failed = self.collection.count_documents({"ingestion.failed": True})
+        return {"pending": pending, "oldest_pending_age_seconds": age, "permanently_failed": permanently_failed}
+
+    def stats(self) -> dict:
+        return {
+            "running": self.running,
+            "batch_size": self.batch_size,
+            "download_concurrency": self.download_concurrency,
+            "batches": self.batches,
+            "embedded": self.embedded,
+            "failed": self.failed,
+            "images_per_second": self.throughput(),
+            "last_error": self.last_error,
+            "checkpoint": str(self._load_checkpoint()),
+            **self.lag(),
+        }
+
+
+ingestion_worker = IngestionWorker(
+    collection,
+    db["ingestion_state"],
+    batch_size=settings.INGESTION_BATCH_SIZE,
+    download_concurrency=settings.INGESTION_DOWNLOAD_CONCURRENCY,
+    max_attempts=settings.INGESTION_MAX_ATTEMPTS,
+    backoff_seconds=settings.INGESTION_BACKOFF_SECONDS,
+    poll_seconds=settings.INGESTION_POLL_SECONDS,
+)
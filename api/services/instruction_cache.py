@@ -0,0 +1,172 @@
+import asyncio
+import logging
+import threading
+
+from bson import ObjectId
+from bson.errors import InvalidId
+
+from core.config import settings
+from core.serviceInit import secondary_collection
+from services.cache import LRUCache
+from services.metrics import stage_timer
+
+logger = logging.getLogger(__name__)
+
+SYSTEM_PREAMBLE = "You are an expert AI assistant that strictly follows rules."
+
+
+def render_system_message(instructions: list, strict_rules: list) -> str:
+    system_message_parts = [SYSTEM_PREAMBLE]
+
+    if instructions:
+        system_message_parts.append("\nINSTRUCTIONS:")
+        system_message_parts.extend(f"- {i}" for i in instructions)
+
+    if strict_rules:
+        system_message_parts.append("\nSTRICT RULES (MUST FOLLOW):")
+        system_message_parts.extend(f"- {r}" for r in strict_rules)
+
+    return "\n".join(system_message_parts)
+
+
+class InstructionCache:
+    """
+    TTL + LRU cache of instruction documents together with their rendered
+    system message, so a completion with an `instruction_id` costs no
+    database read and no string building on a hit.
+
+    Concurrent misses for the same id share one `find_one`, which keeps
+    running for the remaining callers if the one that started it is
+    cancelled; its result is not cached if the entry is invalidated while it
+    runs. Only existing instructions are cached, so creating one needs
+    no invalidation; after `start_watching()`, a change stream invalidates
+    entries changed by other workers or tools (requires a replica set).
+    Otherwise changes show up once the TTL expires.
+    """
+
+    def __init__(self, collection, max_size: int = 1024, ttl_seconds: float = 300):
+        self.collection = collection
+        self.cache = LRUCache(max_size=max_size, ttl_seconds=ttl_seconds)
+        self._inflight = {}
+        # Per-key generation of loads in flight, bumped by invalidate()/clear()
+        self._generations = {}
+        self._generations_lock = threading.Lock()
+        self.db_reads = 0
+        self.coalesced = 0
+        self.invalidations = 0
+        self._watcher = None
+        self._stop_watching = threading.Event()
+        self.watch_error = None
+
+    def _load(self, object_id: ObjectId):
+        self.db_reads += 1
+        with stage_timer("mongo_query"):
+            document = self.collection.find_one({"_id": object_id}, {"instruction": 1, "strict_rules": 1})
+        if document is None:
+            return None
+        instructions = [document["instruction"]]
+        strict_rules = document.get("strict_rules", [])
+        return {
+            "instruction": document["instruction"],
+            "strict_rules": strict_rules,
+            "system_message": render_system_message(instructions, strict_rules),
+        }
+
+    async def get(self, instruction_id: str):
+        """
+        Return the cached instruction entry, or None if it does not exist.
+        Raises ValueError for a malformed id.
+        """
+        try:
+            object_id = ObjectId(instruction_id)
+        except (InvalidId, TypeError) as e:
+            raise ValueError(str(e)) from e
+        key = str(object_id)
+
+        entry = self.cache.get(key)
+        if entry is not None:
+            return entry
+
+        pending = self._inflight.get(key)
+        if pending is not None:
+            self.coalesced += 1
+        else:
+            pending = asyncio.ensure_future(self._fill(key, object_id))
+            # Retrieve the exception even when every caller was cancelled
+            pending.add_done_callback(lambda task: task.cancelled() or task.exception())
+            self._inflight[key] = pending
+        # Shielded so a cancelled caller leaves the shared load running for the others
+        return await asyncio.shield(pending)
+
+    async def _fill(self, key: str, object_id: ObjectId):
+        with self._generations_lock:
+            self._generations[key] = 0
+        try:
+            entry = await asyncio.to_thread(self._load, object_id)
+            with self._generations_lock:
+                # Invalidated while reading: the document may predate the change
+                if entry is not None and self._generations[key] == 0:
+                    self.cache.set(key, entry)
+            return entry
+        finally:
+            with self._generations_lock:
+                self._generations.pop(key, None)
+            self._inflight.pop(key, None)
+
+    def invalidate(self, instruction_id):
+        key = str(instruction_id)
+        self.invalidations += 1
+        with self._generations_lock:
+            if key in self._generations:
+                self._generations[key] += 1
+            self.cache.invalidate(key)
+
+    def clear(self):
+        self.invalidations += 1
+        with self._generations_lock:
+            for key in self._generations:
+                self._generations[key] += 1
+            self.cache.clear()
+
+    def _watch(self):
+        try:
+            with self.collection.watch(max_await_time_ms=1000) as stream:
+                logger.info("Watching instruction changes")
+                while not self._stop_watching.is_set():
+                    change = stream.try_next()
+                    if change is None:
+                        continue
+                    if "documentKey" in change:
+                        self.invalidate(change["documentKey"]["_id"])
+                    else:
+                        # drop, rename or invalidate events
+                        self.clear()
+        except Exception as e:
+            self.watch_error = str(e)
+            logger.error(f"Instruction change stream stopped, relying on TTL expiry: {e}")
+
+    def start_watching(self):
+        if self._watcher is None or not self._watcher.is_alive():
+            self._stop_watching.clear()
+            self._watcher = threading.Thread(target=self._watch, name="instruction-watch", daemon=True)
+            self._watcher.start()
+
+    def stop_watching(self):
+        self._stop_watching.set()
+
+    def stats(self) -> dict:
+        return {
+            **self.cache.stats(),
+            "db_reads": self.db_reads,
+            "coalesced_misses": self.coalesced,
+            "invalidations": self.invalidations,
+            "watching_changes": self._watcher is not None and self._watcher.is_alive(),
+            "watch_error": self.watch_error,
+        }
+
+
+instruction_cache = InstructionCache(
+    secondary_collection,
+    max_size=settings.INSTRUCTION_CACHE_SIZE,
+    ttl_seconds=settings.INSTRUCTION_CACHE_TTL,
+)
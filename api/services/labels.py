@@ -0,0 +1,68 @@
+import numpy as np
+
+from core.config import settings
+from core.serviceInit import clip_runtime
+from services.cache import LRUCache
+from services.clip import embed_texts
+
+# Label text embeddings, L2-normalized and stacked as one (labels, dim) matrix
+label_matrix_cache = LRUCache(max_size=settings.LABEL_MATRIX_CACHE_SIZE)
+
+
+def label_set_key(labels: list) -> tuple:
+    return (settings.CLIP_MODEL_NAME, tuple(labels))
+
+
+def normalize_rows(matrix: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0  # Leave zero vectors at zero instead of dividing by zero
+    return matrix / norms
+
+
+async def get_label_matrix(labels: list) -> np.ndarray:
+    """
+    Return the normalized text-embedding matrix for a label set, encoding it
+    once and caching it by label set.
+    """
+    key = label_set_key(labels)
+    matrix = label_matrix_cache.get(key)
+    if matrix is None:
+        embeddings = await embed_texts(labels)
+        for label, embedding in zip(labels, embeddings):
+            if isinstance(embedding, Exception):
+                raise ValueError(f"Failed to embed label '{label}': {str(embedding)}")
+        matrix = normalize_rows(np.asarray(embeddings, dtype=np.float32))
+        label_matrix_cache.set(key, matrix)
+    return matrix
+
+
+def logit_scale() -> float:
+    return clip_runtime.logit_scale()
+
+
+def score_labels(image_embeddings: np.ndarray, label_matrix: np.ndarray) -> tuple:
+    """
+    Score every image against every label with one matrix product.
+
+    Returns `(similarities, probabilities)`, both shaped (images, labels):
+    cosine similarities, and their softmax over labels using CLIP's logit scale.
+    """
+    similarities = normalize_rows(np.atleast_2d(image_embeddings).astype(np.float32)) @ label_matrix.T
+    logits = similarities * logit_scale()
+    logits -= logits.max(axis=1, keepdims=True)
+    exp = np.exp(logits)
+    return similarities, exp / exp.sum(axis=1, keepdims=True)
+
+
+def ranked_labels(labels: list, similarities: np.ndarray, probabilities: np.ndarray, top_k: int = None) -> list:
+    order = np.argsort(-probabilities)
+    if top_k:
+        order = order[:top_k]
+    return [
+        {
+            "label": labels[i],
+            "score": float(probabilities[i]),
+            "similarity": float(similarities[i]),
+        }
+        for i in order
+    ]
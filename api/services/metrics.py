@@ -0,0 +1,365 @@
+import contextvars
+import os
+import sys
+import threading
+import time
+import uuid
+from collections import Counter, OrderedDict
+from contextlib import contextmanager
+
+from core.config import settings
+from services.routes import route_table
+
+# Seconds; chosen to resolve both sub-millisecond cache hits and multi-second completions
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+# Stages timed on the hot paths
+#   image_decode  - reading image bytes into pixels (JPEG draft decode)
+#   preprocess    - resize and center crop
+#   batch_wait    - time queued in a CLIP micro-batcher before its batch starts
+#   model_forward - CLIP forward pass (normalization and tokenization included)
+#   mongo_query   - MongoDB reads
+#   vector_search - nearest-neighbour search (Atlas $vectorSearch or the local index)
+#   openai_call   - OpenAI request until the response (or the stream's headers) arrives
+#   openai_stream - reading a streamed completion to the end
+#   serialization - rendering JSON or binary response bodies
+STAGES = (
+    "image_decode", "preprocess", "batch_wait", "model_forward", "mongo_query",
+    "vector_search", "openai_call", "openai_stream", "serialization",
+)
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names: tuple, values: tuple, extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _format_value(value: float) -> str:
+    value = float(value)
+    return str(int(value)) if value.is_integer() else repr(value)
+
+
+class Histogram:
+    """
+    Prometheus histogram with fixed buckets, one series per label set.
+    """
+
+    def __init__(self, name: str, help: str, label_names: tuple, buckets: tuple = LATENCY_BUCKETS):
+        self.name = name
+        self.help = help
+        self.label_names = label_names
+        self.buckets = buckets
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def observe(self, labels: tuple, value: float):
+        with self._lock:
+            series = self._series.get(labels)
+            if series is None:
+                series = self._series[labels] = [[0] * len(self.buckets), 0.0, 0]
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series[0][i] += 1
+                    break
+            series[1] += value
+            series[2] += 1
+
+    def totals(self) -> dict:
+        """
+        `{label_values: (sum, count)}` for every series.
+        """
+        with self._lock:
+            return {labels: (total, count) for labels, (_, total, count) in self._series.items()}
+
+    def render(self) -> list:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            series = [(labels, list(counts), total, count) for labels, (counts, total, count) in self._series.items()]
+        for labels, counts, total, count in sorted(series):
+            cumulative = 0
+            for bound, bucket in zip(self.buckets, counts):
+                cumulative += bucket
+                le = 'le="%s"' % bound
+                lines.append(f"{self.name}_bucket{_format_labels(self.label_names, labels, le)} {cumulative}")
+            le = 'le="+Inf"'
+            lines.append(f"{self.name}_bucket{_format_labels(self.label_names, labels, le)} {count}")
+            lines.append(f"{self.name}_sum{_format_labels(self.label_names, labels)} {_format_value(total)}")
+            lines.append(f"{self.name}_count{_format_labels(self.label_names, labels)} {count}")
+        return lines
+
+
+class CounterMetric:
+    """
+    Prometheus counter, one series per label set.
+    """
+
+    def __init__(self, name: str, help: str, label_names: tuple):
+        self.name = name
+        self.help = help
+        self.label_names = label_names
+        self._series = Counter()
+        self._lock = threading.Lock()
+
+    def inc(self, labels: tuple, amount: float = 1):
+        with self._lock:
+            self._series[labels] += amount
+
+    def render(self) -> list:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            series = sorted(self._series.items())
+        lines.extend(f"{self.name}{_format_labels(self.label_names, labels)} {_format_value(value)}" for labels, value in series)
+        return lines
+
+
+class GaugeCallback:
+    """
+    Prometheus gauge read at scrape time from `collect()`, which returns
+    `{label_values: value}`.
+    """
+
+    def __init__(self, name: str, help: str, label_names: tuple, collect):
+        self.name = name
+        self.help = help
+        self.label_names = label_names
+        self.collect = collect
+
+    def render(self) -> list:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} gauge"]
+        try:
+            values = self.collect()
+        except Exception:
+            return []
+        lines.extend(f"{self.name}{_format_labels(self.label_names, labels)} {_format_value(value)}" for labels, value in values.items())
+        return lines
+
+
+class MetricsRegistry:
+    def __init__(self):
+        self._metrics = OrderedDict()
+
+    def _register(self, metric):
+        self._metrics[metric.name] = metric
+        return metric
+
+    def histogram(self, name: str, help: str, label_names: tuple, buckets: tuple = LATENCY_BUCKETS) -> Histogram:
+        return self._register(Histogram(name, help, label_names, buckets))
+
+    def counter(self, name: str, help: str, label_names: tuple) -> CounterMetric:
+        return self._register(CounterMetric(name, help, label_names))
+
+    def gauge(self, name: str, help: str, label_names: tuple, collect) -> GaugeCallback:
+        return self._register(GaugeCallback(name, help, label_names, collect))
+
+    def render(self) -> str:
+        lines = []
+        for metric in self._metrics.values():
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+registry = MetricsRegistry()
+stage_seconds = registry.histogram(
+    "hf_stage_duration_seconds", "Time spent in each request stage", ("endpoint", "stage")
+)
+request_seconds = registry.histogram(
+    "hf_request_duration_seconds", "Request latency until the response body is sent", ("endpoint", "method")
+)
+requests_total = registry.counter(
+    "hf_requests_total", "Requests handled", ("endpoint", "method", "status")
+)
+
+
+class RequestMetrics:
+    """
+    Per-request state: the endpoint label and the seconds spent per stage.
+    """
+
+    def __init__(self, endpoint: str):
+        self.endpoint = endpoint
+        self.stages = Counter()
+
+
+_current = contextvars.ContextVar("request_metrics", default=None)
+
+
+def observe_stage(stage: str, seconds: float):
+    """
+    Record `seconds` for `stage` under the current request's endpoint, or
+    "background" outside a request (ingestion, analytics, startup).
+    """
+    request = _current.get()
+    stage_seconds.observe((request.endpoint if request else "background", stage), seconds)
+    if request is not None:
+        request.stages[stage] += seconds
+
+
+@contextmanager
+def stage_timer(stage: str):
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        observe_stage(stage, time.perf_counter() - started)
+
+
+class SamplingProfiler:
+    """
+    Wall-clock sampling profiler for one request.
+
+    A background thread records the Python stacks of the event loop thread
+    and of the inference and preprocessing pool threads every `interval`
+    seconds, as collapsed stacks (`thread;outer;...;inner count`) that
+    flamegraph.pl or speedscope can render. Other requests served at the
+    same time show up in the event loop samples too.
+    """
+
+    def __init__(self, loop_thread_id: int, interval: float = 0.005, thread_prefixes: tuple = ("inference", "preprocess")):
+        self.loop_thread_id = loop_thread_id
+        self.interval = interval
+        self.thread_prefixes = thread_prefixes
+        self.samples = Counter()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def _threads(self) -> dict:
+        names = {}
+        for thread in threading.enumerate():
+            if thread.ident == self.loop_thread_id:
+                names[thread.ident] = "event-loop"
+            elif thread.name.startswith(self.thread_prefixes):
+                names[thread.ident] = thread.name
+        return names
+
+    @staticmethod
+    def _collapse(frame) -> str:
+        stack = []
+        while frame is not None:
+            code = frame.f_code
+            stack.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{frame.f_lineno})")
+            frame = frame.f_back
+        return ";".join(reversed(stack))
+
+    def _sample(self):
+        own = threading.get_ident()
+        while not self._stop.wait(self.interval):
+            names = self._threads()
+            for thread_id, frame in sys._current_frames().items():
+                if thread_id in names and thread_id != own:
+                    self.samples[f"{names[thread_id]};{self._collapse(frame)}"] += 1
+
+    def start(self):
+        self._thread = threading.Thread(target=self._sample, name="profiler", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> dict:
+        self._stop.set()
+        self._thread.join()
+        return {
+            "interval_ms": self.interval * 1000,
+            "samples": sum(self.samples.values()),
+            "folded": "\n".join(f"{stack} {count}" for stack, count in self.samples.most_common()),
+        }
+
+
+class ProfileStore:
+    """
+    The most recent request profiles, by id.
+    """
+
+    def __init__(self, max_profiles: int = 20):
+        self.max_profiles = max(1, max_profiles)
+        self._profiles = OrderedDict()
+        self._active = threading.Lock()
+
+    def begin(self):
+        # One profile at a time keeps the sampling overhead bounded
+        return self._active.acquire(blocking=False)
+
+    def end(self, profile_id: str, profile: dict):
+        self._profiles[profile_id] = profile
+        while len(self._profiles) > self.max_profiles:
+            self._profiles.popitem(last=False)
+        self._active.release()
+
+    def get(self, profile_id: str):
+        return self._profiles.get(profile_id)
+
+    def summaries(self) -> list:
+        return [
+            {"id": profile_id, **{key: value for key, value in profile.items() if key != "folded"}}
+            for profile_id, profile in reversed(self._profiles.items())
+        ]
+
+
+profiles = ProfileStore(settings.PROFILE_KEEP)
+
+
+class MetricsMiddleware:
+    """
+    ASGI middleware that labels the request with its route template, times
+    it, counts it by status, and makes the request available to
+    `stage_timer`. With `profiling`, requests carrying `profile_header` are
+    also sampled; the profile id is returned in `X-Profile-Id`.
+    """
+
+    def __init__(self, app, profiling: bool = False, profile_header: str = "X-Profile", profile_interval_ms: float = 5):
+        self.app = app
+        self.profiling = profiling
+        self.profile_header = profile_header.lower().encode("latin-1")
+        self.profile_interval = max(0.001, profile_interval_ms / 1000)
+
+    def _wants_profile(self, scope) -> bool:
+        if not self.profiling:
+            return False
+        for name, value in scope["headers"]:
+            if name == self.profile_header:
+                return value.strip().lower() not in (b"", b"0", b"false")
+        return False
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        template, _ = route_table.lookup(scope)
+        request = RequestMetrics(template or "unmatched")
+        method = scope["method"]
+        status = [500]
+
+        profiler, profile_id = None, None
+        if self._wants_profile(scope) and profiles.begin():
+            profile_id = uuid.uuid4().hex
+            profiler = SamplingProfiler(threading.get_ident(), self.profile_interval)
+            profiler.start()
+
+        async def send_with_status(message):
+            if message["type"] == "http.response.start":
+                status[0] = message["status"]
+                if profile_id is not None:
+                    message = {**message, "headers": [*message.get("headers", []), (b"x-profile-id", profile_id.encode("latin-1"))]}
+            await send(message)
+
+        token = _current.set(request)
+        started = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            elapsed = time.perf_counter() - started
+            _current.reset(token)
+            request_seconds.observe((request.endpoint, method), elapsed)
+            requests_total.inc((request.endpoint, method, str(status[0])))
+            if profiler is not None:
+                profiles.end(profile_id, {
+                    "endpoint": request.endpoint,
+                    "method": method,
+                    "status": status[0],
+                    "duration_ms": round(elapsed * 1000, 3),
+                    "stages_ms": {stage: round(seconds * 1000, 3) for stage, seconds in request.stages.items()},
+                    **profiler.stop(),
+                })
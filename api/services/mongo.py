@@ -1,27 +1,89 @@
 from core.serviceInit import collection
 from bson import ObjectId
+import numpy as np
+from services.search_backend import get_search_backend
+from services.embedding_codec import decode_embedding
+from services.metrics import stage_timer
 
-def search_embeddings(query_embedding: list, limit: int = 5):
-    pipeline = [
-        {
-            '$vectorSearch': {
-                'queryVector': query_embedding, 
-                'path': 'mediaDetails.imageEmbeddings', 
-                'numCandidates': 512, 
-                'index': 'vector_imageEmbedding', 
-                'limit': limit
-            }
-        }
-    ]
-    results = list(collection.aggregate(pipeline))
+def search_embeddings(
+    query_embedding: list,
+    limit: int = 5,
+    num_candidates: int = None,
+    include_embeddings: bool = True,
+    rerank: bool = False,
+    rerank_factor: int = 4,
+):
+    """
+    Find the documents closest to `query_embedding` using the configured
+    vector search backend (`VECTOR_SEARCH_BACKEND`). Each document gets a
+    `score` field.
+
+    With `rerank`, `limit * rerank_factor` candidates are fetched and re-ordered
+    by exact cosine similarity before the top `limit` are returned.
+    """
+    backend = get_search_backend()
+    if not rerank:
+        with stage_timer("vector_search"):
+            return backend.search(query_embedding, limit, num_candidates, include_embeddings)
+
+    candidate_limit = limit * max(1, rerank_factor)
+    with stage_timer("vector_search"):
+        candidates = backend.search(query_embedding, candidate_limit, num_candidates, include_embeddings=True)
+    return rerank_exact(query_embedding, candidates, limit, include_embeddings)
+
+def rerank_exact(query_embedding: list, documents: list, limit: int, include_embeddings: bool = True) -> list:
+    """
+    Re-order documents by exact cosine similarity between the query and their
+    stored embeddings, in one matrix product.
+    """
+    query = np.asarray(query_embedding, dtype=np.float32)
+    candidates, vectors = [], []
+    for doc in documents:
+        vector = decode_embedding(doc.get("mediaDetails", {}).get("imageEmbeddings"))
+        if vector is not None and len(vector) == len(query):
+            candidates.append(doc)
+            vectors.append(vector)
+    if not candidates:
+        return []
+
+    matrix = np.stack(vectors)
+    norms = np.linalg.norm(matrix, axis=1) * np.linalg.norm(query)
+    norms[norms == 0] = 1.0
+    scores = (matrix @ query) / norms
+
+    results = []
+    for i in np.argsort(-scores)[:limit]:
+        doc = candidates[i]
+        doc["approximate_score"] = doc.get("score")
+        doc["score"] = float(scores[i])
+        if not include_embeddings:
+            doc["mediaDetails"].pop("imageEmbeddings", None)
+        results.append(doc)
     return results
 
+def index_embeddings(doc_ids: list, embeddings: list):
+    """
+    Tell the vector search backend about newly stored embeddings.
+    """
+    get_search_backend().add([str(doc_id) for doc_id in doc_ids], embeddings)
+
 def get_document_by_id(doc_id: str):
     """
     Fetch a document from MongoDB by its ID.
     """
     try:
         object_id = ObjectId(doc_id)
-        return collection.find_one({"_id": object_id})
+        with stage_timer("mongo_query"):
+            return collection.find_one({"_id": object_id})
     except Exception as e:
-        raise ValueError(f"Invalid ID format or error fetching document: {str(e)}")
\ No newline at end of file
+        raise ValueError(f"Invalid ID format or error fetching document: {str(e)}")
+
+def get_documents_by_ids(doc_ids: list, projection: dict = None) -> dict:
+    """
+    Fetch many documents in one query. Returns a dict keyed by the string ID;
+    IDs that are missing from the collection are absent from the result.
+    """
+    object_ids = [ObjectId(doc_id) for doc_id in doc_ids]
+    with stage_timer("mongo_query"):
+        cursor = collection.find({"_id": {"$in": object_ids}}, projection)
+        return {str(doc["_id"]): doc for doc in cursor}
@@ -0,0 +1,82 @@
+import asyncio
+import os
+
+import httpx
+import openai
+
+from core.config import settings
+
+
+class OpenAIClientPool:
+    """
+    Process-wide `AsyncOpenAI` client.
+
+    One client (and its pooled, keep-alive HTTP connections) is shared by
+    every request on the event loop instead of being built per call.
+    `base_url` points it at any OpenAI-compatible server, e.g. a local mock.
+    """
+
+    def __init__(
+        self,
+        api_key: str = None,
+        base_url: str = None,
+        timeout: float = 60.0,
+        connect_timeout: float = 5.0,
+        max_connections: int = 100,
+        max_keepalive_connections: int = 20,
+        max_retries: int = 2,
+    ):
+        self.api_key = api_key
+        self.base_url = base_url or None
+        self.timeout = timeout
+        self.connect_timeout = connect_timeout
+        self.max_connections = max_connections
+        self.max_keepalive_connections = max_keepalive_connections
+        self.max_retries = max_retries
+        self._client = None
+        self._loop = None
+
+    @property
+    def client(self) -> openai.AsyncOpenAI:
+        loop = asyncio.get_running_loop()
+        if self._client is None or self._loop is not loop:
+            self._loop = loop
+            self._client = openai.AsyncOpenAI(
+                api_key=self.api_key,
+                base_url=self.base_url,
+                max_retries=self.max_retries,
+                http_client=httpx.AsyncClient(
+                    timeout=httpx.Timeout(self.timeout, connect=self.connect_timeout),
+                    limits=httpx.Limits(
+                        max_connections=self.max_connections,
+                        max_keepalive_connections=self.max_keepalive_connections,
+                    ),
+                ),
+            )
+        return self._client
+
+    async def aclose(self):
+        if self._client is not None:
+            await self._client.close()
+            self._client = None
+
+    def stats(self) -> dict:
+        return {
+            "base_url": str(self._client.base_url) if self._client is not None else self.base_url,
+            "timeout": self.timeout,
+            "connect_timeout": self.connect_timeout,
+            "max_connections": self.max_connections,
+            "max_keepalive_connections": self.max_keepalive_connections,
+            "max_retries": self.max_retries,
+        }
+
+
+openai_clients = OpenAIClientPool(
+    api_key=os.getenv("OPENAI_API_KEY"),
+    base_url=settings.OPENAI_BASE_URL,
+    timeout=settings.OPENAI_TIMEOUT,
+    connect_timeout=settings.OPENAI_CONNECT_TIMEOUT,
+    max_connections=settings.OPENAI_MAX_CONNECTIONS,
+    max_keepalive_connections=settings.OPENAI_MAX_KEEPALIVE,
+    max_retries=settings.OPENAI_MAX_RETRIES,
+)
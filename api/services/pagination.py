@@ -0,0 +1,120 @@
+import base64
+import hashlib
+import json
+
+from bson import ObjectId
+from bson.errors import InvalidId
+
+from core.config import settings
+from services.cache import LRUCache
+from services.metrics import stage_timer
+
+
+class InvalidCursor(ValueError):
+    """
+    Raised when a continuation token is malformed or belongs to another query.
+    """
+
+
+def filter_fingerprint(collection_name: str, query_filter: dict) -> str:
+    canonical = json.dumps([collection_name, query_filter], sort_keys=True, default=str)
+    return hashlib.blake2b(canonical.encode("utf-8"), digest_size=6).hexdigest()
+
+
+def encode_cursor(last_id: ObjectId, fingerprint: str) -> str:
+    """
+    Opaque continuation token: the last `_id` returned plus a fingerprint of
+    the collection and filter it was issued for.
+    """
+    payload = json.dumps({"after": str(last_id), "q": fingerprint}, separators=(",", ":"))
+    return base64.urlsafe_b64encode(payload.encode("utf-8")).decode("ascii").rstrip("=")
+
+
+def decode_cursor(token: str, fingerprint: str) -> ObjectId:
+    try:
+        padded = token + "=" * (-len(token) % 4)
+        payload = json.loads(base64.urlsafe_b64decode(padded.encode("ascii")))
+        last_id = ObjectId(payload["after"])
+    except (ValueError, KeyError, TypeError, InvalidId) as e:
+        raise InvalidCursor("Malformed cursor") from e
+    if payload.get("q") != fingerprint:
+        raise InvalidCursor("Cursor was issued for a different query")
+    return last_id
+
+
+def keyset_page(
+    collection,
+    query_filter: dict,
+    projection: dict,
+    page_size: int,
+    cursor: str = None,
+    page: int = 1,
+    collation=None,
+) -> tuple:
+    """
+    One page of `collection` in `_id` order.
+
+    With a `cursor`, the page starts right after the `_id` it encodes, so the
+    cost does not grow with depth. Without one, `page` falls back to skip
+    (kept for the page-number API). Returns `(documents, next_cursor)`, where
+    `next_cursor` is None on the last page.
+    """
+    fingerprint = filter_fingerprint(collection.name, query_filter)
+    if cursor:
+        after = {"_id": {"$gt": decode_cursor(cursor, fingerprint)}}
+        query = {"$and": [query_filter, after]} if query_filter else after
+        documents = collection.find(query, projection, collation=collation).sort("_id", 1).limit(page_size + 1)
+    else:
+        documents = collection.find(query_filter, projection, collation=collation).sort("_id", 1) \
+            .skip((page - 1) * page_size).limit(page_size + 1)
+
+    with stage_timer("mongo_query"):
+        documents = list(documents)
+    if len(documents) <= page_size:
+        return documents, None
+    documents = documents[:page_size]
+    return documents, encode_cursor(documents[-1]["_id"], fingerprint)
+
+
+class CountCache:
+    """
+    Totals for paginated listings without a `count_documents` scan per page.
+
+    Unfiltered totals come from `estimated_document_count` (collection
+    metadata, O(1)); filtered totals are counted once and cached for
+    `ttl_seconds`. `exact=True` always counts and refreshes the cache.
+    """
+
+    def __init__(self, max_size: int = 1024, ttl_seconds: float = 30):
+        self.cache = LRUCache(max_size=max_size, ttl_seconds=ttl_seconds)
+
+    def count(self, collection, query_filter: dict, exact: bool = False, collation=None) -> tuple:
+        """
+        Returns `(total, is_exact)`.
+        """
+        with stage_timer("mongo_query"):
+            return self._count(collection, query_filter, exact, collation)
+
+    def _count(self, collection, query_filter: dict, exact: bool, collation) -> tuple:
+        options = {"collation": collation} if collation else {}
+        if exact:
+            total = collection.count_documents(query_filter, **options)
+            self.cache.set(filter_fingerprint(collection.name, query_filter), total)
+            return total, True
+        if not query_filter:
+            return collection.estimated_document_count(), False
+        key = filter_fingerprint(collection.name, query_filter)
+        total = self.cache.get(key)
+        if total is None:
+            total = collection.count_documents(query_filter, **options)
+            self.cache.set(key, total)
+        return total, False
+
+    def clear(self):
+        self.cache.clear()
+
+    def stats(self) -> dict:
+        return self.cache.stats()
+
+
+count_cache = CountCache(max_size=settings.COUNT_CACHE_SIZE, ttl_seconds=settings.COUNT_CACHE_TTL)
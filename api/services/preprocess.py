@@ -0,0 +1,184 @@
+import io
+import threading
+import time
+
+import numpy as np
+from PIL import Image
+
+from services.metrics import stage_timer
+
+# openai/clip-vit-* preprocessing; `from_processor` reads the loaded model's values instead
+CLIP_IMAGE_MEAN = (0.48145466, 0.4578275, 0.40821073)
+CLIP_IMAGE_STD = (0.26862954, 0.26130258, 0.27577711)
+OVERSIZE_POLICIES = ("downscale", "reject")
+
+
+class ImageRejected(ValueError):
+    """
+    Raised when an image exceeds the pixel limit and the policy is "reject".
+    """
+
+
+class ImagePreprocessor:
+    """
+    CLIP image preprocessing without a full-resolution decode.
+
+    `prepare()` turns encoded bytes into a (crop, crop, 3) uint8 array:
+    JPEGs are decoded by libjpeg at a reduced DCT scale (1/2, 1/4 or 1/8)
+    that still leaves `draft_headroom` times the target resolution, and the
+    center crop is resized straight from the source region in one bicubic
+    pass. `normalize()` rescales and standardizes a whole batch with two
+    vectorized NumPy operations and returns NCHW float32 `pixel_values`.
+
+    Images above `max_pixels` (read from the header, before decoding) are
+    rejected with `ImageRejected`, or decoded at the smallest draft scale when
+    the policy is "downscale". Only JPEGs can be decoded at a reduced scale,
+    so oversized images in other formats (PNG, WebP, GIF, ...) are rejected
+    under either policy.
+    """
+
+    def __init__(
+        self,
+        size: int = 224,
+        crop_size: int = 224,
+        mean: tuple = CLIP_IMAGE_MEAN,
+        std: tuple = CLIP_IMAGE_STD,
+        max_pixels: int = 0,
+        oversize_policy: str = "downscale",
+        draft_headroom: float = 2.0,
+    ):
+        if oversize_policy not in OVERSIZE_POLICIES:
+            raise ValueError(f"Unknown IMAGE_OVERSIZE_POLICY '{oversize_policy}', expected one of {OVERSIZE_POLICIES}")
+        self.size = size
+        self.crop_size = crop_size
+        self.max_pixels = max_pixels
+        self.oversize_policy = oversize_policy
+        self.draft_headroom = max(1.0, draft_headroom)
+        std = np.asarray(std, dtype=np.float32)
+        # (x / 255 - mean) / std folded into one multiply-add per channel
+        self._scale = (1.0 / (255.0 * std)).astype(np.float32)
+        self._offset = (-np.asarray(mean, dtype=np.float32) / std).astype(np.float32)
+
+        self._lock = threading.Lock()
+        self.images = 0
+        self.drafted = 0
+        self.oversized = 0
+        self.rejected = 0
+        self.rejected_not_jpeg = 0
+        self.seconds = 0.0
+
+    @classmethod
+    def from_processor(cls, processor, **options) -> "ImagePreprocessor":
+        """
+        Match a transformers CLIPImageProcessor's resize, crop and normalization.
+        """
+        size = processor.size
+        crop_size = processor.crop_size
+        return cls(
+            size=size if isinstance(size, int) else size["shortest_edge"],
+            crop_size=crop_size if isinstance(crop_size, int) else crop_size["height"],
+            mean=tuple(processor.image_mean),
+            std=tuple(processor.image_std),
+            **options,
+        )
+
+    def decode(self, image_data: bytes) -> Image.Image:
+        image = Image.open(io.BytesIO(image_data))
+        width, height = image.size
+        headroom = self.draft_headroom
+        if self.max_pixels and width * height > self.max_pixels:
+            # Draft decoding is JPEG-only; anything else would be decoded at full size
+            downscale = self.oversize_policy == "downscale" and image.format == "JPEG"
+            with self._lock:
+                self.oversized += 1
+                if not downscale:
+                    self.rejected += 1
+                    if self.oversize_policy == "downscale":
+                        self.rejected_not_jpeg += 1
+            if not downscale:
+                detail = "" if self.oversize_policy == "reject" else f"; only JPEGs are downscaled, this is {image.format}"
+                raise ImageRejected(f"Image is {width}x{height} pixels (limit {self.max_pixels}{detail})")
+            headroom = 1.0
+        if image.format == "JPEG":
+            scale = self.size * headroom / min(width, height)
+            if scale < 1:
+                image.draft("RGB", (int(width * scale + 0.5), int(height * scale + 0.5)))
+                if image.size != (width, height):
+                    with self._lock:
+                        self.drafted += 1
+        return image.convert("RGB")
+
+    def resize_crop(self, image: Image.Image) -> np.ndarray:
+        """
+        Resize the shortest side to `size` and center-crop to `crop_size`,
+        resampling only the cropped source region.
+        """
+        width, height = image.size
+        scale = self.size / min(width, height)
+        resized_width, resized_height = int(width * scale), int(height * scale)
+        if width <= height:
+            resized_width = self.size
+        else:
+            resized_height = self.size
+        left = int((resized_width - self.crop_size) / 2)
+        top = int((resized_height - self.crop_size) / 2)
+        # Map the crop window back to source coordinates
+        x_ratio, y_ratio = width / resized_width, height / resized_height
+        box = (
+            left * x_ratio,
+            top * y_ratio,
+            (left + self.crop_size) * x_ratio,
+            (top + self.crop_size) * y_ratio,
+        )
+        cropped = image.resize((self.crop_size, self.crop_size), Image.BICUBIC, box=box, reducing_gap=3.0)
+        return np.asarray(cropped, dtype=np.uint8)
+
+    def prepare(self, image_data: bytes) -> np.ndarray:
+        started = time.perf_counter()
+        with stage_timer("image_decode"):
+            image = self.decode(image_data)
+        with stage_timer("preprocess"):
+            pixels = self.resize_crop(image)
+        with self._lock:
+            self.images += 1
+            self.seconds += time.perf_counter() - started
+        return pixels
+
+    def normalize(self, batch: list) -> np.ndarray:
+        pixels = np.stack(batch).astype(np.float32)
+        pixels *= self._scale
+        pixels += self._offset
+        return np.ascontiguousarray(pixels.transpose(0, 3, 1, 2))
+
+    def stats(self) -> dict:
+        return {
+            "size": self.size,
+            "crop_size": self.crop_size,
+            "max_pixels": self.max_pixels,
+            "oversize_policy": self.oversize_policy,
+            "images": self.images,
+            "draft_decoded": self.drafted,
+            "oversized": self.oversized,
+            "rejected": self.rejected,
+            "rejected_not_jpeg": self.rejected_not_jpeg,
+            "avg_ms": self.seconds / self.images * 1000 if self.images else 0.0,
+        }
+
+
+def parity_check(preprocessor: ImagePreprocessor, processor, images: list) -> dict:
+    """
+    Compare `pixel_values` from this pipeline with a transformers processor
+    on the same encoded images (full decode, then the processor).
+    """
+    reference = processor(
+        images=[Image.open(io.BytesIO(data)).convert("RGB") for data in images],
+        return_tensors="np",
+    )["pixel_values"]
+    fast = preprocessor.normalize([preprocessor.prepare(data) for data in images])
+    diff = np.abs(fast - reference)
+    return {
+        "images": len(images),
+        "max_abs_diff": float(diff.max()),
+        "mean_abs_diff": float(diff.mean()),
+        "per_image_mean_abs_diff": [float(d) for d in diff.reshape(len(images), -1).mean(axis=1)],
+    }
@@ -0,0 +1,36 @@
+from starlette.routing import compile_path
+
+
+class RouteTable:
+    """
+    Resolves a request to its route template (e.g. `/get-document/{id}`)
+    and tags before routing runs, for middleware that needs them.
+
+    Templates and tags come from the app's OpenAPI schema, which FastAPI
+    builds once from every included router and caches.
+    """
+
+    def __init__(self):
+        self._routes = None
+
+    def _build(self, app) -> list:
+        routes = []
+        for path, operations in app.openapi().get("paths", {}).items():
+            tags = {method.upper(): tuple(operation.get("tags", ())) for method, operation in operations.items()}
+            routes.append((compile_path(path)[0], path, tags))
+        return routes
+
+    def lookup(self, scope) -> tuple:
+        """
+        Returns `(template, tags)`, or `(None, ())` for paths outside the schema.
+        """
+        if self._routes is None:
+            self._routes = self._build(scope["app"])
+        method = "GET" if scope["method"] == "HEAD" else scope["method"]
+        for pattern, template, tags in self._routes:
+            if method in tags and pattern.match(scope["path"]):
+                return template, tags[method]
+        return None, ()
+
+
+route_table = RouteTable()
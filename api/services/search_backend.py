@@ -0,0 +1,195 @@
+import logging
+import os
+import threading
+import time
+
+import numpy as np
+from bson import ObjectId
+
+from core.config import settings
+from core.serviceInit import collection
+from services.vector_index import IVFIndex
+from services.embedding_codec import decode_embedding
+
+logger = logging.getLogger(__name__)
+
+EMBEDDING_PATH = "mediaDetails.imageEmbeddings"
+
+
+class AtlasSearchBackend:
+    """
+    Vector search through the Atlas `$vectorSearch` aggregation stage.
+    """
+
+    name = "atlas"
+
+    def search(self, query_embedding: list, limit: int = 5, num_candidates: int = None, include_embeddings: bool = True) -> list:
+        pipeline = [
+            {
+                '$vectorSearch': {
+                    'queryVector': np.asarray(query_embedding, dtype=np.float64).tolist(),
+                    'path': EMBEDDING_PATH,
+                    'numCandidates': max(num_candidates or settings.VECTOR_SEARCH_NUM_CANDIDATES, limit),
+                    'index': settings.VECTOR_SEARCH_INDEX,
+                    'limit': limit
+                }
+            },
+            {'$set': {'score': {'$meta': 'vectorSearchScore'}}},
+        ]
+        if not include_embeddings:
+            pipeline.append({'$unset': EMBEDDING_PATH})
+        return list(collection.aggregate(pipeline))
+
+    def add(self, ids: list, embeddings: list):
+        # Atlas indexes documents on write
+        pass
+
+    def stats(self) -> dict:
+        return {
+            "backend": self.name,
+            "index": settings.VECTOR_SEARCH_INDEX,
+            "num_candidates": settings.VECTOR_SEARCH_NUM_CANDIDATES,
+        }
+
+
+class LocalSearchBackend:
+    """
+    Vector search against an in-process IVF index built from the collection.
+
+    The index is loaded from `VECTOR_INDEX_PATH` when present, otherwise built
+    from every stored `mediaDetails.imageEmbeddings` on first use. Documents
+    are then fetched from Mongo by ID, so this works on self-hosted Mongo.
+    Vectors added while `rebuild()` scans the collection are replayed into the
+    new index before it replaces the old one.
+    """
+
+    name = "local"
+
+    def __init__(self, path: str, nlist: int = 0, nprobe: int = 8, save_every: int = 1000):
+        self.path = path
+        self.nlist = nlist
+        self.nprobe = nprobe
+        self.save_every = save_every
+        self._index = None
+        self._lock = threading.Lock()
+        self._rebuild_lock = threading.Lock()
+        self._added_during_rebuild = None
+
+    @property
+    def index(self) -> IVFIndex:
+        if self._index is None:
+            with self._lock:
+                if self._index is None:
+                    self._index = self._load_or_build()
+        return self._index
+
+    def _load_or_build(self) -> IVFIndex:
+        if self.path and os.path.exists(self.path):
+            index = IVFIndex.load(self.path, nlist=self.nlist, nprobe=self.nprobe)
+            logger.info(f"Loaded local vector index with {len(index)} vectors from {self.path}")
+            return index
+        index = self._build()
+        if self.path:
+            index.save(self.path)
+        return index
+
+    def _build(self) -> IVFIndex:
+        started = time.perf_counter()
+        ids, embeddings = [], []
+        cursor = collection.find({EMBEDDING_PATH: {"$exists": True}}, {EMBEDDING_PATH: 1}).batch_size(1000)
+        for document in cursor:
+            embedding = decode_embedding(document.get("mediaDetails", {}).get("imageEmbeddings"))
+            if embedding is not None:
+                ids.append(str(document["_id"]))
+                embeddings.append(embedding)
+
+        index = IVFIndex(nlist=self.nlist, nprobe=self.nprobe)
+        if embeddings:
+            index.build(ids, np.stack(embeddings))
+        logger.info(f"Built local vector index with {len(index)} vectors in {time.perf_counter() - started:.2f}s")
+        return index
+
+    def rebuild(self) -> dict:
+        with self._rebuild_lock:
+            with self._lock:
+                self._added_during_rebuild = []
+            try:
+                index = self._build()
+            except BaseException:
+                with self._lock:
+                    self._added_during_rebuild = None
+                raise
+            with self._lock:
+                added, self._added_during_rebuild = self._added_during_rebuild, None
+                # The scan may have missed these; adding replaces any it did see
+                for ids, embeddings in added:
+                    index.add(ids, embeddings)
+                self._index = index
+            if self.path:
+                index.save(self.path)
+        return index.stats()
+
+    def save(self):
+        if self._index is not None and self.path:
+            self._index.save(self.path)
+
+    def search(self, query_embedding: list, limit: int = 5, num_candidates: int = None, include_embeddings: bool = True) -> list:
+        # num_candidates is Atlas-specific; the IVF index is tuned through nprobe
+        hits = self.index.search(query_embedding, limit)
+        projection = None if include_embeddings else {EMBEDDING_PATH: 0}
+        documents = {
+            str(doc["_id"]): doc
+            for doc in collection.find({"_id": {"$in": [ObjectId(doc_id) for doc_id, _ in hits]}}, projection)
+        }
+        results = []
+        for doc_id, score in hits:
+            if doc_id in documents:
+                documents[doc_id]["score"] = score
+                results.append(documents[doc_id])
+        return results
+
+    def add(self, ids: list, embeddings: list):
+        if not ids:
+            return
+        embeddings = np.asarray(embeddings, dtype=np.float32)
+        index = self.index
+        with self._lock:
+            if self._added_during_rebuild is not None:
+                self._added_during_rebuild.append((ids, embeddings))
+            index = self._index
+        index.add(ids, embeddings)
+        if self.save_every and index.added_since_save >= self.save_every:
+            self.save()
+
+    def evaluate(self, k: int = 10, queries: int = 100, nprobe: int = None) -> dict:
+        return self.index.evaluate(k=k, queries=queries, nprobe=nprobe)
+
+    def stats(self) -> dict:
+        return {"backend": self.name, "path": self.path, **self.index.stats()}
+
+
+_backends = {
+    "atlas": lambda: AtlasSearchBackend(),
+    "local": lambda: LocalSearchBackend(
+        settings.VECTOR_INDEX_PATH,
+        nlist=settings.VECTOR_INDEX_NLIST,
+        nprobe=settings.VECTOR_INDEX_NPROBE,
+        save_every=settings.VECTOR_INDEX_SAVE_EVERY,
+    ),
+}
+_search_backend = None
+
+
+def get_search_backend():
+    """
+    Return the vector search backend selected by `VECTOR_SEARCH_BACKEND`.
+    """
+    global _search_backend
+    if _search_backend is None:
+        if settings.VECTOR_SEARCH_BACKEND not in _backends:
+            raise ValueError(
+                f"Unknown VECTOR_SEARCH_BACKEND '{settings.VECTOR_SEARCH_BACKEND}', "
+                f"expected one of {sorted(_backends)}"
+            )
+        _search_backend = _backends[settings.VECTOR_SEARCH_BACKEND]()
+    return _search_backend
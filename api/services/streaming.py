@@ -0,0 +1,81 @@
+import logging
+
+import orjson
+from bson import ObjectId
+from bson.errors import InvalidId
+from fastapi.responses import StreamingResponse
+
+logger = logging.getLogger(__name__)
+
+STREAM_MEDIA_TYPES = {"json": "application/json", "ndjson": "application/x-ndjson"}
+
+
+def id_range_filter(start_after: str = None, end_before: str = None) -> dict:
+    """
+    `_id` range filter (both bounds exclusive). Raises ValueError for
+    malformed ids.
+    """
+    bounds = {}
+    try:
+        if start_after:
+            bounds["$gt"] = ObjectId(start_after)
+        if end_before:
+            bounds["$lt"] = ObjectId(end_before)
+    except InvalidId as e:
+        raise ValueError(str(e)) from e
+    return {"_id": bounds} if bounds else {}
+
+
+def iter_ids(collection, query_filter: dict, limit: int = None, batch_size: int = 1000):
+    """
+    Yield document ids as strings in `_id` order, fetching `batch_size` ids
+    per round trip, so memory stays flat whatever the collection size.
+    """
+    cursor = collection.find(query_filter, {"_id": 1}).sort("_id", 1).batch_size(batch_size)
+    if limit:
+        cursor = cursor.limit(limit)
+    try:
+        for document in cursor:
+            yield str(document["_id"])
+    finally:
+        cursor.close()
+
+
+def encode_ids(ids, fmt: str, chunk_size: int = 1000):
+    """
+    Encode an id iterator as a JSON array or NDJSON, yielding one bytes chunk
+    per `chunk_size` ids instead of one write per id.
+    """
+    buffer = []
+    first = True
+    if fmt == "json":
+        yield b"["
+    for document_id in ids:
+        if fmt == "ndjson":
+            buffer.append(orjson.dumps({"id": document_id}) + b"\n")
+        else:
+            buffer.append(orjson.dumps(document_id) if first else b"," + orjson.dumps(document_id))
+            first = False
+        if len(buffer) >= chunk_size:
+            yield b"".join(buffer)
+            buffer = []
+    if buffer:
+        yield b"".join(buffer)
+    if fmt == "json":
+        yield b"]"
+
+
+def stream_ids_response(collection, query_filter: dict, fmt: str, limit: int = None, batch_size: int = 1000) -> StreamingResponse:
+    """
+    Stream the ids matching `query_filter`. The generator is synchronous, so
+    Starlette iterates it (and the pymongo cursor) in its threadpool.
+    """
+    def body():
+        try:
+            yield from encode_ids(iter_ids(collection, query_filter, limit, batch_size), fmt, batch_size)
+        except Exception as e:
+            # Headers are already sent; the truncated body is the only signal left
+            logger.error(f"Streaming ids from {collection.name} failed: {e}")
+            raise
+
+    return StreamingResponse(body(), media_type=STREAM_MEDIA_TYPES[fmt])
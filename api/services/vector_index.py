@@ -0,0 +1,268 @@
+import logging
+import os
+import threading
+import time
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+
+def _normalize(vectors: np.ndarray) -> np.ndarray:
+    vectors = np.ascontiguousarray(vectors, dtype=np.float32)
+    norms = np.linalg.norm(vectors, axis=-1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return vectors / norms
+
+
+class IVFIndex:
+    """
+    In-process inverted-file (IVF) index for cosine similarity search.
+
+    Vectors are L2-normalized and kept in one contiguous float32 matrix.
+    A spherical k-means quantizer splits them into `nlist` cells; a query is
+    compared exactly against the vectors of its `nprobe` closest cells only.
+    New vectors are assigned to the nearest existing cell, so inserts do not
+    require retraining. Call `build()` again to retrain on the current data.
+    """
+
+    def __init__(self, dim: int = 0, nlist: int = 0, nprobe: int = 8):
+        self.dim = dim
+        self.nlist_setting = nlist
+        self.nprobe = max(1, nprobe)
+        self.ids = []
+        self._positions = {}
+        self._vectors = np.zeros((0, dim), dtype=np.float32)
+        self._count = 0
+        self.centroids = np.zeros((0, dim), dtype=np.float32)
+        self._assignments = np.zeros(0, dtype=np.int32)
+        self._lists = None
+        self._lock = threading.RLock()
+        self.added_since_save = 0
+
+    def __len__(self) -> int:
+        return self._count
+
+    @property
+    def vectors(self) -> np.ndarray:
+        return self._vectors[:self._count]
+
+    def _auto_nlist(self, count: int) -> int:
+        if self.nlist_setting > 0:
+            return min(self.nlist_setting, count)
+        return max(1, min(count, int(4 * np.sqrt(count))))
+
+    def _train(self, vectors: np.ndarray, nlist: int, iterations: int = 10, sample_size: int = 50000, seed: int = 0):
+        rng = np.random.default_rng(seed)
+        sample = vectors
+        if len(vectors) > sample_size:
+            sample = vectors[rng.choice(len(vectors), sample_size, replace=False)]
+        centroids = sample[rng.choice(len(sample), nlist, replace=False)].copy()
+        for _ in range(iterations):
+            assignments = self._nearest_cells(sample, centroids)
+            sums = np.zeros_like(centroids)
+            np.add.at(sums, assignments, sample)
+            counts = np.bincount(assignments, minlength=nlist)
+            empty = counts == 0
+            if empty.any():
+                # Re-seed empty cells from random points instead of dropping them
+                sums[empty] = sample[rng.choice(len(sample), int(empty.sum()))]
+            centroids = _normalize(sums)
+        return centroids
+
+    @staticmethod
+    def _nearest_cells(vectors: np.ndarray, centroids: np.ndarray, block: int = 8192) -> np.ndarray:
+        assignments = np.empty(len(vectors), dtype=np.int32)
+        for start in range(0, len(vectors), block):
+            assignments[start:start + block] = np.argmax(vectors[start:start + block] @ centroids.T, axis=1)
+        return assignments
+
+    def build(self, ids: list, vectors: np.ndarray):
+        """
+        Replace the index contents and retrain the quantizer.
+        """
+        vectors = _normalize(np.atleast_2d(vectors))
+        with self._lock:
+            self.dim = vectors.shape[1] if len(vectors) else self.dim
+            self.ids = [str(i) for i in ids]
+            self._positions = {doc_id: row for row, doc_id in enumerate(self.ids)}
+            self._vectors = vectors
+            self._count = len(vectors)
+            if self._count:
+                self.centroids = self._train(vectors, self._auto_nlist(self._count))
+                self._assignments = self._nearest_cells(vectors, self.centroids)
+            else:
+                self.centroids = np.zeros((0, self.dim), dtype=np.float32)
+                self._assignments = np.zeros(0, dtype=np.int32)
+            self._lists = None
+            self.added_since_save = 0
+
+    def add(self, ids: list, vectors: np.ndarray):
+        """
+        Insert or replace vectors without retraining the quantizer.
+        """
+        vectors = _normalize(np.atleast_2d(vectors))
+        if not len(vectors):
+            return
+        with self._lock:
+            if not self._count and not len(self.centroids):
+                self.build(ids, vectors)
+                self.added_since_save = len(vectors)
+                return
+            if vectors.shape[1] != self.dim:
+                raise ValueError(f"Expected {self.dim}-dimensional vectors, got {vectors.shape[1]}")
+            assignments = self._nearest_cells(vectors, self.centroids)
+            for doc_id, vector, cell in zip(ids, vectors, assignments):
+                doc_id = str(doc_id)
+                row = self._positions.get(doc_id)
+                if row is None:
+                    row = self._append_row()
+                    self.ids.append(doc_id)
+                    self._positions[doc_id] = row
+                self._vectors[row] = vector
+                self._assignments[row] = cell
+            self._lists = None
+            self.added_since_save += len(vectors)
+
+    def _append_row(self) -> int:
+        # Grow geometrically so the matrix stays contiguous with amortized O(1) appends
+        if self._count == len(self._vectors):
+            capacity = max(16, 2 * len(self._vectors))
+            vectors = np.zeros((capacity, self.dim), dtype=np.float32)
+            vectors[:self._count] = self._vectors[:self._count]
+            assignments = np.zeros(capacity, dtype=np.int32)
+            assignments[:self._count] = self._assignments[:self._count]
+            self._vectors, self._assignments = vectors, assignments
+        self._count += 1
+        return self._count - 1
+
+    def _inverted_lists(self) -> list:
+        if self._lists is None:
+            assignments = self._assignments[:self._count]
+            order = np.argsort(assignments, kind="stable")
+            bounds = np.searchsorted(assignments[order], np.arange(len(self.centroids) + 1))
+            self._lists = [order[bounds[c]:bounds[c + 1]] for c in range(len(self.centroids))]
+        return self._lists
+
+    def search(self, query: np.ndarray, k: int = 5, nprobe: int = None) -> list:
+        """
+        Approximate top-k search. Returns `(id, cosine_score)` pairs, best first.
+        """
+        with self._lock:
+            if not self._count:
+                return []
+            query = _normalize(np.asarray(query, dtype=np.float32).reshape(-1))
+            nprobe = min(nprobe or self.nprobe, len(self.centroids))
+            cells = np.argpartition(-(self.centroids @ query), nprobe - 1)[:nprobe]
+            lists = self._inverted_lists()
+            rows = np.concatenate([lists[c] for c in cells])
+            scores = self._vectors[rows] @ query
+            return self._top_k(rows, scores, k)
+
+    def exact_search(self, query: np.ndarray, k: int = 5) -> list:
+        """
+        Brute-force top-k search over every vector, used as the recall reference.
+        """
+        with self._lock:
+            if not self._count:
+                return []
+            query = _normalize(np.asarray(query, dtype=np.float32).reshape(-1))
+            scores = self.vectors @ query
+            return self._top_k(np.arange(self._count), scores, k)
+
+    def _top_k(self, rows: np.ndarray, scores: np.ndarray, k: int) -> list:
+        k = min(k, len(scores))
+        if k <= 0:
+            return []
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top])]
+        return [(self.ids[rows[i]], float(scores[i])) for i in top]
+
+    def evaluate(self, k: int = 10, queries: int = 100, nprobe: int = None, seed: int = 0) -> dict:
+        """
+        Report recall@k and latency of approximate search against exact
+        brute-force search, using stored vectors as queries.
+        """
+        with self._lock:
+            if not self._count:
+                return {"vectors": 0, "queries": 0}
+            rng = np.random.default_rng(seed)
+            sample = self.vectors[rng.choice(self._count, min(queries, self._count), replace=False)].copy()
+
+        recalls, ann_times, exact_times = [], [], []
+        for query in sample:
+            started = time.perf_counter()
+            approximate = self.search(query, k, nprobe)
+            ann_times.append(time.perf_counter() - started)
+
+            started = time.perf_counter()
+            exact = self.exact_search(query, k)
+            exact_times.append(time.perf_counter() - started)
+
+            expected = {doc_id for doc_id, _ in exact}
+            recalls.append(len(expected.intersection(doc_id for doc_id, _ in approximate)) / len(expected))
+
+        def latency_ms(times: list) -> dict:
+            values = np.array(times) * 1000
+            p50, p95, p99 = np.percentile(values, [50, 95, 99])
+            return {"mean": float(values.mean()), "p50": float(p50), "p95": float(p95), "p99": float(p99)}
+
+        return {
+            "vectors": self._count,
+            "queries": len(sample),
+            "k": k,
+            "nprobe": min(nprobe or self.nprobe, len(self.centroids)),
+            "recall": float(np.mean(recalls)),
+            "ann_latency_ms": latency_ms(ann_times),
+            "exact_latency_ms": latency_ms(exact_times),
+        }
+
+    def stats(self) -> dict:
+        lists = self._inverted_lists() if self._count else []
+        sizes = [len(cell) for cell in lists]
+        return {
+            "vectors": self._count,
+            "dimensions": self.dim,
+            "nlist": len(self.centroids),
+            "nlist_setting": self.nlist_setting,
+            "nprobe": self.nprobe,
+            "largest_cell": max(sizes) if sizes else 0,
+            "added_since_save": self.added_since_save,
+        }
+
+    def save(self, path: str):
+        with self._lock:
+            directory = os.path.dirname(path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            tmp_path = f"{path}.tmp.npz"
+            np.savez(
+                tmp_path,
+                vectors=self.vectors,
+                centroids=self.centroids,
+                assignments=self._assignments[:self._count],
+                ids=np.array(self.ids, dtype=str),
+                nprobe=self.nprobe,
+                nlist=self.nlist_setting,
+            )
+            os.replace(tmp_path, path)
+            self.added_since_save = 0
+
+    @classmethod
+    def load(cls, path: str, nlist: int = 0, nprobe: int = 0) -> "IVFIndex":
+        """
+        Load a saved index; `nlist` and `nprobe` override the values it was
+        saved with.
+        """
+        with np.load(path) as data:
+            vectors = data["vectors"]
+            # Files written before nlist was saved fall back to the automatic size
+            saved_nlist = int(data["nlist"]) if "nlist" in data.files else 0
+            index = cls(dim=vectors.shape[1], nlist=nlist or saved_nlist, nprobe=nprobe or int(data["nprobe"]))
+            index.ids = data["ids"].tolist()
+            index._positions = {doc_id: row for row, doc_id in enumerate(index.ids)}
+            index._vectors = np.ascontiguousarray(vectors, dtype=np.float32)
+            index._count = len(vectors)
+            index.centroids = data["centroids"]
+            index._assignments = data["assignments"].astype(np.int32)
+        return index